@@ -1,24 +1,84 @@
-"""Compare different game outcomes when adjusting initializing parameters."""
+"""
+Compare different game outcomes when adjusting initializing parameters.
+
+pandas, seaborn and matplotlib are only imported when results are tabulated or plotted, so that sweep workers start with the simulation core alone.
+"""
+
+import math
+from statistics import NormalDist
 
 from gamestate import GameState
+from map_cache import MapCache
+from profiling import PhaseProfiler
 from utils import Role
-import seaborn as sns
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-import time
 
+OUTCOMES = (Role.PURSUANT, Role.EVADER, None)
+
+
+def run_sweep(
+    n,
+    density_vals,
+    depth_vals,
+    require_connected=False,
+    seed=None,
+    cache_dir=None,
+    engine="minimax",
+    evader_engine=None,
+    mcts_settings=None,
+    profile_dir=None,
+    max_nodes=None,
+    on_budget="shallower",
+):
+    """
+    Play n games for every combination of obstacle density and lookahead depth.
 
-def run_sweep(n, density_vals, depth_vals):
-    """"""
+    Args:
+        n: number of games per combination
+        density_vals: obstacle densities to sweep
+        depth_vals: lookahead depths to sweep
+        require_connected: regenerate each map until the agents can reach each other, so that win rates are conditioned on playable maps
+        seed: if given, game i of every combination is played on the map seeded seed + i, so reruns replay the same maps
+        cache_dir: directory of a MapCache, so that maps played in earlier runs skip their distance precomputation
+        engine: "minimax" or "mcts", the move chooser of both sides, or of the pursuer alone when evader_engine is given
+        evader_engine: move chooser of the evader, to pit the engines against each other
+        mcts_settings: keyword arguments of MCTS, such as a time_limit per move matched to minimax's seconds per move
+        profile_dir: if given, profile every phase of every game and write the combined report, pstats and collapsed stacks here
+        max_nodes: most game tree nodes per minimax move, beyond which the search degrades
+        on_budget: "shallower" or "stream", how a search over max_nodes degrades
+    """
+    map_cache = MapCache(cache_dir) if cache_dir is not None else None
+    profiler = PhaseProfiler() if profile_dir is not None else None
     results = []
     for d in density_vals:
         for depth in depth_vals:
             print(f"RUNNING DESNTIY={d} AND DEPTH={depth}")
             result = []
+            map_attempts = 0
+            seconds = {Role.PURSUANT: 0.0, Role.EVADER: 0.0}
+            moves = {Role.PURSUANT: 0, Role.EVADER: 0}
+            searches = degraded = 0
             for i in range(n):
-                game = GameState(episode=i, depth=depth, density=d)
-                r = game.run_loop()
+                game, r = play_sweep_game(
+                    i,
+                    d,
+                    depth,
+                    require_connected,
+                    seed,
+                    map_cache,
+                    engine,
+                    evader_engine,
+                    mcts_settings,
+                    profiler,
+                    max_nodes,
+                    on_budget,
+                )
+                map_attempts += game.map_attempts
+                for role in seconds:
+                    seconds[role] += game.search_seconds[role]
+                moves[Role.PURSUANT] += (game.turn_count + 1) // 2
+                moves[Role.EVADER] += game.turn_count // 2
+                searches += len(game.turn_stats)
+                degraded += sum(stats["degraded"] for stats in game.turn_stats)
                 # print(f"WINNER IS {r[0]}")
                 result.append(r[0])
             # Count outcomes
@@ -35,23 +95,305 @@ def run_sweep(n, density_vals, depth_vals):
                     "pursuer_win_rate": pursuer_wins,
                     "evader_win_rate": evader_wins,
                     "tie_rate": ties,
+                    "mean_map_attempts": map_attempts / total,
+                    # CPU time per move of each side, to compare engines at equal cost
+                    "pursuer_seconds_per_move": seconds[Role.PURSUANT]
+                    / max(moves[Role.PURSUANT], 1),
+                    "evader_seconds_per_move": seconds[Role.EVADER]
+                    / max(moves[Role.EVADER], 1),
+                    # share of minimax moves searched below full depth for lack of nodes
+                    "degraded_turn_rate": degraded / max(searches, 1),
                 }
             )
 
+    if profiler is not None:
+        profiler.dump(profile_dir, prefix="sweep")
+        profiler.close()
+
+    import pandas as pd
+
     return pd.DataFrame(results)
 
 
-if __name__ == "__main__":
+def sweep_seed(seed, i):
+    """
+    Return the map seed of game i of a sweep cell: seed + i, so that game i of every cell is played on the same map and cells are compared on equal maps. None when the sweep is unseeded.
+    """
+    return None if seed is None else seed + i
 
-    # Number of games run per density
-    n = 100
 
-    # Density sweep values
-    density_vals = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8]
-    depth_vals = [3, 4, 5, 6]
+def play_sweep_game(
+    i,
+    density,
+    depth,
+    require_connected=False,
+    seed=None,
+    map_cache=None,
+    engine="minimax",
+    evader_engine=None,
+    mcts_settings=None,
+    profiler=None,
+    max_nodes=None,
+    on_budget="shallower",
+):
+    """
+    Play game i of a sweep cell, on the map seeded by sweep_seed.
 
-    results = run_sweep(n, density_vals, depth_vals)
-    print(results.head())
+    Returns:
+        The finished GameState and the result of its run_loop.
+    """
+    game = GameState(
+        episode=i,
+        depth=depth,
+        density=density,
+        require_connected=require_connected,
+        seed=sweep_seed(seed, i),
+        map_cache=map_cache,
+        engine=engine,
+        evader_engine=evader_engine,
+        mcts_settings=mcts_settings,
+        profiler=profiler,
+        max_nodes=max_nodes,
+        on_budget=on_budget,
+    )
+    return game, game.run_loop()
+
+
+def wilson_interval(successes, n, z=1.96) -> tuple[float, float]:
+    """
+    Return the Wilson score interval of a rate, which unlike the normal approximation stays inside [0, 1] and is not degenerate at 0 or n successes.
+
+    Args:
+        successes: how often the outcome happened
+        n: number of trials
+        z: standard normal quantile of the confidence level
+
+    Returns:
+        The lower and upper bounds, or (0, 1) before any trial.
+    """
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z / (1 + z * z / n) * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    return max(center - half, 0.0), min(center + half, 1.0)
+
+
+class AdaptiveSweep:
+    """
+    Schedule the games of a sweep so that every cell's outcome rates reach the same precision. Each cell keeps running counts of pursuer wins, evader wins and ties; a cell is finished once the Wilson interval of every rate is no wider than the target, or it has played max_games. Every round, each open cell is given as many games as the normal approximation says it still needs, up to batch_size, so cells near 50% are played most and one-sided cells stop after a few dozen.
+
+    Attributes:
+        cells (list[tuple]): The (density, depth) cells of the sweep.
+        precision (float): Target half-width of every rate's interval.
+        z (float): Standard normal quantile of the confidence level.
+        counts (dict): Outcome counts per cell, keyed by winner (None for ties).
+        map_attempts (dict): Maps drawn per cell, for mean_map_attempts.
+        pending (dict): Games handed out per cell and not yet recorded.
+    """
+
+    def __init__(
+        self,
+        cells,
+        precision=0.05,
+        confidence=0.95,
+        min_games=10,
+        max_games=500,
+        batch_size=10,
+    ):
+        """
+        Args:
+            cells (list[tuple]): The (density, depth) cells of the sweep.
+            precision (float): Target half-width of every rate's interval.
+            confidence (float): Confidence level of the intervals.
+            min_games (int): Games every cell plays before it may stop.
+            max_games (int): Games after which a cell stops regardless.
+            batch_size (int): Most games given to one cell per round.
+        """
+        self.cells = list(cells)
+        self.precision = precision
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.min_games = min_games
+        self.max_games = max_games
+        self.batch_size = batch_size
+        self.counts = {cell: dict.fromkeys(OUTCOMES, 0) for cell in self.cells}
+        self.map_attempts = dict.fromkeys(self.cells, 0)
+        self.pending = dict.fromkeys(self.cells, 0)
+
+    def games(self, cell) -> int:
+        """
+        Return the games recorded for a cell.
+        """
+        return sum(self.counts[cell].values())
+
+    def half_width(self, cell) -> float:
+        """
+        Return the widest half-width among the intervals of a cell's outcome rates.
+        """
+        n = self.games(cell)
+        return max(
+            (high - low) / 2
+            for low, high in (
+                wilson_interval(k, n, self.z) for k in self.counts[cell].values()
+            )
+        )
+
+    def is_done(self, cell) -> bool:
+        """
+        Return if a cell needs no more games.
+        """
+        n = self.games(cell)
+        if n >= self.max_games:
+            return True
+        return n >= self.min_games and self.half_width(cell) <= self.precision
+
+    @property
+    def finished(self) -> bool:
+        """
+        Whether every cell is done.
+        """
+        return all(self.is_done(cell) for cell in self.cells)
+
+    def next_round(self) -> list[tuple]:
+        """
+        Hand out the next round of games, widest intervals first.
+
+        Returns:
+            (cell, game index) pairs to play; game indices count up per cell, so game i of a cell is played on the map of sweep_seed.
+        """
+        games = []
+        open_cells = [c for c in self.cells if not self.is_done(c)]
+        for cell in sorted(open_cells, key=self.half_width, reverse=True):
+            n = self.games(cell) + self.pending[cell]
+            needed = self._games_needed(cell)
+            games.extend((cell, i) for i in range(n, n + needed))
+            self.pending[cell] += needed
+        return games
+
+    def record(self, cell, winner: Role, map_attempts=1):
+        """
+        Count the outcome of one finished game.
+
+        Args:
+            cell (tuple): The (density, depth) cell the game belongs to.
+            winner (Role): The winner, or None for a tie.
+            map_attempts (int): Maps drawn for the game.
+        """
+        self.counts[cell][winner] += 1
+        self.map_attempts[cell] += map_attempts
+        self.pending[cell] = max(self.pending[cell] - 1, 0)
+
+    def results(self) -> list[dict]:
+        """
+        Summarize every cell in the row format of run_sweep, with its game count and interval half-width.
+        """
+        rows = []
+        for density, depth in self.cells:
+            cell = (density, depth)
+            total = max(self.games(cell), 1)
+            counts = self.counts[cell]
+            rows.append(
+                {
+                    "density": density,
+                    "depth": depth,
+                    "games": self.games(cell),
+                    "pursuer_win_rate": counts[Role.PURSUANT] / total,
+                    "evader_win_rate": counts[Role.EVADER] / total,
+                    "tie_rate": counts[None] / total,
+                    "ci_half_width": self.half_width(cell),
+                    "mean_map_attempts": self.map_attempts[cell] / total,
+                }
+            )
+        return rows
+
+    def _games_needed(self, cell) -> int:
+        """
+        Estimate the further games a cell needs to reach the target precision, from the normal approximation of its least certain rate, capped at batch_size and max_games.
+        """
+        n = self.games(cell)
+        if n < self.min_games:
+            needed = self.min_games - n
+        else:
+            spread = max(k / n * (1 - k / n) for k in self.counts[cell].values())
+            needed = math.ceil(self.z**2 * spread / self.precision**2) - n
+        needed = max(needed, 1)
+        return min(needed, self.batch_size, self.max_games - n - self.pending[cell])
+
+
+def run_adaptive_sweep(
+    density_vals,
+    depth_vals,
+    precision=0.05,
+    confidence=0.95,
+    min_games=10,
+    max_games=500,
+    batch_size=10,
+    require_connected=False,
+    seed=None,
+    cache_dir=None,
+    engine="minimax",
+    evader_engine=None,
+    mcts_settings=None,
+    max_nodes=None,
+    on_budget="shallower",
+):
+    """
+    Play every combination of obstacle density and lookahead depth until its outcome rates are known to the given precision, instead of a fixed number of games each.
+
+    Args:
+        density_vals: obstacle densities to sweep
+        depth_vals: lookahead depths to sweep
+        precision: target half-width of each cell's win-rate confidence intervals
+        confidence: confidence level of the intervals
+        min_games: games every cell plays before it may stop
+        max_games: games after which a cell stops regardless
+        batch_size: most games given to one cell per round
+        require_connected, seed, cache_dir, engine, evader_engine, mcts_settings, max_nodes, on_budget: as for run_sweep
+
+    Returns:
+        The run_sweep table, with the games played and interval half-width of each cell.
+    """
+    map_cache = MapCache(cache_dir) if cache_dir is not None else None
+    sweep = AdaptiveSweep(
+        [(d, depth) for d in density_vals for depth in depth_vals],
+        precision,
+        confidence,
+        min_games,
+        max_games,
+        batch_size,
+    )
+    while not sweep.finished:
+        for (d, depth), i in sweep.next_round():
+            game, r = play_sweep_game(
+                i,
+                d,
+                depth,
+                require_connected,
+                seed,
+                map_cache,
+                engine,
+                evader_engine,
+                mcts_settings,
+                max_nodes=max_nodes,
+                on_budget=on_budget,
+            )
+            sweep.record((d, depth), r[0], game.map_attempts)
+
+    import pandas as pd
+
+    return pd.DataFrame(sweep.results())
+
+
+def plot_sweep(results, path=None):
+    """
+    Draw one heatmap per outcome over the swept densities and depths.
+
+    Args:
+        results: the DataFrame returned by run_sweep
+        path: file to save the figure to; if None, the figure is shown interactively
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
     # Create heatmaps for each outcome
     outcomes = ["pursuer_win_rate", "evader_win_rate", "tie_rate"]
@@ -75,4 +417,22 @@ if __name__ == "__main__":
         axes[i].set_ylabel("Lookahead Depth")
 
     plt.tight_layout()
-    plt.show()
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
+        plt.close(fig)
+
+
+if __name__ == "__main__":
+
+    # Number of games run per density
+    n = 100
+
+    # Density sweep values
+    density_vals = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8]
+    depth_vals = [3, 4, 5, 6]
+
+    results = run_sweep(n, density_vals, depth_vals)
+    print(results.head())
+    plot_sweep(results)
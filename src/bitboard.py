@@ -0,0 +1,212 @@
+"""
+Bit-packed boolean grids, for neighbor expansion and wavefront search 64 cells at a time.
+"""
+
+from typing import Optional
+import numpy as np
+
+from utils import CellIndex
+
+ONE = np.uint64(1)
+TOP_BIT = np.uint64(63)
+
+
+class Bitboard:
+    """
+    The Bitboard class packs a boolean grid into rows of uint64 words. Bit j of word w in a row holds column 64 * w + j, so shifting a board by one column is a word shift plus a carry between neighboring words, and shifting it by one row is a slice.
+
+    Attributes:
+        words (nparray): The packed grid, shaped (rows, ceil(cols / 64)).
+        rows (int): Number of rows in the grid.
+        cols (int): Number of columns in the grid.
+    """
+
+    def __init__(self, words: np.ndarray, cols: int):
+        self.words = words
+        self.rows = words.shape[0]
+        self.cols = cols
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "Bitboard":
+        """
+        Pack a boolean grid.
+
+        Args:
+            mask (nparray): The grid to pack, shaped (rows, cols).
+        """
+        rows, cols = mask.shape
+        n_words = -(-cols // 64)
+        padded = np.zeros((rows, n_words * 64), dtype=bool)
+        padded[:, :cols] = mask
+        packed = np.packbits(padded, axis=1, bitorder="little")
+        return cls(np.ascontiguousarray(packed).view("<u8").astype(np.uint64), cols)
+
+    @classmethod
+    def empty(cls, rows: int, cols: int) -> "Bitboard":
+        """
+        Create a board with no bits set.
+        """
+        return cls(np.zeros((rows, -(-cols // 64)), dtype=np.uint64), cols)
+
+    @classmethod
+    def from_cell(cls, rows: int, cols: int, cell: CellIndex) -> "Bitboard":
+        """
+        Create a board with a single bit set.
+        """
+        board = cls.empty(rows, cols)
+        board.set(cell)
+        return board
+
+    def to_mask(self) -> np.ndarray:
+        """
+        Unpack the board into a boolean grid.
+        """
+        as_bytes = np.ascontiguousarray(self.words.astype("<u8")).view(np.uint8)
+        bits = np.unpackbits(as_bytes, axis=1, bitorder="little")
+        return bits[:, : self.cols].astype(bool)
+
+    def get(self, cell: CellIndex) -> bool:
+        """
+        Read a single bit.
+        """
+        word = self.words[cell.row, cell.col // 64]
+        return bool((word >> np.uint64(cell.col % 64)) & ONE)
+
+    def set(self, cell: CellIndex, value=True):
+        """
+        Write a single bit.
+        """
+        bit = ONE << np.uint64(cell.col % 64)
+        if value:
+            self.words[cell.row, cell.col // 64] |= bit
+        else:
+            self.words[cell.row, cell.col // 64] &= ~bit
+
+    def any(self) -> bool:
+        return bool(self.words.any())
+
+    def count(self) -> int:
+        """
+        Return the number of set bits.
+        """
+        return int(np.unpackbits(self.words.view(np.uint8)).sum())
+
+    def shift_right(self) -> "Bitboard":
+        """
+        Move every bit one column right (col + 1), dropping bits that leave the grid.
+        """
+        shifted = self.words << ONE
+        shifted[:, 1:] |= self.words[:, :-1] >> TOP_BIT
+        return Bitboard(shifted, self.cols)._clip()
+
+    def shift_left(self) -> "Bitboard":
+        """
+        Move every bit one column left (col - 1), dropping bits that leave the grid.
+        """
+        shifted = self.words >> ONE
+        shifted[:, :-1] |= self.words[:, 1:] << TOP_BIT
+        return Bitboard(shifted, self.cols)
+
+    def shift_down(self) -> "Bitboard":
+        """
+        Move every bit one row down (row + 1), dropping the last row.
+        """
+        shifted = np.zeros_like(self.words)
+        shifted[1:] = self.words[:-1]
+        return Bitboard(shifted, self.cols)
+
+    def shift_up(self) -> "Bitboard":
+        """
+        Move every bit one row up (row - 1), dropping the first row.
+        """
+        shifted = np.zeros_like(self.words)
+        shifted[:-1] = self.words[1:]
+        return Bitboard(shifted, self.cols)
+
+    def dilate(self) -> "Bitboard":
+        """
+        Return the board together with every cell 4-adjacent to a set bit.
+        """
+        return (
+            self
+            | self.shift_left()
+            | self.shift_right()
+            | self.shift_up()
+            | self.shift_down()
+        )
+
+    def _clip(self) -> "Bitboard":
+        """
+        Clear the padding bits beyond the last column, in place.
+        """
+        spare = self.words.shape[1] * 64 - self.cols
+        if spare:
+            self.words[:, -1] &= np.uint64((1 << (64 - spare)) - 1)
+        return self
+
+    def __and__(self, other: "Bitboard") -> "Bitboard":
+        return Bitboard(self.words & other.words, self.cols)
+
+    def __or__(self, other: "Bitboard") -> "Bitboard":
+        return Bitboard(self.words | other.words, self.cols)
+
+    def __invert__(self) -> "Bitboard":
+        return Bitboard(~self.words, self.cols)._clip()
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, Bitboard)
+            and self.cols == other.cols
+            and np.array_equal(self.words, other.words)
+        )
+
+
+def wavefront_distance(
+    passable: Bitboard, start: CellIndex, goal: CellIndex
+) -> Optional[int]:
+    """
+    Return the number of steps between two cells by growing a breadth-first frontier with whole-board shifts.
+
+    Args:
+        passable (Bitboard): Cells that can be entered.
+        start (CellIndex): Starting point of the search.
+        goal (CellIndex): Ending point of the search.
+
+    Returns:
+        The shortest path length, or None if the goal cannot be reached.
+    """
+    reached = Bitboard.from_cell(passable.rows, passable.cols, start)
+    frontier = reached
+    steps = 0
+    while frontier.any():
+        if frontier.get(goal):
+            return steps
+        frontier = frontier.dilate() & passable & ~reached
+        reached = reached | frontier
+        steps += 1
+
+    # no path found
+    return None
+
+
+def wavefront_field(passable: Bitboard, start: CellIndex) -> np.ndarray:
+    """
+    Return the number of steps from a cell to every other cell, by growing a breadth-first frontier with whole-board shifts.
+
+    Args:
+        passable (Bitboard): Cells that can be entered.
+        start (CellIndex): Starting point of the search.
+
+    Returns:
+        An integer grid of distances, with -1 where the start cannot be reached from.
+    """
+    field = np.full((passable.rows, passable.cols), -1, dtype=np.int32)
+    reached = Bitboard.from_cell(passable.rows, passable.cols, start)
+    frontier = reached
+    steps = 0
+    while frontier.any():
+        field[frontier.to_mask()] = steps
+        frontier = frontier.dilate() & passable & ~reached
+        reached = reached | frontier
+        steps += 1
+    return field
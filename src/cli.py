@@ -0,0 +1,593 @@
+"""
+Command-line entry point for playing, sweeping and benchmarking games without a display.
+
+Run from `src`:
+    python -m cli run --games 10 --size 5 --density 0.2 --depth 3
+    python -m cli sweep --densities 0 0.2 0.4 --depths 3 4 --games 100 --workers 8 --output sweep.csv
+    python -m cli sweep --densities 0 0.2 0.4 --depths 3 4 --adaptive --precision 0.05 --workers 8 --output sweep.csv
+    python -m cli bench --depth 5 --games 20 --output bench.jsonl
+
+Every finished game is written to the output as one record, so long sweeps can be monitored and post-processed while they run.
+"""
+
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from benchmarking import AdaptiveSweep, plot_sweep, sweep_seed
+from gamestate import GameState
+from learned_eval import LearnedEvaluator
+from map_cache import MapCache
+from movement import MOVEMENT_MODELS
+from profiling import PhaseProfiler, merge_collapsed
+from utils import CellIndex, Role
+
+RECORD_FIELDS = [
+    "game",
+    "size",
+    "cols",
+    "density",
+    "depth",
+    "engine",
+    "evader_engine",
+    "seed",
+    "winner",
+    "turns",
+    "map_attempts",
+    "seconds",
+    "seconds_per_turn",
+    "pursuer_seconds",
+    "evader_seconds",
+    "degraded_turns",
+]
+
+
+def play_game(config: dict) -> dict:
+    """
+    Play one game headlessly and summarize it as a flat record.
+
+    Args:
+        config (dict): game, size, density, depth, seed, require_connected, movement, search, engine, evader_engine, mcts_iterations, mcts_time, max_nodes, on_budget, evaluator, reduce_after, extend_within, cache_dir, profile_dir, record and quiet settings
+
+    Returns:
+        The record of the finished game, with a key for each of RECORD_FIELDS.
+    """
+    size = config["size"]
+    cols = config["cols"] or size
+    profiler = PhaseProfiler() if config["profile_dir"] is not None else None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+        devnull if config["quiet"] else sys.stdout
+    ):
+        start = time.perf_counter()
+        game = GameState(
+            episode=config["game"],
+            size=(size, cols),
+            density=config["density"],
+            depth=config["depth"],
+            e_start=CellIndex(size - 1, cols - 1),
+            require_connected=config["require_connected"],
+            movement=MOVEMENT_MODELS[config["movement"]],
+            search=config["search"],
+            engine=config["engine"],
+            evader_engine=config["evader_engine"],
+            mcts_settings={
+                "iterations": config["mcts_iterations"],
+                "time_limit": config["mcts_time"],
+                "seed": config["seed"],
+            },
+            map_cache=(
+                MapCache(config["cache_dir"]) if config["cache_dir"] is not None else None
+            ),
+            record=config["record"],
+            seed=config["seed"],
+            profiler=profiler,
+            max_nodes=config["max_nodes"],
+            on_budget=config["on_budget"],
+            reduce_after=config["reduce_after"],
+            extend_within=config["extend_within"],
+            evaluator=(
+                LearnedEvaluator.load(config["evaluator"])
+                if config["evaluator"] is not None
+                else None
+            ),
+        )
+        winner, _ = game.run_loop()
+        seconds = time.perf_counter() - start
+        if game.recorder is not None:
+            with contextlib.nullcontext() if profiler is None else profiler.phase("render"):
+                game.recorder.save_gif()
+
+    if profiler is not None:
+        # one set of files per game, so worker processes never write to the same file
+        profiler.dump(
+            config["profile_dir"],
+            prefix=f"game-{config['density']}-{config['depth']}-{config['game']}-{os.getpid()}",
+        )
+        profiler.close()
+
+    return {
+        "game": config["game"],
+        "size": size,
+        "cols": cols,
+        "density": config["density"],
+        "depth": config["depth"],
+        "engine": game.engines[Role.PURSUANT],
+        "evader_engine": game.engines[Role.EVADER],
+        "seed": config["seed"],
+        "winner": winner.name if winner is not None else None,
+        "turns": game.turn_count,
+        "map_attempts": game.map_attempts,
+        "seconds": seconds,
+        "seconds_per_turn": seconds / game.turn_count if game.turn_count else None,
+        "pursuer_seconds": game.search_seconds[Role.PURSUANT],
+        "evader_seconds": game.search_seconds[Role.EVADER],
+        "degraded_turns": sum(stats["degraded"] for stats in game.turn_stats),
+    }
+
+
+class RecordWriter:
+    """
+    Stream game records to a CSV, JSON Lines or Parquet file as they arrive.
+
+    Attributes:
+        fmt (str): The output format.
+    """
+
+    def __init__(self, path, fmt=None, batch_size=256):
+        """
+        Open the output. "-" writes CSV or JSON Lines to stdout.
+
+        Args:
+            path (str): File to write, or "-" for stdout.
+            fmt (str): "csv", "jsonl" or "parquet"; inferred from the file extension if None.
+            batch_size (int): Records per Parquet row group.
+        """
+        if fmt is None:
+            fmt = infer_format(path)
+        if fmt not in ("csv", "jsonl", "parquet"):
+            raise ValueError(f"Unknown output format: {fmt}")
+        if fmt == "parquet" and path == "-":
+            raise ValueError("Parquet output needs a file path")
+
+        self.fmt = fmt
+        self._path = path
+        self._batch_size = batch_size
+        self._batch = []
+        self._parquet = None
+        self._file = None
+        self._csv = None
+
+        if fmt != "parquet":
+            self._file = sys.stdout if path == "-" else open(path, "w", newline="")
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=RECORD_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, record: dict):
+        """
+        Append one record, flushing it so the file can be followed while the run continues.
+        """
+        if self.fmt == "csv":
+            self._csv.writerow(record)
+            self._file.flush()
+        elif self.fmt == "jsonl":
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+        else:
+            self._batch.append(record)
+            if len(self._batch) >= self._batch_size:
+                self._flush_parquet()
+
+    def close(self):
+        """
+        Flush any buffered records and close the output.
+        """
+        if self.fmt == "parquet":
+            self._flush_parquet()
+            if self._parquet is not None:
+                self._parquet.close()
+        elif self._file is not sys.stdout:
+            self._file.close()
+
+    def _flush_parquet(self):
+        """
+        Write the buffered records as one Parquet row group.
+        """
+        if not self._batch:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(self._batch, schema=_parquet_schema())
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self._path, table.schema)
+        self._parquet.write_table(table)
+        self._batch = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _parquet_schema():
+    """
+    Column types of a game record, fixed up front so every row group matches.
+    """
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("game", pa.int64()),
+            ("size", pa.int64()),
+            ("cols", pa.int64()),
+            ("density", pa.float64()),
+            ("depth", pa.int64()),
+            ("engine", pa.string()),
+            ("evader_engine", pa.string()),
+            ("seed", pa.int64()),
+            ("winner", pa.string()),
+            ("turns", pa.int64()),
+            ("map_attempts", pa.int64()),
+            ("seconds", pa.float64()),
+            ("seconds_per_turn", pa.float64()),
+            ("pursuer_seconds", pa.float64()),
+            ("evader_seconds", pa.float64()),
+            ("degraded_turns", pa.int64()),
+        ]
+    )
+
+
+def infer_format(path) -> str:
+    """
+    Guess the output format from a file extension, defaulting to CSV.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+
+def build_configs(args, densities, depths):
+    """
+    Enumerate one game config per (density, depth, game) combination. Game i of every cell is played on the map of sweep_seed, as in run_sweep, so cells are compared on the same reproducible maps.
+    """
+    configs = []
+    for density, depth, game in itertools.product(
+        densities, depths, range(args.games)
+    ):
+        configs.append(
+            make_config(args, density, depth, game, sweep_seed(args.seed, game))
+        )
+    return configs
+
+
+def make_config(args, density, depth, game, seed) -> dict:
+    """
+    Build the config of one game, played on the map of the given seed.
+    """
+    return {
+        "game": game,
+        "size": args.size,
+        "cols": args.cols,
+        "density": density,
+        "depth": depth,
+        "seed": seed,
+        "require_connected": args.require_connected,
+        "movement": args.movement,
+        "search": args.search,
+        "engine": args.engine,
+        "evader_engine": args.evader_engine,
+        "mcts_iterations": args.mcts_iterations,
+        "mcts_time": args.mcts_time,
+        "max_nodes": args.max_nodes,
+        "on_budget": args.on_budget,
+        "evaluator": args.evaluator,
+        "reduce_after": args.reduce_after,
+        "extend_within": args.extend_within,
+        "cache_dir": args.cache_dir,
+        "profile_dir": args.profile,
+        "record": args.record,
+        "quiet": not args.verbose,
+    }
+
+
+def run_games(configs, writer: RecordWriter, workers=1):
+    """
+    Play every config, writing each record as soon as its game finishes.
+
+    Args:
+        configs (list[dict]): the games to play
+        writer (RecordWriter): where to stream the records
+        workers (int): number of worker processes; 1 plays in this process
+
+    Returns:
+        The list of records, in completion order.
+    """
+    records = []
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            for record in pool.imap_unordered(play_game, configs):
+                writer.write(record)
+                records.append(record)
+    else:
+        for config in configs:
+            record = play_game(config)
+            writer.write(record)
+            records.append(record)
+    return records
+
+
+def run_adaptive(args, writer: RecordWriter):
+    """
+    Play a sweep in rounds until every cell's win rates reach --precision, handing each round's games to the workers together. Game i of every cell is played on the map of sweep_seed, as in run_adaptive_sweep.
+
+    Returns:
+        The list of records, in completion order.
+    """
+    cells = list(itertools.product(args.densities, args.depths))
+    sweep = AdaptiveSweep(
+        cells,
+        args.precision,
+        args.confidence,
+        args.min_games,
+        args.max_games,
+        args.batch_size,
+    )
+    records = []
+    while not sweep.finished:
+        configs = []
+        for (density, depth), game in sweep.next_round():
+            seed = sweep_seed(args.seed, game)
+            configs.append(make_config(args, density, depth, game, seed))
+        for record in run_games(configs, writer, workers=args.workers):
+            winner = Role[record["winner"]] if record["winner"] is not None else None
+            sweep.record(
+                (record["density"], record["depth"]), winner, record["map_attempts"]
+            )
+            records.append(record)
+    return records
+
+
+def summarize(records):
+    """
+    Print win rates and timing per (density, depth) cell to stderr.
+    """
+    cells = {}
+    for r in records:
+        cells.setdefault((r["density"], r["depth"]), []).append(r)
+
+    print("density depth games pursuer evader tie sec/game", file=sys.stderr)
+    for (density, depth), rs in sorted(cells.items()):
+        total = len(rs)
+        winners = [r["winner"] for r in rs]
+        print(
+            f"{density:7} {depth:5} {total:5} "
+            f"{winners.count('PURSUANT') / total:7.2f} "
+            f"{winners.count('EVADER') / total:6.2f} "
+            f"{winners.count(None) / total:3.2f} "
+            f"{sum(r['seconds'] for r in rs) / total:8.4f}",
+            file=sys.stderr,
+        )
+
+
+def to_sweep_table(records):
+    """
+    Aggregate game records into the per-cell win-rate table that run_sweep returns.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(records)
+    grouped = df.groupby(["density", "depth"])
+    return pd.DataFrame(
+        {
+            "pursuer_win_rate": grouped["winner"].apply(
+                lambda w: (w == "PURSUANT").mean()
+            ),
+            "evader_win_rate": grouped["winner"].apply(
+                lambda w: (w == "EVADER").mean()
+            ),
+            "tie_rate": grouped["winner"].apply(lambda w: w.isna().mean()),
+            "mean_map_attempts": grouped["map_attempts"].mean(),
+        }
+    ).reset_index()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Define the run, sweep and bench subcommands and their shared options.
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--size", type=int, default=5, help="side length of the map, or its rows"
+    )
+    common.add_argument(
+        "--cols", type=int, default=None, help="columns, for rectangular maps"
+    )
+    common.add_argument("--games", type=int, default=1, help="games per setting")
+    common.add_argument("--seed", type=int, default=None, help="seed of the first map")
+    common.add_argument("--workers", type=int, default=1, help="worker processes")
+    common.add_argument(
+        "--require-connected",
+        action="store_true",
+        help="redraw maps until the agents can reach each other",
+    )
+    common.add_argument(
+        "--movement",
+        choices=sorted(MOVEMENT_MODELS),
+        default="4",
+        help="4- or 8-connected moves, or 8-connected with diagonals costing sqrt(2)",
+    )
+    common.add_argument(
+        "--search",
+        choices=["alphabeta", "pvs"],
+        default="alphabeta",
+        help="plain alpha-beta, or principal variation search with aspiration windows",
+    )
+    common.add_argument(
+        "--engine",
+        choices=["minimax", "mcts"],
+        default="minimax",
+        help="move chooser of both sides, or of the pursuer when --evader-engine is given",
+    )
+    common.add_argument(
+        "--evader-engine",
+        choices=["minimax", "mcts"],
+        default=None,
+        help="move chooser of the evader, to pit the engines against each other",
+    )
+    common.add_argument(
+        "--mcts-iterations",
+        type=int,
+        default=2000,
+        help="most MCTS iterations per move",
+    )
+    common.add_argument(
+        "--mcts-time",
+        type=float,
+        default=None,
+        help="most wall-clock seconds per MCTS move; the recorded search seconds are CPU time, so match it to minimax's seconds per move only for single-worker MCTS",
+    )
+    common.add_argument(
+        "--max-nodes",
+        type=int,
+        default=None,
+        help="most game tree nodes per minimax move; deeper trees degrade as --on-budget says",
+    )
+    common.add_argument(
+        "--on-budget",
+        choices=["shallower", "stream"],
+        default="shallower",
+        help="over --max-nodes, search a shallower tree, or expand the full depth while searching",
+    )
+    common.add_argument(
+        "--reduce-after",
+        type=int,
+        default=None,
+        help="search all but this many children of each node a ply shallower, re-searching any that improve",
+    )
+    common.add_argument(
+        "--extend-within",
+        type=int,
+        default=None,
+        help="search a ply deeper where the agents are at most this far apart",
+    )
+    common.add_argument(
+        "--evaluator",
+        default=None,
+        metavar="NPZ",
+        help="score minimax leaves with a model saved by learned_eval instead of the distance",
+    )
+    common.add_argument(
+        "--cache-dir",
+        default=None,
+        help="keep per-map distance tables here, so reruns on the same seeds skip precomputation",
+    )
+    common.add_argument(
+        "--profile",
+        default=None,
+        metavar="DIR",
+        help="profile every phase of every game and write reports, pstats and flamegraph stacks here",
+    )
+    common.add_argument("--output", default="-", help="record file, or - for stdout")
+    common.add_argument(
+        "--format",
+        choices=["csv", "jsonl", "parquet"],
+        default=None,
+        help="record format; inferred from the output extension by default",
+    )
+    common.add_argument(
+        "--verbose", action="store_true", help="print the turn-by-turn game log"
+    )
+
+    parser = argparse.ArgumentParser(prog="cli", description=__doc__.split("\n")[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", parents=[common], help="play games")
+    run.add_argument("--density", type=float, default=0.2)
+    run.add_argument("--depth", type=int, default=3)
+    run.add_argument(
+        "--record", action="store_true", help="save a GIF of every game to docs/"
+    )
+
+    sweep = commands.add_parser(
+        "sweep", parents=[common], help="play games over a density/depth grid"
+    )
+    sweep.add_argument("--densities", type=float, nargs="+", required=True)
+    sweep.add_argument("--depths", type=int, nargs="+", required=True)
+    sweep.add_argument("--plot", default=None, help="save the win-rate heatmaps here")
+    sweep.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="play each cell until its win rates reach --precision, instead of --games each",
+    )
+    sweep.add_argument(
+        "--precision",
+        type=float,
+        default=0.05,
+        help="target half-width of each win-rate confidence interval",
+    )
+    sweep.add_argument("--confidence", type=float, default=0.95)
+    sweep.add_argument(
+        "--min-games", type=int, default=10, help="games per cell before it may stop"
+    )
+    sweep.add_argument(
+        "--max-games", type=int, default=500, help="games after which a cell stops"
+    )
+    sweep.add_argument(
+        "--batch-size", type=int, default=10, help="most games per cell per round"
+    )
+    sweep.set_defaults(record=False)
+
+    bench = commands.add_parser(
+        "bench", parents=[common], help="time games at a single setting"
+    )
+    bench.add_argument("--density", type=float, default=0.2)
+    bench.add_argument("--depth", type=int, default=3)
+    bench.set_defaults(record=False)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "sweep":
+        configs = build_configs(args, args.densities, args.depths)
+    else:
+        configs = build_configs(args, [args.density], [args.depth])
+
+    with RecordWriter(args.output, args.format) as writer:
+        start = time.perf_counter()
+        if args.command == "sweep" and args.adaptive:
+            records = run_adaptive(args, writer)
+        else:
+            records = run_games(configs, writer, workers=args.workers)
+        elapsed = time.perf_counter() - start
+
+    summarize(records)
+    if args.profile is not None:
+        merged = os.path.join(args.profile, "merged.collapsed")
+        merge_collapsed([os.path.join(args.profile, "game-*.collapsed")], merged)
+        print(f"flamegraph stacks of all games: {merged}", file=sys.stderr)
+    if args.command == "bench":
+        turns = sum(r["turns"] for r in records)
+        print(
+            f"{len(records)} games, {turns} turns in {elapsed:.3f}s "
+            f"({elapsed / max(turns, 1) * 1000:.2f} ms/turn wall clock)",
+            file=sys.stderr,
+        )
+    if args.command == "sweep" and args.plot is not None:
+        plot_sweep(to_sweep_table(records), path=args.plot)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 """ """
 
-from collections import deque
+from collections import OrderedDict, deque
+import heapq
+from typing import Optional
 import numpy as np
 import random
 import math
 
+from bitboard import Bitboard, wavefront_distance, wavefront_field
+from movement import MovementModel, FOUR_CONNECTED, EIGHT_CONNECTED, neighbor_table
 from utils import Occupancy, Role, CellIndex, Action, role_to_occupancy
 
 
@@ -13,50 +17,214 @@ class Environment:
     The Environment class models the occupancy grid playing field that the two agents traverse as they compete.
 
     Attributes:
-        _graph (nparray): The occupancy grid where the game state is stored.
-        _size (int): The dimensions of the square environment.
+        _graph (nparray): The occupancy grid where the game state is stored, as uint8 Occupancy values.
+        _rows (int): The number of rows in the environment.
+        _cols (int): The number of columns in the environment.
+        use_bitboard (bool): Answer distance fields and distance and adjacency queries with bit-packed wavefronts instead of cell-by-cell BFS, on unweighted 4-connected maps. GameState and the sweeps generate maps without it; hand GameState an environment built with it to play on bitboards.
+        dynamic (bool): Answer distance queries from cached distance fields, and repair those fields incrementally when obstacles are added or removed.
+        repaired_cells (int): Number of field entries revisited by the last incremental repair.
+        movement (MovementModel): The moves agents may make, and what straight and diagonal steps cost.
+        terrain (nparray): Cost of entering each cell, or None when every cell costs the same.
+        field_cache (int): Most distance fields to keep, least recently used first out.
+        map_version (int): Counts changes to the obstacles or terrain, so that caches kept outside the environment can tell when their distances went stale.
     """
 
     def __init__(
         self,
-        size: int,
+        size,
         density: float,
         pursuant_pos: CellIndex,
         evader_pos: CellIndex,
+        rng: random.Random = None,
+        use_bitboard=False,
+        additional_agents: dict = None,
+        movement: MovementModel = FOUR_CONNECTED,
     ):
         """
         Initialize a new instance of the Environment class with obstacle density.
 
         Args:
-            size (int): The dimensions of the square environment
+            size (int | tuple[int, int]): The side length of a square environment, or its (rows, cols) dimensions
             density (float): The percentage of cells in the environment to populate with obstacles
             pursuant_pos (CellIndex): Starting position of the pursuant agent.
             evader_pos (CellIndex): Starting position of the evader agent.
-            pursuant (Occupany): A pursuant agent
-            evader (Occupany): An evader agent
+            rng (random.Random): Source of randomness for obstacle placement; defaults to the global random module.
+            use_bitboard (bool): Answer distance and adjacency queries with bitboards.
+            additional_agents (dict[Role, list[CellIndex]]): Starting positions of further team members, placed before the obstacles.
+            movement (MovementModel): The moves agents may make; 4-connected by default.
 
         """
-        # create attributes
-        self._graph = np.full((size, size), Occupancy.EMPTY, dtype=Occupancy)
-        self._size = size
+        if rng is None:
+            rng = random
+        rows, cols = (size, size) if isinstance(size, int) else size
 
-        # place agents
-        self._set(pursuant_pos, Occupancy.PURSUANT)
-        self._set(evader_pos, Occupancy.EVADER)
+        # create attributes and place agents
+        self._setup(
+            np.full((rows, cols), Occupancy.EMPTY.value, dtype=np.uint8),
+            pursuant_pos,
+            evader_pos,
+            use_bitboard,
+            movement,
+        )
+        for agent, cells in (additional_agents or {}).items():
+            self.add_agents(agent, cells)
 
         # place obstacles based on density
-        for _ in range(0, math.floor(size**2 * density)):
+        for _ in range(0, math.floor(rows * cols * density)):
             while True:
-                row = random.randint(0, size - 1)
-                col = random.randint(0, size - 1)
+                row = rng.randint(0, rows - 1)
+                col = rng.randint(0, cols - 1)
                 # Check if CellIndex is empty (including agent occupancy)
-                if self._graph[row][col] == Occupancy.EMPTY:
-                    self._graph[row][col] = Occupancy.OBSTACLE
+                if self._graph[row][col] == Occupancy.EMPTY.value:
+                    self._graph[row][col] = Occupancy.OBSTACLE.value
                     break
 
+    @classmethod
+    def from_array(
+        cls,
+        obstacles: np.ndarray,
+        pursuant_pos: CellIndex,
+        evader_pos: CellIndex,
+        use_bitboard=False,
+        movement: MovementModel = FOUR_CONNECTED,
+    ) -> "Environment":
+        """
+        Build an environment directly from an obstacle array, such as a loaded occupancy map.
+        The array is copied, since the agents are written into the grid. Only a copy-on-write memory map (a .npy opened with mmap_mode="c", as load_occupancy_map does) of uint8 or bool cells is used in place: it stays on disk until cells are written, and writes never reach the file. Such a map is trusted to hold only 0 and 1, since checking every cell would read the whole file; only the agents' start cells are checked.
+
+        Args:
+            obstacles (nparray): Grid that is nonzero (or True) where a cell holds an obstacle.
+            pursuant_pos (CellIndex): Starting position of the pursuant agent.
+            evader_pos (CellIndex): Starting position of the evader agent.
+            use_bitboard (bool): Answer distance and adjacency queries with bitboards.
+            movement (MovementModel): The moves agents may make; 4-connected by default.
+
+        Raises:
+            ValueError: If the grid is not two-dimensional or an agent starts on an obstacle, or on a cell of a memory-mapped grid that is neither 0 nor 1.
+        """
+        if obstacles.ndim != 2:
+            raise ValueError(f"Expected a 2D grid, got shape {obstacles.shape}")
+
+        if (
+            isinstance(obstacles, np.memmap)
+            and obstacles.mode == "c"
+            and obstacles.dtype in (bool, np.uint8)
+        ):
+            graph = obstacles.view(np.uint8)
+        elif obstacles.dtype == bool:
+            graph = obstacles.astype(np.uint8)
+        else:
+            # one pass that both copies the grid and maps any nonzero cell to 1
+            graph = (obstacles != 0).astype(np.uint8)
+
+        for cell in (pursuant_pos, evader_pos):
+            if graph[cell.row, cell.col] == Occupancy.OBSTACLE.value:
+                raise ValueError(f"Agent start {cell} is an obstacle")
+            if graph[cell.row, cell.col] != Occupancy.EMPTY.value:
+                raise ValueError(f"Agent start {cell} is neither free nor an obstacle")
+
+        env = cls.__new__(cls)
+        env._setup(graph, pursuant_pos, evader_pos, use_bitboard, movement)
+        return env
+
+    def _setup(
+        self,
+        graph: np.ndarray,
+        pursuant_pos: CellIndex,
+        evader_pos: CellIndex,
+        use_bitboard: bool,
+        movement: MovementModel,
+    ):
+        """
+        Adopt a grid of Occupancy values and place both agents on it.
+        """
+        self._graph = graph
+        self._rows, self._cols = graph.shape
+        self._components = None  # connected-component labels, built on first use
+        self._passable = None  # bit-packed non-obstacle cells, built on first use
+        self._fields = OrderedDict()  # distance fields, keyed by source cell, least recently used first
+        self.field_cache = 4096
+        self.map_version = 0
+        self._table = None  # neighbor table of the movement model, built on first use
+        self._distance_table = None  # precomputed fields, e.g. shared between processes
+        self._adjacency = None  # the same table as lists, for cell-by-cell searches
+        self._obstacle_sums = None  # summed-area table of obstacles, built on first use
+        self.movement = movement
+        # whether distances across obstacle-free rectangles can be read off the coordinates
+        self._clear_shortcut = set(movement.actions) in (
+            set(FOUR_CONNECTED.actions),
+            set(EIGHT_CONNECTED.actions),
+        )
+        self.terrain = None
+        self.use_bitboard = use_bitboard
+        self.dynamic = False
+        self.repaired_cells = 0
+        self._undo = []  # (occupancy, origin, destination) of each move made with make_move, latest last
+        # whether the grid, and the tables derived from its obstacles, may be shared with a clone
+        self._shared_graph = False
+        self._shared_tables = False
+
+        # place agents
+        self._set(pursuant_pos, Occupancy.PURSUANT)
+        self._set(evader_pos, Occupancy.EVADER)
+
     @property
     def size(self):
-        return self._size
+        """
+        The side length of a square environment. For rectangular environments this is the longer side; use shape for both dimensions.
+        """
+        return max(self._rows, self._cols)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self._rows, self._cols)
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def cols(self):
+        return self._cols
+
+    @property
+    def is_weighted(self) -> bool:
+        """
+        Whether steps differ in cost, so distances need Dijkstra's algorithm rather than breadth-first search.
+        """
+        return self.terrain is not None or not self.movement.unit_cost
+
+    def set_terrain(self, costs: Optional[np.ndarray]):
+        """
+        Give every cell a cost of entering it, e.g. to make mud or sand slower than pavement. A step costs the entered cell's cost, times the diagonal cost of the movement model for diagonal steps.
+
+        Args:
+            costs (nparray): Positive costs shaped like the grid, or None to make every step cost the same again.
+
+        Raises:
+            ValueError: If the costs do not match the grid or are not all positive.
+        """
+        if costs is not None:
+            costs = np.ascontiguousarray(costs, dtype=np.float64)
+            if costs.shape != self.shape:
+                raise ValueError(
+                    f"Expected terrain costs shaped {self.shape}, got {costs.shape}"
+                )
+            if not (costs > 0).all():
+                raise ValueError("Terrain costs must be positive")
+        self.terrain = costs
+        self.map_version += 1
+        self._fields = OrderedDict()
+        self._distance_table = None
+
+    def distance_bound(self) -> float:
+        """
+        Return a distance no path on this map can reach, for scoring positions where the agents cannot reach each other.
+        """
+        bound = self._rows * self._cols * max(self.movement.step_costs())
+        if self.terrain is not None:
+            bound *= float(self.terrain.max())
+        return bound if self.is_weighted else int(bound)
 
     def place_additional_obstacles(self, obstacles: list[CellIndex]) -> list[CellIndex]:
         """
@@ -74,33 +242,156 @@ class Environment:
             if self.is_within_bounds(obs) and self._get(obs) == Occupancy.EMPTY:
                 self._set(obs, Occupancy.OBSTACLE)
                 placed_obstacles.append(obs)
+
+        if placed_obstacles:
+            self._obstacles_changed(placed=placed_obstacles)
         return placed_obstacles
 
-    def move_agent(self, agent: Role, action: Action) -> bool:
+    def remove_obstacles(self, obstacles: list[CellIndex]) -> list[CellIndex]:
+        """
+        Clear obstacles from the world, e.g. when a door opens. Cells that are out of bounds or hold no obstacle are skipped.
+
+        Args:
+            obstacles (list[CellIndex]): the obstacles to remove
+
+        Returns:
+            A list of the obstacles that were actually removed.
+        """
+        removed_obstacles = []
+        for obs in obstacles:
+            if self.is_within_bounds(obs) and self._get(obs) == Occupancy.OBSTACLE:
+                self._set(obs, Occupancy.EMPTY)
+                removed_obstacles.append(obs)
+
+        if removed_obstacles:
+            self._obstacles_changed(removed=removed_obstacles)
+        return removed_obstacles
+
+    def add_agents(self, agent: Role, cells: list[CellIndex]) -> list[CellIndex]:
+        """
+        Place additional agents of one side, for games between teams. Cells that are out of bounds or occupied are skipped.
+
+        Args:
+            agent (Role): the side the new agents play for
+            cells (list[CellIndex]): where to place them
+
+        Returns:
+            A list of the cells where agents were actually placed.
+        """
+        placed = []
+        for cell in cells:
+            if self.is_within_bounds(cell) and self._get(cell) == Occupancy.EMPTY:
+                self._set(cell, role_to_occupancy(agent))
+                placed.append(cell)
+        return placed
+
+    def move_agent(self, agent: Role, action: Action, origin: CellIndex = None) -> bool:
         """
-        Move an agent from one place to another.
+        Move an agent from one place to another. The move must be one the movement model allows, as listed by the neighbor table, onto an empty cell.
 
         Args:
             agent (Role): agent to move
             action (Action): action to enact
+            origin (CellIndex): cell of the agent to move, when its side has more than one agent
 
         Returns:
             The success of the operation.
         """
         # fail if dest is not empty
-        cur_pos = self.get_agent_cell(agent)
+        cur_pos = self.get_agent_cell(agent) if origin is None else origin
+        if self._get(cur_pos) != role_to_occupancy(agent):
+            print("Illegal move action!")
+            return False
         new_pos = CellIndex(
             cur_pos.row + action.value.dy, cur_pos.col + action.value.dx
         )
         if self._get(new_pos) != Occupancy.EMPTY:
             print("Illegal move action!")
             return False
+        reachable = self.get_neighbor_table()[cur_pos.row * self._cols + cur_pos.col]
+        if new_pos.row * self._cols + new_pos.col not in reachable:
+            print("Illegal move action!")
+            return False
 
         # move the agent
         self._set(cur_pos, Occupancy.EMPTY)
         self._set(new_pos, role_to_occupancy(agent))
         return True
 
+    def make_move(self, agent: Role, action: Action, origin: CellIndex = None) -> bool:
+        """
+        Move an agent and remember the move, so unmake_move can take it back; for simulating play without copying the field. Unlike move_agent, an illegal move fails silently, since searches try them routinely. A move is legal if the movement model allows it, as listed by the neighbor table, and the destination is empty.
+
+        Args:
+            agent (Role): agent to move
+            action (Action): action to enact, or None to pass, which is undone like any other move
+            origin (CellIndex): cell of the agent to move; found by scanning the grid if not given
+
+        Returns:
+            Whether the move was legal and made. Illegal moves are not remembered.
+        """
+        if action is None:
+            self._undo.append(None)
+            return True
+        cur_pos = self.get_agent_cell(agent) if origin is None else origin
+        occupancy = role_to_occupancy(agent)
+        new_pos = CellIndex(
+            cur_pos.row + action.value.dy, cur_pos.col + action.value.dx
+        )
+        if not (
+            self.is_within_bounds(cur_pos)
+            and self.is_within_bounds(new_pos)
+            and self._graph[cur_pos.row, cur_pos.col] == occupancy.value
+            and self._graph[new_pos.row, new_pos.col] == Occupancy.EMPTY.value
+        ):
+            return False
+        # the table leaves out moves the model lacks, and diagonals that cut corners
+        reachable = self.get_neighbor_table()[cur_pos.row * self._cols + cur_pos.col]
+        if new_pos.row * self._cols + new_pos.col not in reachable:
+            return False
+
+        self._set(cur_pos, Occupancy.EMPTY)
+        self._set(new_pos, occupancy)
+        self._undo.append((occupancy, cur_pos, new_pos))
+        return True
+
+    def unmake_move(self):
+        """
+        Take back the latest move made with make_move.
+
+        Raises:
+            IndexError: If there is no move left to take back.
+        """
+        if not self._undo:
+            raise IndexError("No move to unmake")
+        move = self._undo.pop()
+        if move is None:
+            return
+        occupancy, origin, destination = move
+        self._set(destination, Occupancy.EMPTY)
+        self._set(origin, occupancy)
+
+    @property
+    def moves_made(self) -> int:
+        """
+        Moves made with make_move and not yet taken back.
+        """
+        return len(self._undo)
+
+    def clone(self) -> "Environment":
+        """
+        Return an independent copy of the environment that costs next to nothing until it is changed. The grid, neighbor table, obstacle sums and distance fields are shared copy-on-write: whichever of the two environments first moves an agent copies the grid, and whichever first adds or removes an obstacle copies the tables. The clone starts with no moves to unmake.
+
+        Returns:
+            The copy, which can be handed to another thread or simulated on while this one is left untouched.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone._undo = []
+        self._shared_graph = clone._shared_graph = True
+        self._shared_tables = clone._shared_tables = True
+        return clone
+
     def get_agent_cell(self, agent: Role) -> CellIndex:
         """
         Find and return an agent's location in the environment.
@@ -111,12 +402,26 @@ class Environment:
         Returns:
             The index of the cell where the agent is located.
         """
-        agent = role_to_occupancy(agent)
-        for i, r in enumerate(self._graph):
-            if agent in r:
-                return CellIndex(i, np.where(r == agent)[0])
-        print("Agent could not be found")
-        return None
+        found = np.flatnonzero(self._graph == role_to_occupancy(agent).value)
+        if len(found) == 0:
+            print("Agent could not be found")
+            return None
+        return CellIndex(*divmod(int(found[0]), self._cols))
+
+    def get_agent_cells(self, agent: Role) -> list[CellIndex]:
+        """
+        Find every agent of one side, in row-major order.
+
+        Args:
+            agent (Role): The side to locate.
+
+        Returns:
+            The index of each cell holding an agent of that side.
+        """
+        return [
+            CellIndex(i, j)
+            for i, j in np.argwhere(self._graph == role_to_occupancy(agent).value)
+        ]
 
     def get_obstacle_cells(self) -> list[CellIndex]:
         """
@@ -125,31 +430,27 @@ class Environment:
         Returns:
             A list of all obstacle-occupied cells in the environment.
         """
-        obstacles = []
-        for i in range(0, self._size):
-            for j in range(0, self._size):
-                if self._get(CellIndex(i, j)) == Occupancy.OBSTACLE:
-                    obstacles.append(CellIndex(i, j))
-        return obstacles
+        return [
+            CellIndex(i, j)
+            for i, j in np.argwhere(self._graph == Occupancy.OBSTACLE.value)
+        ]
 
     def get_neighbors(self, cell: CellIndex) -> list[CellIndex]:
         """
-        Provide a list of non-obstacle cells around the given cell.
+        Provide a list of non-obstacle cells one move away from the given cell, under the movement model.
 
         Args:
             cell (CellIndex): Index of cell to find neighbors of.
 
         Returns:
-            A list containing the index of every non-obstacle cell adjacent to cell.
+            A list containing the index of every non-obstacle cell adjacent to cell, in the order of the movement model's actions.
         """
-        neighbors = []
-        offsets = [(0, -1), (0, 1), (-1, 0), (1, 0)]
-        for offset in offsets:
-            neighbor = CellIndex(cell.row + offset[0], cell.col + offset[1])
-            if self.is_within_bounds(neighbor):
-                if self._get(neighbor) != Occupancy.OBSTACLE:
-                    neighbors.append(neighbor)
-        return neighbors
+        if not self.is_within_bounds(cell):
+            return []
+        return [
+            CellIndex(*divmod(n, self._cols))
+            for n in self._get_adjacency()[cell.row * self._cols + cell.col]
+        ]
 
     def get_valid_moves(self, agent: Role) -> list[CellIndex]:
         """
@@ -170,7 +471,8 @@ class Environment:
 
     def get_shortest_distance(self, cell1: CellIndex, cell2: CellIndex):
         """
-        Return the number of steps between the given cells, accounting for obstacles. Found using breadth-first search.
+        Return the number of steps between the given cells, accounting for obstacles. Found using breadth-first search, or Dijkstra's algorithm when steps differ in cost, in which case the distance is the total cost of the cheapest path.
+        When no obstacle lies in the rectangle spanned by the cells, a path inside it is as short as any, so the distance is read off the coordinates (Manhattan for 4-connected moves, Chebyshev for 8-connected) without searching.
 
         Args:
             cell1: Starting point of BFS distance
@@ -181,6 +483,26 @@ class Environment:
             print("cells are not valid!")
             return None
 
+        if (
+            self._clear_shortcut
+            and not self.is_weighted
+            and self.count_obstacles(cell1, cell2) == 0
+        ):
+            dy, dx = abs(cell1.row - cell2.row), abs(cell1.col - cell2.col)
+            return max(dy, dx) if self.movement.diagonal else dy + dx
+
+        if self.dynamic or self._distance_table is not None:
+            dist = self.get_distance_field(cell1)[cell2.row, cell2.col]
+            return None if dist < 0 else dist.item()
+
+        if self.is_weighted:
+            goal = cell2.row * self._cols + cell2.col
+            dist = self._dijkstra(cell1, goal)[goal]
+            return None if dist < 0 else dist.item()
+
+        if self.use_bitboard and self.movement == FOUR_CONNECTED:
+            return wavefront_distance(self.get_bitboard(), cell1, cell2)
+
         # breadth-first search
         visited = set([cell1])
         queue = deque([(cell1, 0)])  # store (node, distance)
@@ -198,6 +520,176 @@ class Environment:
         # no path found
         return None
 
+    def get_distance_field(self, cell: CellIndex, cache=True) -> np.ndarray:
+        """
+        Return the number of steps from a cell to every cell of the map, found with one full breadth-first search (a bitboard wavefront with use_bitboard) and cached, up to field_cache fields, until obstacles are added. When steps differ in cost, the field holds path costs found with Dijkstra's algorithm instead.
+
+        Args:
+            cell (CellIndex): Source of the distances.
+            cache (bool): Whether to keep a newly computed field for later calls.
+
+        Returns:
+            An integer grid of distances (float for weighted maps), with -1 where the source cannot be reached from.
+        """
+        # pop and reinsert rather than move_to_end, since clones share the cache
+        field = self._fields.pop(cell, None)
+        if field is not None:
+            self._fields[cell] = field
+            return field
+        if self._distance_table is not None:
+            field = self._distance_table.get(cell)
+        if field is None:
+            if self.is_weighted:
+                field = self._dijkstra(cell).reshape(self._rows, self._cols)
+            elif self.use_bitboard and self.movement == FOUR_CONNECTED:
+                field = wavefront_field(self.get_bitboard(), cell)
+            else:
+                field = self._bfs_field(cell)
+            if cache:
+                self._fields[cell] = field
+                while len(self._fields) > self.field_cache:
+                    self._fields.popitem(last=False)
+        return field
+
+    def get_team_distance(
+        self, pursuants: list[CellIndex], evaders: list[CellIndex]
+    ) -> int:
+        """
+        Return the distance between the closest pursuant and evader, from one lookup per pursuant field instead of a BFS per pair.
+
+        Args:
+            pursuants (list[CellIndex]): Cells of the pursuing team.
+            evaders (list[CellIndex]): Cells of the evading team.
+
+        Returns:
+            The smallest pursuant-evader distance, or None if no pursuant can reach any evader.
+        """
+        fields = np.stack([self.get_distance_field(p) for p in pursuants])
+        rows = [e.row for e in evaders]
+        cols = [e.col for e in evaders]
+        pairwise = fields[:, rows, cols]
+        reachable = pairwise[pairwise >= 0]
+        if reachable.size == 0:
+            return None
+        return reachable.min().item()
+
+    def use_precomputed(
+        self,
+        components: np.ndarray = None,
+        neighbor_table: np.ndarray = None,
+        distances: "DistanceTable" = None,
+    ):
+        """
+        Adopt tables computed elsewhere for this exact map and movement model, e.g. attached from shared memory, instead of building them. The arrays are only read, so read-only views work; once obstacles change they are dropped and rebuilt as usual.
+
+        Args:
+            components (nparray): Component labels, as from get_component_labels.
+            neighbor_table (nparray): Neighbor table, as from get_neighbor_table.
+            distances (DistanceTable): Distance fields for some or all source cells.
+        """
+        if components is not None:
+            self._components = components
+        if neighbor_table is not None:
+            self._table = neighbor_table
+            self._adjacency = None
+        if distances is not None:
+            self._distance_table = distances
+
+    def get_neighbor_table(self) -> np.ndarray:
+        """
+        Provide the flat index of every cell one move away from each cell under the movement model, built once per map and patched locally when obstacles change.
+
+        Returns:
+            An array shaped (rows * cols, number of actions), with -1 where a move is not possible.
+        """
+        if self._table is None:
+            self._table = neighbor_table(
+                self._graph == Occupancy.OBSTACLE.value, self.movement
+            )
+        return self._table
+
+    def get_obstacle_sums(self) -> np.ndarray:
+        """
+        Provide the summed-area table of the obstacles, built once per map and updated in place when obstacles change.
+
+        Returns:
+            An integer array shaped (rows + 1, cols + 1), whose entry (r, c) counts the obstacles in rows above r and columns left of c.
+        """
+        if self._obstacle_sums is None:
+            sums = np.zeros((self._rows + 1, self._cols + 1), dtype=np.int32)
+            blocked = self._graph == Occupancy.OBSTACLE.value
+            np.cumsum(np.cumsum(blocked, axis=0), axis=1, out=sums[1:, 1:])
+            self._obstacle_sums = sums
+        return self._obstacle_sums
+
+    def count_obstacles(self, cell1: CellIndex, cell2: CellIndex) -> int:
+        """
+        Count the obstacles in the rectangle with the given cells as opposite corners, from four lookups in the summed-area table.
+
+        Args:
+            cell1 (CellIndex): One corner of the rectangle.
+            cell2 (CellIndex): The opposite corner.
+
+        Returns:
+            The number of obstacle cells in the rectangle, corners included.
+        """
+        top, bottom = min(cell1.row, cell2.row), max(cell1.row, cell2.row) + 1
+        left, right = min(cell1.col, cell2.col), max(cell1.col, cell2.col) + 1
+        sums = self.get_obstacle_sums()
+        return int(
+            sums[bottom, right] - sums[top, right] - sums[bottom, left] + sums[top, left]
+        )
+
+    def get_bitboard(self) -> Bitboard:
+        """
+        Provide the non-obstacle cells packed into a bitboard, built once per map and reused until obstacles are added.
+        """
+        if self._passable is None:
+            self._passable = Bitboard.from_mask(
+                self._graph != Occupancy.OBSTACLE.value
+            )
+        return self._passable
+
+    def get_component_labels(self) -> np.ndarray:
+        """
+        Label every connected region of non-obstacle cells. The labelling is computed once per map and reused until obstacles are added.
+
+        Returns:
+            An integer array shaped like the grid, where cells sharing a label can reach each other and obstacle cells are labelled -1.
+        """
+        if self._components is None:
+            self._components = label_components(
+                self._graph != Occupancy.OBSTACLE.value,
+                None if self.movement == FOUR_CONNECTED else self.get_neighbor_table(),
+            )
+        return self._components
+
+    def is_reachable(self, cell1: CellIndex, cell2: CellIndex) -> bool:
+        """
+        Check if a path exists between two cells, without searching for it.
+
+        Args:
+            cell1 (CellIndex): One end of the path.
+            cell2 (CellIndex): The other end of the path.
+
+        Returns:
+            Whether or not both cells lie in the same connected region.
+        """
+        if not self.is_within_bounds(cell1) or not self.is_within_bounds(cell2):
+            return False
+        labels = self.get_component_labels()
+        label = labels[cell1.row, cell1.col]
+        return bool(label >= 0 and label == labels[cell2.row, cell2.col])
+
+    def is_traversable(self) -> bool:
+        """
+        Return if the pursuant can reach the evader at all. With teams, this is true when any pursuant can reach any evader.
+        """
+        labels = self.get_component_labels()
+        pursuants = labels[self._graph == Occupancy.PURSUANT.value]
+        evaders = labels[self._graph == Occupancy.EVADER.value]
+        return bool(np.isin(pursuants, evaders).any())
+
     def is_within_bounds(self, cell: CellIndex):
         """
         Check if the given cell index is within the bounds of the environment.
@@ -208,23 +700,267 @@ class Environment:
         Returns:
             Whether or not the cell is within the grid.
         """
-        return 0 <= cell.row < self._size and 0 <= cell.col < self._size
+        return 0 <= cell.row < self._rows and 0 <= cell.col < self._cols
 
     def is_agent_adjacent(self):
         """
-        Return if the agents are adjacent.
+        Return if the agents are adjacent, i.e. a pursuant could step onto an evader. With teams, this is true when any pursuant is adjacent to any evader.
         """
-        # on top of each other returns true
-        if self.get_agent_cell(Role.PURSUANT) == self.get_agent_cell(Role.EVADER):
-            return True
+        pursuants = self._graph == Occupancy.PURSUANT.value
+        evaders = self._graph == Occupancy.EVADER.value
+
+        if self.movement != FOUR_CONNECTED:
+            # look up the neighbors of every pursuant at once
+            reach = self.get_neighbor_table()[np.flatnonzero(pursuants)]
+            return bool(evaders.ravel()[reach[reach >= 0]].any())
+
+        if self.use_bitboard:
+            # an evader must lie in the pursuants' one-step neighborhood
+            reach = Bitboard.from_mask(pursuants).dilate()
+            return (reach & Bitboard.from_mask(evaders)).any()
+
+        # grow every pursuant by one cell in each direction
+        reach = pursuants.copy()
+        reach[1:] |= pursuants[:-1]
+        reach[:-1] |= pursuants[1:]
+        reach[:, 1:] |= pursuants[:, :-1]
+        reach[:, :-1] |= pursuants[:, 1:]
+        return bool((reach & evaders).any())
+
+    def snapshot(self) -> np.ndarray:
+        """
+        Return a copy of the whole field, for the game history and recordings.
+        """
+        return self._graph.copy()
+
+    def _obstacles_changed(self, placed=(), removed=()):
+        """
+        Update everything derived from the obstacle layout. Labels and bitboards are rebuilt on next use, and the neighbor table and obstacle sums are patched for the changed cells. Distance fields are repaired in place in dynamic mode, and dropped otherwise; weighted fields are always dropped, since the repair relies on unit-cost steps.
+
+        Args:
+            placed (list[CellIndex]): cells that just became obstacles
+            removed (list[CellIndex]): cells that just stopped being obstacles
+        """
+        self.map_version += 1
+        if self._shared_tables:
+            # a clone may be reading the tables patched below
+            self._shared_tables = False
+            if self._table is not None:
+                self._table = self._table.copy()
+            self._adjacency = None
+            if self._obstacle_sums is not None:
+                self._obstacle_sums = self._obstacle_sums.copy()
+            if self.dynamic:
+                self._fields = OrderedDict(
+                    (source, f.copy()) for source, f in self._fields.items()
+                )
+        self._components = None
+        self._passable = None
+        self._distance_table = None
+        if self._table is not None and not self._table.flags.writeable:
+            # an adopted read-only table cannot be patched; rebuild it on next use
+            self._table = None
+            self._adjacency = None
+        if self._table is not None:
+            self._update_neighbor_table(list(placed) + list(removed))
+        if self._obstacle_sums is not None:
+            # every sum over a rectangle reaching past a changed cell shifts by one
+            for cell in placed:
+                self._obstacle_sums[cell.row + 1 :, cell.col + 1 :] += 1
+            for cell in removed:
+                self._obstacle_sums[cell.row + 1 :, cell.col + 1 :] -= 1
+        if not self.dynamic or self.is_weighted:
+            self._fields = OrderedDict()
+            return
+
+        self.repaired_cells = 0
+        for source in list(self._fields):
+            if self._graph[source.row, source.col] == Occupancy.OBSTACLE.value:
+                # fields from inside an obstacle are rare; rebuild them on demand
+                del self._fields[source]
+                continue
+            if placed:
+                self.repaired_cells += self._repair_after_insertion(
+                    self._fields[source].reshape(-1), placed
+                )
+            if removed:
+                self.repaired_cells += self._repair_after_removal(
+                    self._fields[source].reshape(-1), removed
+                )
+
+    def _repair_after_insertion(self, field: np.ndarray, placed: list) -> int:
+        """
+        Repair a flattened distance field after cells became obstacles. Distances can only grow, and only for cells whose every shortest path ran through a new obstacle, or along a diagonal it now blocks: those orphans are found in order of their old distance, then re-settled Dijkstra-style from the unaffected cells around them.
+
+        Returns:
+            The number of cells whose distance was recomputed.
+        """
+        adjacency = self._get_adjacency()
+        orphaned = set()
+        candidates = []
+        for cell in placed:
+            field[cell.row * self._cols + cell.col] = -1
+        # every edge that disappeared has both ends next to a new obstacle
+        for n in self._cells_around(placed):
+            if field[n] > 0:
+                heapq.heappush(candidates, (int(field[n]), n))
+
+        # find the cells that lost all of their shortest-path parents
+        while candidates:
+            dist, cell = heapq.heappop(candidates)
+            if cell in orphaned or field[cell] != dist:
+                continue
+            supported = any(
+                field[n] == dist - 1 and n not in orphaned for n in adjacency[cell]
+            )
+            if supported:
+                continue
+            orphaned.add(cell)
+            for n in adjacency[cell]:
+                if field[n] == dist + 1:
+                    heapq.heappush(candidates, (dist + 1, n))
+
+        # re-settle the orphans from their unaffected neighbors
+        frontier = []
+        for cell in orphaned:
+            field[cell] = -1
+        for cell in orphaned:
+            best = [
+                field[n] + 1
+                for n in adjacency[cell]
+                if n not in orphaned and field[n] >= 0
+            ]
+            if best:
+                heapq.heappush(frontier, (int(min(best)), cell))
+        while frontier:
+            dist, cell = heapq.heappop(frontier)
+            if field[cell] >= 0:
+                continue
+            field[cell] = dist
+            for n in adjacency[cell]:
+                if n in orphaned and field[n] < 0:
+                    heapq.heappush(frontier, (dist + 1, n))
+        return len(orphaned)
+
+    def _repair_after_removal(self, field: np.ndarray, removed: list) -> int:
+        """
+        Repair a flattened distance field after obstacles were cleared. Distances can only shrink, so the cells around the opened ones, whose edges may be new, are settled from their neighbors and any improvement is propagated outward until it stops paying off.
+
+        Returns:
+            The number of cells whose distance improved.
+        """
+        adjacency = self._get_adjacency()
+        blocked = self._graph.ravel() == Occupancy.OBSTACLE.value
+        frontier = []
+        for cell in self._cells_around(removed):
+            if blocked[cell]:
+                continue
+            best = [field[n] + 1 for n in adjacency[cell] if field[n] >= 0]
+            if best:
+                heapq.heappush(frontier, (int(min(best)), cell))
+
+        improved = 0
+        while frontier:
+            dist, cell = heapq.heappop(frontier)
+            if 0 <= field[cell] <= dist:
+                continue
+            field[cell] = dist
+            improved += 1
+            for n in adjacency[cell]:
+                if field[n] < 0 or field[n] > dist + 1:
+                    heapq.heappush(frontier, (dist + 1, n))
+        return improved
+
+    def _cells_around(self, cells: list) -> list[int]:
+        """
+        List the flat indices of the given cells and every cell touching them, diagonals included, in ascending order.
+        """
+        around = set()
+        for cell in cells:
+            for r in range(max(cell.row - 1, 0), min(cell.row + 2, self._rows)):
+                for c in range(max(cell.col - 1, 0), min(cell.col + 2, self._cols)):
+                    around.add(r * self._cols + c)
+        return sorted(around)
+
+    def _update_neighbor_table(self, changed: list):
+        """
+        Recompute the neighbor table rows that the changed cells can affect: their own, and those of every cell touching them, whose diagonal steps may squeeze past them.
+        """
+        index = np.array(self._cells_around(changed), dtype=np.int64)
+        self._table[index] = neighbor_table(
+            self._graph == Occupancy.OBSTACLE.value, self.movement, index
+        )
+        if self._adjacency is not None:
+            for i, row in zip(index.tolist(), self._table[index].tolist()):
+                self._adjacency[i] = [n for n in row if n >= 0]
+
+    def _get_adjacency(self) -> list[list[int]]:
+        """
+        Provide the neighbor table as one list of flat indices per cell, which is faster than the array to walk one cell at a time.
+        """
+        if self._adjacency is None:
+            self._adjacency = [
+                [n for n in row if n >= 0] for row in self.get_neighbor_table().tolist()
+            ]
+        return self._adjacency
+
+    def _bfs_field(self, cell: CellIndex) -> np.ndarray:
+        """
+        Run a breadth-first search from a cell over the whole map.
+        """
+        field = [-1] * (self._rows * self._cols)
+        if self.is_within_bounds(cell):
+            adjacency = self._get_adjacency()
+            start = cell.row * self._cols + cell.col
+            field[start] = 0
+            queue = deque([start])
+            while queue:
+                current = queue.popleft()
+                dist = field[current] + 1
+                for n in adjacency[current]:
+                    if field[n] < 0:
+                        field[n] = dist
+                        queue.append(n)
+        return np.array(field, dtype=np.int32).reshape(self._rows, self._cols)
+
+    def _dijkstra(self, cell: CellIndex, goal: int = None) -> np.ndarray:
+        """
+        Run Dijkstra's algorithm from a cell, for maps where steps differ in cost.
 
-        # adjacency returns true
-        for n in self.get_valid_moves(Role.PURSUANT):
-            if self._get(n) == Occupancy.EVADER:
-                return True
+        Args:
+            cell (CellIndex): Source of the search.
+            goal (int): Flat index at which to stop early, or None to settle the whole map.
 
-        # anything else returns false
-        return False
+        Returns:
+            A flat float array of path costs, with -1 where the source cannot be reached from. After an early stop only the goal's entry is final.
+        """
+        n_cells = self._rows * self._cols
+        costs = [math.inf] * n_cells
+        if self.is_within_bounds(cell):
+            adjacency = self._get_adjacency()
+            terrain = None if self.terrain is None else self.terrain.ravel()
+            diagonal_cost = self.movement.diagonal_cost
+            start = cell.row * self._cols + cell.col
+            costs[start] = 0.0
+            heap = [(0.0, start)]
+            while heap:
+                cost, current = heapq.heappop(heap)
+                if cost > costs[current]:
+                    continue
+                if current == goal:
+                    break
+                row, col = divmod(current, self._cols)
+                for n in adjacency[current]:
+                    n_row, n_col = divmod(n, self._cols)
+                    step = diagonal_cost if n_row != row and n_col != col else 1.0
+                    if terrain is not None:
+                        step *= float(terrain[n])
+                    if cost + step < costs[n]:
+                        costs[n] = cost + step
+                        heapq.heappush(heap, (cost + step, n))
+        field = np.array(costs)
+        field[np.isinf(field)] = -1
+        return field
 
     def _set(self, cell: CellIndex, value: Occupancy):
         """
@@ -234,7 +970,10 @@ class Environment:
         if not self.is_within_bounds(cell):
             print("Not a valid cell!")
             return
-        self._graph[cell.row][cell.col] = value
+        if self._shared_graph:
+            self._graph = self._graph.copy()
+            self._shared_graph = False
+        self._graph[cell.row][cell.col] = value.value
 
     def _get(self, cell: CellIndex) -> Occupancy:
         """
@@ -243,4 +982,106 @@ class Environment:
         if not self.is_within_bounds(cell):
             print("Not a valid cell!")
             return None
-        return self._graph[cell.row][cell.col]
+        return Occupancy(int(self._graph[cell.row][cell.col]))
+
+
+class DistanceTable:
+    """
+    Distance fields from many source cells packed into one array, such as the distances between all pairs of cells, so they can be stored or shared as a single block.
+
+    Attributes:
+        index (nparray): Integer grid giving each source cell's position in fields, or -1 for cells without a field.
+        fields (nparray): The fields, shaped (number of sources, rows, cols).
+    """
+
+    def __init__(self, index: np.ndarray, fields: np.ndarray):
+        self.index = index
+        self.fields = fields
+
+    @classmethod
+    def build(cls, env: Environment, sources: list[CellIndex] = None) -> "DistanceTable":
+        """
+        Compute the fields of an environment.
+
+        Args:
+            env (Environment): The map, with its movement model and terrain.
+            sources (list[CellIndex]): Cells to compute fields from; every non-obstacle cell by default, i.e. all pairs.
+        """
+        if sources is None:
+            sources = [
+                CellIndex(i, j)
+                for i, j in np.argwhere(env.snapshot() != Occupancy.OBSTACLE.value)
+            ]
+        index = np.full(env.shape, -1, dtype=np.int32)
+        fields = []
+        for k, cell in enumerate(sources):
+            index[cell.row, cell.col] = k
+            fields.append(env.get_distance_field(cell, cache=False))
+        if not fields:
+            return cls(index, np.empty((0,) + env.shape, dtype=np.int32))
+        return cls(index, np.stack(fields))
+
+    def get(self, cell: CellIndex) -> Optional[np.ndarray]:
+        """
+        Return the field from a cell, or None if the table has none.
+        """
+        k = self.index[cell.row, cell.col]
+        return None if k < 0 else self.fields[k]
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+
+def label_components(
+    passable: np.ndarray, neighbor_table: np.ndarray = None
+) -> np.ndarray:
+    """
+    Label the connected regions of a boolean grid with a vectorized union-find. Every adjacent pair of passable cells is an edge; each round hooks the larger root of every edge onto the smaller one, then pointer-jumps until all cells point at their root.
+
+    Args:
+        passable (nparray): Boolean grid, True where a cell can be entered.
+        neighbor_table (nparray): Flat neighbor indices per cell, as built by movement.neighbor_table, for connectivity other than the default 4-neighborhood.
+
+    Returns:
+        An integer array of the same shape with labels 0..k-1 for the k regions, and -1 for impassable cells.
+    """
+    rows, cols = passable.shape
+    index = np.arange(rows * cols).reshape(rows, cols)
+
+    if neighbor_table is None:
+        # edges between horizontally and vertically adjacent passable cells
+        horizontal = passable[:, :-1] & passable[:, 1:]
+        vertical = passable[:-1, :] & passable[1:, :]
+        u = np.concatenate([index[:, :-1][horizontal], index[:-1, :][vertical]])
+        v = np.concatenate([index[:, 1:][horizontal], index[1:, :][vertical]])
+    else:
+        # every move listed in the table from a passable cell
+        edges = (neighbor_table >= 0) & passable.reshape(-1, 1)
+        u = np.broadcast_to(index.reshape(-1, 1), neighbor_table.shape)[edges]
+        v = neighbor_table[edges]
+
+    parent = np.arange(rows * cols)
+    while True:
+        root_u = parent[u]
+        root_v = parent[v]
+        unjoined = root_u != root_v
+        if not unjoined.any():
+            break
+        # hook the larger root under the smaller one, keeping the forest acyclic
+        np.minimum.at(
+            parent,
+            np.maximum(root_u, root_v)[unjoined],
+            np.minimum(root_u, root_v)[unjoined],
+        )
+        # pointer jumping until every cell points directly at its root
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    # compress root ids into consecutive labels
+    labels = np.full(rows * cols, -1, dtype=np.int32)
+    flat_passable = passable.ravel()
+    _, labels[flat_passable] = np.unique(parent[flat_passable], return_inverse=True)
+    return labels.reshape(rows, cols)
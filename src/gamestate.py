@@ -1,9 +1,25 @@
 """Main"""
 
+import contextlib
+import math
+import random
+import time
+
 from environment import Environment
+from mcts import MCTS
 from minimax import MiniMax
+from movement import FOUR_CONNECTED
 from utils import CellIndex, Role, Node, get_adversary, derive_action
-from visualizations import gamestate_gif, gamestate_visual
+from visualizations import EpisodeRecorder
+
+# approximate memory of one game tree node with its cells and child list, for memory budgets
+NODE_BYTES = 400
+
+
+class NodeBudgetExceeded(Exception):
+    """
+    Raised while building a game tree that would hold more nodes than its budget allows.
+    """
 
 
 class GameState:
@@ -19,17 +35,79 @@ class GameState:
         depth=3,
         p_start=CellIndex(0, 0),
         e_start=CellIndex(4, 4),
+        require_connected=False,
+        max_regenerations=1000,
+        record=False,
+        seed=None,
+        env=None,
+        movement=FOUR_CONNECTED,
+        map_cache=None,
+        search="alphabeta",
+        engine="minimax",
+        evader_engine=None,
+        mcts_settings=None,
+        profiler=None,
+        max_nodes=None,
+        max_tree_bytes=None,
+        on_budget="shallower",
+        evaluator=None,
+        reduce_after=None,
+        extend_within=None,
     ):
-        # Initialize an instance of the minimax algorithm
-        self.agents = MiniMax()
-
-        # Initialize a field to play on
-        self.env = Environment(
-            size,
-            density,
-            p_start,
-            e_start,
+        # Time each phase of the game if asked to, e.g. with a profiling.PhaseProfiler
+        self.profiler = profiler
+
+        with self._phase("map"):
+            # Initialize a field to play on, unless one was given (e.g. a TiledEnvironment for large maps),
+            # redrawing it until the agents can reach each other if requested
+            rng = random.Random(seed) if seed is not None else None
+            redraw = require_connected and env is None
+            if env is None:
+                env = Environment(
+                    size,
+                    density,
+                    p_start,
+                    e_start,
+                    rng,
+                    movement=movement,
+                )
+            self.env = env
+            self.map_attempts = 1
+            while (
+                redraw
+                and not self.env.is_traversable()
+                and self.map_attempts < max_regenerations
+            ):
+                self.env = Environment(
+                    size,
+                    density,
+                    p_start,
+                    e_start,
+                    rng,
+                    movement=movement,
+                )
+                self.map_attempts += 1
+
+            # Load the map's distance tables from disk if it was played before
+            if map_cache is not None:
+                map_cache.prepare(self.env)
+
+        # Initialize an instance of the minimax algorithm, and a tree search for sides that use MCTS
+        # Leaves are scored by distance, or by a learned_eval.LearnedEvaluator if one is given;
+        # late children may be searched shallower, and sharp ones deeper than the tree
+        self.agents = MiniMax(
+            self.env,
+            evaluator=evaluator,
+            reduce_after=reduce_after,
+            extend_within=extend_within,
         )
+        self.engines = {
+            Role.PURSUANT: engine,
+            Role.EVADER: engine if evader_engine is None else evader_engine,
+        }
+        self.mcts = None
+        if "mcts" in self.engines.values():
+            self.mcts = MCTS(self.env, **(mcts_settings or {}))
 
         # Updating game attributes
         self.episode = episode
@@ -37,13 +115,27 @@ class GameState:
         self.current_turn = Role.PURSUANT  # starts with pursuant
         self.current_agent_pos = None
         self.game_history = []
+        self.recorder = EpisodeRecorder(episode) if record else None
 
         # Other tools
         self.EVADER_THRESHOLD = 25
         self.LOOKAHEAD_DEPTH = depth
         self.SMALLEST_DISTANCE = 0
-        self.GREATEST_DISTANCE = self.env.size**2
+        self.GREATEST_DISTANCE = self.env.distance_bound()
+        self.ASPIRATION_WINDOW = 2
+        self.search = search  # "alphabeta", or "pvs" for principal variation search
+        self.last_value = None  # value of the previous turn's search, the next turn's aspiration guess
         self.node_id_counter = 0
+        self.game_tree = None  # the most recently searched tree, for inspection
+        self.search_seconds = {Role.PURSUANT: 0.0, Role.EVADER: 0.0}  # CPU time spent choosing moves, MCTS worker processes included
+
+        # Cap the game tree, so a deep lookahead degrades instead of exhausting memory
+        self.max_nodes = max_nodes
+        if max_tree_bytes is not None:
+            fits = max(max_tree_bytes // NODE_BYTES, 1)
+            self.max_nodes = fits if max_nodes is None else min(max_nodes, fits)
+        self.on_budget = on_budget  # "shallower" to search a tree that fits, "stream" to expand nodes while searching
+        self.turn_stats = []  # per turn: agent, depth searched, nodes created, whether it degraded
 
     def run_loop(self) -> tuple[Role, list]:
         """
@@ -54,30 +146,25 @@ class GameState:
         """
         print(f"----------STARTING GAME #{self.episode}.-------------")
         # end immediately if field is intraversible
-        if (
-            self.env.get_shortest_distance(
-                self.env.get_agent_cell(Role.PURSUANT),
-                self.env.get_agent_cell(Role.EVADER),
-            )
-            is None
-        ):
+        if not self.env.is_traversable():
             print("------ GAME OVER. The field was intraversible. ------")
             return (None, self.game_history)
 
         # first, take a snapshot of the game field
-        self.game_history.append(self.env._graph)
-        gamestate_visual(
-            self.env._graph,
-            self.env.size,
-            self.episode,
-            self.turn_count,
-        )
+        self.snapshot()
 
         # Run game if no one has won
         while not self.is_pursuant_win() and not self.is_evader_win():
+            start = time.process_time()
             next_action = self.compute_next_move()
-            self.env.move_agent(self.current_turn, next_action)
-            self.switch_turns()
+            self.search_seconds[self.current_turn] += time.process_time() - start
+            if self.engines[self.current_turn] == "mcts":
+                self.search_seconds[self.current_turn] += self.mcts.worker_seconds
+            with self._phase("move"):
+                self.apply_move(next_action)
+                self.switch_turns()
+        if self.mcts is not None:
+            self.mcts.close()
 
         if self.is_pursuant_win():
             print("------ GAME OVER. The evader was captured. ------")
@@ -94,42 +181,115 @@ class GameState:
         self.turn_count += 1
 
         # first, take a snapshot of the game field
-        self.game_history.append(self.env._graph)
-        gamestate_visual(
-            self.env._graph,
-            self.env.size,
-            self.episode,
-            self.turn_count,
-        )
+        self.snapshot()
 
         # hand over turn and pos to adversary
         self.current_turn = get_adversary(self.current_turn)
         self.current_agent_pos = self.env.get_agent_cell(self.current_turn)
 
+    def apply_move(self, action):
+        """
+        Carry out the move chosen for the agent whose turn it is. A boxed-in agent passes.
+        """
+        if action is None:
+            return
+        self.env.move_agent(self.current_turn, action)
+
+    def snapshot(self):
+        """
+        Store a copy of the game field in the history, and add it to the episode recording if there is one.
+        """
+        field = self.env.snapshot()
+        self.game_history.append(field)
+        if self.recorder is not None:
+            with self._phase("render"):
+                self.recorder.add_frame(field)
+
     def compute_next_move(self):
         """
-        Calls the minimax algorithm to compute best move.
+        Calls the minimax algorithm, or Monte Carlo tree search for a side whose engine is "mcts", to compute best move.
         """
         print(f"T{self.turn_count}) Agent {self.current_turn}\n")
-        # build tree of possible actions
-        root_node: Node = self.build_game_tree(self.current_turn)
+        if self.engines[self.current_turn] == "mcts":
+            with self._phase("search"):
+                action, escape_rate = self.mcts.choose_move(
+                    self.current_turn, self.EVADER_THRESHOLD - self.turn_count
+                )
+            print(f"-> chose {action}, evader escapes {escape_rate:.2f} of rollouts\n")
+            return action
+
+        # build tree of possible actions, within the node budget
+        with self._phase("tree"):
+            root_node, depth, streamed = self._build_within_budget(self.current_turn)
+        with self._phase("search"):
+            # extensions and streamed trees grow nodes during the search
+            lazy = streamed or self.agents.extend_within is not None
+            self.agents.expand = self.expand_node if lazy else None
+            action = self._search_tree(root_node, depth)
+        self.turn_stats.append(
+            {
+                "turn": self.turn_count,
+                "agent": self.current_turn.name,
+                "depth": depth,
+                "nodes": self.node_id_counter,
+                "streamed": streamed,
+                "degraded": streamed or depth < self.LOOKAHEAD_DEPTH,
+            }
+        )
+        return action
+
+    def _build_within_budget(self, initial_state: Role) -> tuple[Node, int, bool]:
+        """
+        Build the game tree to the look-ahead depth, degrading if it would exceed max_nodes: either build shallower trees until one fits, or, with on_budget="stream", build only the root's children and let the search create and drop the rest of the tree as it goes, holding one path of it at a time.
+
+        Returns:
+            The root of the tree, the depth to search it to, and whether the search must expand it.
+        """
+        depth = self.LOOKAHEAD_DEPTH
+        while True:
+            try:
+                return self.build_game_tree(initial_state, depth), depth, False
+            except NodeBudgetExceeded:
+                print(f"-> a depth-{depth} tree exceeds {self.max_nodes} nodes")
+                if self.on_budget == "stream":
+                    root = self.build_game_tree(initial_state, 1)
+                    return root, self.LOOKAHEAD_DEPTH, True
+                depth -= 1
+
+    def _search_tree(self, root_node: Node, depth: int):
+        """
+        Run the configured minimax search over a built game tree and return the action of the best child.
+        """
+        self.agents.start_search(turns_left=self.EVADER_THRESHOLD - self.turn_count)
+
+        if self.search == "pvs":
+            best_child, best_distance = self.agents.search_root(
+                root_node,
+                depth,
+                guess=self.last_value,
+                window=self.ASPIRATION_WINDOW,
+            )
+            self.last_value = best_distance
+            self.game_tree = root_node
+            print(f"-> chose {best_child.action_from_parent} with value {best_distance}\n")
+            return best_child.action_from_parent
 
         # prepare to find the best action
         best_child: Node = None
         best_distance = None
         if self.current_turn == Role.EVADER:
-            best_distance = self.SMALLEST_DISTANCE
+            best_distance = -math.inf
         else:
-            best_distance = self.GREATEST_DISTANCE
+            best_distance = math.inf
 
         # call the minimax algorithm on each child to find the best choice
         for n in root_node.children:
             # calculate and report the heuristic value
             distance = self.agents.minimax(
                 node=n,
-                depth=self.LOOKAHEAD_DEPTH,
-                alpha=self.SMALLEST_DISTANCE,
-                beta=self.GREATEST_DISTANCE,
+                depth=depth,
+                alpha=-math.inf,
+                beta=math.inf,
             )
             print(f"-> child {n.action_from_parent} has value {distance}")
             if (distance > best_distance and self.current_turn == Role.EVADER) or (
@@ -138,19 +298,28 @@ class GameState:
                 best_child = n
                 best_distance = distance
 
+        # keep the searched tree around for inspection
+        root_node.value = best_distance
+        self.last_value = best_distance
+        self.game_tree = root_node
+
         # return the action required to move from the root state to the best possible next state
         print(f"-> chose {best_child.action_from_parent}\n")
         return best_child.action_from_parent
 
-    def build_game_tree(self, initial_state: Role) -> Node:
+    def build_game_tree(self, initial_state: Role, depth: int = None) -> Node:
         """
         Calculate all possible game states until the look-ahead depth is reached.
 
         Args:
             initial_state (Role): indicates who's turn it is at the root node
+            depth (int): depth to build to; the look-ahead depth by default
 
         Returns:
             The root node of the game tree, from which the rest of the tree can be accessed.
+
+        Raises:
+            NodeBudgetExceeded: If the tree would hold more than max_nodes nodes. The root and its children are always built.
         """
         # reset node counter
         self.node_id_counter = 0
@@ -173,22 +342,39 @@ class GameState:
         )
 
         # expand children recursively
-        self.construct_node_children(root)
+        self.construct_node_children(root, depth)
 
         # return root
         return root
 
-    def construct_node_children(self, parent: Node):
+    def construct_node_children(self, parent: Node, depth: int = None):
         """
         Recursively construct each node's child in an expansion of the game tree.
 
         Args:
             node (Node): the node to expand
+            depth (int): depth to expand to; the look-ahead depth by default
         """
+        if depth is None:
+            depth = self.LOOKAHEAD_DEPTH
         # break if at depth
-        if parent.depth >= self.LOOKAHEAD_DEPTH:
+        if parent.depth >= depth:
             return
 
+        self.expand_node(parent)
+        over_budget = self.max_nodes is not None and self.node_id_counter > self.max_nodes
+        if parent.depth > 0 and over_budget:
+            raise NodeBudgetExceeded(f"more than {self.max_nodes} nodes")
+        for child_node in parent.children:
+            self.construct_node_children(child_node, depth)
+
+    def expand_node(self, parent: Node):
+        """
+        Construct the children of a single node, one per move of the agent to play.
+
+        Args:
+            parent (Node): the node to expand
+        """
         # find all children of this game state given agent
         if parent.agent_role == Role.PURSUANT:
             children = self.env.get_neighbors(parent.pursuant_state)
@@ -232,9 +418,16 @@ class GameState:
                 children=[],
             )
 
-            # attach and expand the child
+            # attach the child
             parent.children.append(child_node)
-            self.construct_node_children(child_node)
+
+    def _phase(self, name: str):
+        """
+        Run a block as a phase of the profiler, if there is one.
+        """
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.phase(name)
 
     def node_id(self):
         self.node_id_counter += 1
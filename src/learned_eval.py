@@ -0,0 +1,420 @@
+"""
+Learn a leaf evaluation for minimax from self-play, so shallow searches can play like deeper ones.
+
+Self-play games are searched deeply with the distance heuristic, and every move the root considered is labeled with its deep search value. A small model (linear, or a one-hidden-layer MLP, in NumPy) is fit to predict that value from features of the position alone, and MiniMax then scores its leaves with the model instead of the distance, a batch of siblings at a time.
+
+Example, from `src`:
+    features, targets = self_play(games=50, depth=5)
+    evaluator = LearnedEvaluator.fit(features, targets)
+    evaluator.save("evaluator.npz")
+    print(move_agreement(evaluator, depth=3, teacher_depth=5))
+    GameState(episode=0, depth=3, evaluator=evaluator).run_loop()
+"""
+
+import contextlib
+import os
+import time
+
+import numpy as np
+
+from environment import Environment
+from gamestate import GameState
+from minimax import MiniMax
+from movement import FOUR_CONNECTED, MovementModel
+from utils import CellIndex, Node, Role
+
+FEATURES = (
+    "distance",
+    "pursuant_mobility",
+    "evader_mobility",
+    "pursuant_density",
+    "evader_density",
+    "territory",
+    "evader_to_move",
+    "plies_left",
+)
+DENSITY_RADIUS = 2  # cells around an agent counted for its local obstacle density
+PLIES_CAP = 32  # plies left beyond this are all alike, including no limit
+
+
+def state_features(
+    env: Environment,
+    pursuants: list[CellIndex],
+    evaders: list[CellIndex],
+    to_move: list[Role],
+    distances: list,
+    plies_left: list,
+) -> np.ndarray:
+    """
+    Describe a batch of positions on one map by the columns of FEATURES: the agents' distance, each agent's number of moves, the share of obstacles around each agent, the share of reachable cells the evader gets to first, the side to move and the plies left.
+
+    Args:
+        env (Environment): the map every position is on
+        pursuants, evaders (list[CellIndex]): the agents' cells in each position
+        to_move (list[Role]): the side to move in each position
+        distances (list): the agents' distance in each position, as from get_shortest_distance
+        plies_left (list): plies each position has before the evader wins, or None for no limit
+
+    Returns:
+        A float array with one row per position.
+    """
+    cols = env.cols
+    p_rows = np.array([c.row for c in pursuants])
+    p_cols = np.array([c.col for c in pursuants])
+    e_rows = np.array([c.row for c in evaders])
+    e_cols = np.array([c.col for c in evaders])
+
+    table = env.get_neighbor_table()
+    p_mobility = (table[p_rows * cols + p_cols] >= 0).sum(axis=1)
+    e_mobility = (table[e_rows * cols + e_cols] >= 0).sum(axis=1)
+
+    # Voronoi territory: cells the evader reaches strictly before the pursuant
+    p_fields = np.stack([env.get_distance_field(c) for c in pursuants])
+    e_fields = np.stack([env.get_distance_field(c) for c in evaders])
+    reachable = e_fields >= 0
+    first = reachable & ((p_fields < 0) | (e_fields < p_fields))
+    territory = first.sum(axis=(1, 2)) / np.maximum(reachable.sum(axis=(1, 2)), 1)
+
+    plies = [PLIES_CAP if p is None else min(p, PLIES_CAP) for p in plies_left]
+    return np.column_stack(
+        [
+            np.array(distances, dtype=float),
+            p_mobility,
+            e_mobility,
+            local_density(env, p_rows, p_cols),
+            local_density(env, e_rows, e_cols),
+            territory,
+            [role == Role.EVADER for role in to_move],
+            plies,
+        ]
+    ).astype(float)
+
+
+def local_density(env: Environment, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """
+    Return the share of obstacles in the square of DENSITY_RADIUS cells around each cell, clipped to the map, from the obstacle sums.
+    """
+    sums = env.get_obstacle_sums()
+    r0 = np.maximum(rows - DENSITY_RADIUS, 0)
+    c0 = np.maximum(cols - DENSITY_RADIUS, 0)
+    r1 = np.minimum(rows + DENSITY_RADIUS + 1, env.rows)
+    c1 = np.minimum(cols + DENSITY_RADIUS + 1, env.cols)
+    count = sums[r1, c1] - sums[r0, c1] - sums[r1, c0] + sums[r0, c0]
+    return count / ((r1 - r0) * (c1 - c0))
+
+
+def node_features(env: Environment, nodes: list[Node], turns_left=None) -> np.ndarray:
+    """
+    Describe the positions of game tree nodes, as state_features does.
+
+    Args:
+        env (Environment): the map of the game tree
+        nodes (list[Node]): the positions, whose depth counts plies from the root
+        turns_left (int): plies the root has before the evader wins, or None for no limit
+    """
+    return state_features(
+        env,
+        [n.pursuant_state for n in nodes],
+        [n.evader_state for n in nodes],
+        [n.agent_role for n in nodes],
+        [n.distance for n in nodes],
+        [None if turns_left is None else turns_left - n.depth for n in nodes],
+    )
+
+
+def teacher_target(value, bound) -> float:
+    """
+    Turn a search value into a training target on the distance scale: captures become 0, below every distance, and escapes become one more than the largest distance.
+    """
+    if value <= -MiniMax.MATE / 2:
+        return 0.0
+    if value >= MiniMax.MATE / 2:
+        return float(bound + 1)
+    return float(value)
+
+
+class LearnedEvaluator:
+    """
+    Predict the deep search value of positions from their features, with a linear model or a multilayer perceptron with one tanh hidden layer. Features and targets are standardized, so the weights work on any map size the model was trained for.
+
+    Attributes:
+        mean, scale (nparray): Standardization of each feature.
+        target_mean, target_scale (float): Standardization of the target.
+        layers (list[tuple[nparray, nparray]]): Weights and biases, input first; one layer for a linear model.
+    """
+
+    def __init__(self, mean, scale, target_mean, target_scale, layers):
+        self.mean = mean
+        self.scale = scale
+        self.target_mean = target_mean
+        self.target_scale = target_scale
+        self.layers = layers
+
+    @classmethod
+    def fit(
+        cls,
+        features: np.ndarray,
+        targets: np.ndarray,
+        hidden=0,
+        l2=1e-3,
+        epochs=2000,
+        learning_rate=0.01,
+        seed=None,
+    ) -> "LearnedEvaluator":
+        """
+        Fit a model to labeled positions: ridge regression in closed form for a linear model, or full-batch Adam for an MLP.
+
+        Args:
+            features (nparray): one row of state_features per position
+            targets (nparray): the value to predict for each position, e.g. from teacher_target
+            hidden (int): units of the hidden layer; 0 for a linear model
+            l2 (float): weight decay
+            epochs (int): gradient steps of the MLP
+            learning_rate (float): Adam step size of the MLP
+            seed: seed of the MLP's initial weights
+
+        Returns:
+            The fitted evaluator.
+        """
+        features = np.asarray(features, dtype=float)
+        targets = np.asarray(targets, dtype=float)
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1.0
+        target_mean = targets.mean()
+        target_scale = targets.std() or 1.0
+        x = (features - mean) / scale
+        y = (targets - target_mean) / target_scale
+
+        if hidden == 0:
+            a = np.column_stack([x, np.ones(len(x))])
+            penalty = l2 * len(x) * np.eye(a.shape[1])
+            penalty[-1, -1] = 0  # leave the bias unpenalized
+            w = np.linalg.solve(a.T @ a + penalty, a.T @ y)
+            layers = [(w[:-1, None], w[-1:])]
+            return cls(mean, scale, target_mean, target_scale, layers)
+
+        rng = np.random.default_rng(seed)
+        params = [
+            rng.normal(0, 1 / np.sqrt(x.shape[1]), (x.shape[1], hidden)),
+            np.zeros(hidden),
+            rng.normal(0, 1 / np.sqrt(hidden), (hidden, 1)),
+            np.zeros(1),
+        ]
+        moments = [np.zeros_like(p) for p in params]
+        squares = [np.zeros_like(p) for p in params]
+        for step in range(1, epochs + 1):
+            w1, b1, w2, b2 = params
+            h = np.tanh(x @ w1 + b1)
+            error = (h @ w2 + b2)[:, 0] - y
+            # gradients of the mean squared error plus weight decay
+            d_out = 2 * error[:, None] / len(x)
+            d_h = (d_out @ w2.T) * (1 - h**2)
+            grads = [
+                x.T @ d_h + l2 * w1,
+                d_h.sum(axis=0),
+                h.T @ d_out + l2 * w2,
+                d_out.sum(axis=0),
+            ]
+            for p, g, m, v in zip(params, grads, moments, squares):
+                m[:] = 0.9 * m + 0.1 * g
+                v[:] = 0.999 * v + 0.001 * g**2
+                p -= (
+                    learning_rate
+                    * (m / (1 - 0.9**step))
+                    / (np.sqrt(v / (1 - 0.999**step)) + 1e-8)
+                )
+        layers = [(params[0], params[1]), (params[2], params[3])]
+        return cls(mean, scale, target_mean, target_scale, layers)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """
+        Predict the value of every row of features in one pass.
+        """
+        h = (np.asarray(features, dtype=float) - self.mean) / self.scale
+        for i, (w, b) in enumerate(self.layers):
+            h = h @ w + b
+            if i < len(self.layers) - 1:
+                h = np.tanh(h)
+        return h[:, 0] * self.target_scale + self.target_mean
+
+    def evaluate(self, env: Environment, nodes: list[Node], turns_left=None) -> np.ndarray:
+        """
+        Score a batch of game tree nodes on one map.
+
+        Args:
+            env (Environment): the map of the game tree
+            nodes (list[Node]): the positions to score
+            turns_left (int): plies the root has before the evader wins, or None for no limit
+
+        Returns:
+            The predicted value of each node, on the distance scale.
+        """
+        return self.predict(node_features(env, nodes, turns_left))
+
+    def save(self, path: str):
+        """
+        Write the model to a .npz file.
+        """
+        arrays = {
+            "mean": self.mean,
+            "scale": self.scale,
+            "target": np.array([self.target_mean, self.target_scale]),
+        }
+        for i, (w, b) in enumerate(self.layers):
+            arrays[f"w{i}"] = w
+            arrays[f"b{i}"] = b
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "LearnedEvaluator":
+        """
+        Read a model written by save.
+        """
+        with np.load(path) as data:
+            layers = []
+            while f"w{len(layers)}" in data:
+                i = len(layers)
+                layers.append((data[f"w{i}"], data[f"b{i}"]))
+            target_mean, target_scale = data["target"]
+            return cls(data["mean"], data["scale"], target_mean, target_scale, layers)
+
+
+def self_play(
+    games=50,
+    depth=5,
+    size=5,
+    density=0.2,
+    seed=0,
+    movement: MovementModel = FOUR_CONNECTED,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Play games with the distance heuristic and label every move the root considered with its search value. Game i is played on the map seeded seed + i, redrawn until the agents can reach each other.
+
+    Args:
+        games (int): number of games to play
+        depth (int): look-ahead depth of the teacher search
+        size (int): side length of the maps
+        density (float): obstacle density of the maps
+        seed (int): seed of the first map
+        movement (MovementModel): the moves agents may make
+
+    Returns:
+        The features of every labeled position, and its target.
+    """
+    features, targets = [], []
+    for i in range(games):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            game = _teacher_game(i, depth, size, density, seed, movement)
+            while not game.is_pursuant_win() and not game.is_evader_win():
+                action = game.compute_next_move()
+                x, y = _root_samples(game)
+                features.append(x)
+                targets.append(y)
+                game.apply_move(action)
+                game.switch_turns()
+    if not features:
+        return np.empty((0, len(FEATURES))), np.empty(0)
+    return np.concatenate(features), np.concatenate(targets)
+
+
+def move_agreement(
+    evaluator: LearnedEvaluator,
+    depth=3,
+    teacher_depth=5,
+    games=20,
+    size=5,
+    density=0.2,
+    seed=1000,
+    movement: MovementModel = FOUR_CONNECTED,
+) -> dict:
+    """
+    Measure how often shallow searches choose a move as good as a deep search's, with the distance heuristic and with the learned evaluator, on the positions of deep self-play games. Use seeds the evaluator was not trained on.
+
+    Args:
+        evaluator (LearnedEvaluator): the evaluator to test
+        depth (int): look-ahead depth of the shallow searches
+        teacher_depth (int): look-ahead depth of the deep search
+        games, size, density, seed, movement: the games to take positions from, as for self_play
+
+    Returns:
+        The number of positions, the share where each shallow search's move is worth the deep search's best, and the CPU seconds per move of each search.
+    """
+    agree = {"distance": 0, "learned": 0}
+    seconds = {"distance": 0.0, "learned": 0.0, "teacher": 0.0}
+    positions = 0
+    for i in range(games):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            game = _teacher_game(i, teacher_depth, size, density, seed, movement)
+            while not game.is_pursuant_win() and not game.is_evader_win():
+                start = time.process_time()
+                action = game.compute_next_move()
+                seconds["teacher"] += time.process_time() - start
+                values = {
+                    c.action_from_parent: c.value for c in game.game_tree.children
+                }
+                best = values[action]
+
+                for name, student_evaluator in (
+                    ("distance", None),
+                    ("learned", evaluator),
+                ):
+                    student = GameState(
+                        episode=i, env=game.env, depth=depth, evaluator=student_evaluator
+                    )
+                    student.current_turn = game.current_turn
+                    student.turn_count = game.turn_count
+                    start = time.process_time()
+                    choice = student.compute_next_move()
+                    seconds[name] += time.process_time() - start
+                    agree[name] += values[choice] == best
+
+                positions += 1
+                game.apply_move(action)
+                game.switch_turns()
+
+    positions_or_one = max(positions, 1)
+    return {
+        "positions": positions,
+        "distance_agreement": agree["distance"] / positions_or_one,
+        "learned_agreement": agree["learned"] / positions_or_one,
+        "distance_seconds_per_move": seconds["distance"] / positions_or_one,
+        "learned_seconds_per_move": seconds["learned"] / positions_or_one,
+        "teacher_seconds_per_move": seconds["teacher"] / positions_or_one,
+    }
+
+
+def _teacher_game(i, depth, size, density, seed, movement) -> GameState:
+    """
+    Set up game i of a self-play run, searched with plain alpha-beta so every root move gets its exact value.
+    """
+    return GameState(
+        episode=i,
+        size=size,
+        density=density,
+        depth=depth,
+        e_start=CellIndex(size - 1, size - 1),
+        require_connected=True,
+        seed=seed + i,
+        movement=movement,
+        search="alphabeta",
+    )
+
+
+def _root_samples(game: GameState) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Label the root's children of the last search with their values.
+    """
+    children = [c for c in game.game_tree.children if c.distance is not None]
+    turns_left = game.EVADER_THRESHOLD - game.turn_count
+    x = node_features(game.env, children, turns_left)
+    y = np.array([teacher_target(c.value, game.GREATEST_DISTANCE) for c in children])
+    return x, y
+
+
+if __name__ == "__main__":
+    features, targets = self_play(games=50, depth=5)
+    evaluator = LearnedEvaluator.fit(features, targets)
+    evaluator.save("evaluator.npz")
+    print(f"trained on {len(targets)} positions")
+    print(move_agreement(evaluator, depth=3, teacher_depth=5))
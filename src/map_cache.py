@@ -0,0 +1,176 @@
+"""
+Keep per-map precomputation on disk between runs, keyed by the content of the map.
+
+Sweeps and regression runs replay the same seeded maps over and over. A MapCache stores each map's component labels, neighbor table and, for small maps, all-pairs distance fields under a hash of its obstacle grid, movement model and terrain, so a rerun loads them instead of searching again.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from environment import Environment, DistanceTable
+from utils import Occupancy
+
+TABLES = ("components", "neighbor_table")
+DISTANCE_TABLES = ("distance_index", "distance_fields")
+
+
+class MapCache:
+    """
+    A content-addressed, size-bounded cache of map tables in a directory. Each map gets a subdirectory named by its key, holding one .npy file per table (memory-mapped on load) or a single compressed .npz. Entries are evicted least recently used first once the directory outgrows max_bytes.
+
+    All-pairs distances take (rows * cols)^2 entries, so they are only stored for maps of at most max_cells cells; larger maps keep their components and neighbor table, and build distance fields on demand as usual.
+
+    Attributes:
+        directory (str): Where the entries are stored.
+        max_bytes (int): Total size of the entries to keep.
+        compress (bool): Whether to store entries as compressed .npz files, which are smaller but read fully into memory.
+        max_cells (int): Largest map, in cells, whose all-pairs distances are stored.
+        hits (int): Maps whose tables were loaded from disk.
+        misses (int): Maps whose tables had to be computed.
+    """
+
+    def __init__(
+        self, directory: str, max_bytes=1 << 30, compress=False, max_cells=2500
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.max_cells = max_cells
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(env: Environment) -> str:
+        """
+        Hash everything the tables depend on: the obstacle layout, the movement model and the terrain costs. Agent positions do not matter.
+        """
+        digest = hashlib.sha256()
+        obstacles = env.snapshot() == Occupancy.OBSTACLE.value
+        digest.update(repr(obstacles.shape).encode())
+        digest.update(np.packbits(obstacles).tobytes())
+        digest.update(repr(env.movement).encode())
+        if env.terrain is not None:
+            digest.update(np.ascontiguousarray(env.terrain).tobytes())
+        return digest.hexdigest()
+
+    def prepare(self, env: Environment) -> bool:
+        """
+        Give an environment its precomputed tables, loading them if the map is known and computing and storing them otherwise.
+
+        Args:
+            env (Environment): The map, as freshly generated or loaded.
+
+        Returns:
+            Whether the tables came from the cache.
+        """
+        key = self.key(env)
+        tables = self._load(key)
+        hit = tables is not None
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+            tables = self._store(key, env)
+        distances = None
+        if "distance_fields" in tables:
+            distances = DistanceTable(tables["distance_index"], tables["distance_fields"])
+        env.use_precomputed(
+            components=tables["components"],
+            neighbor_table=tables["neighbor_table"],
+            distances=distances,
+        )
+        return hit
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.isdir(os.path.join(self.directory, key))
+
+    def size(self) -> int:
+        """
+        Return the total size in bytes of every entry.
+        """
+        return sum(size for _, _, size in self._entries())
+
+    def _load(self, key: str):
+        """
+        Read an entry, marking it recently used, or return None if it is missing or incomplete, e.g. evicted by another worker meanwhile.
+        """
+        path = os.path.join(self.directory, key)
+        try:
+            if os.path.exists(os.path.join(path, "tables.npz")):
+                with np.load(os.path.join(path, "tables.npz")) as npz:
+                    names = TABLES
+                    if "distance_fields" in npz.files:
+                        names += DISTANCE_TABLES
+                    tables = {name: npz[name] for name in names}
+            else:
+                names = TABLES
+                if os.path.exists(os.path.join(path, "distance_fields.npy")):
+                    names += DISTANCE_TABLES
+                tables = {
+                    name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+                    for name in names
+                }
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            return None
+        return tables
+
+    def _store(self, key: str, env: Environment) -> dict:
+        """
+        Compute the tables of a map and write them as a new entry, with all-pairs distances only up to max_cells cells. The entry is assembled in a scratch directory and renamed into place, so concurrent workers never see half an entry; if another worker got there first, its entry is kept.
+        """
+        tables = {
+            "components": env.get_component_labels(),
+            "neighbor_table": env.get_neighbor_table(),
+        }
+        if env.rows * env.cols <= self.max_cells:
+            distances = DistanceTable.build(env)
+            tables["distance_index"] = distances.index
+            tables["distance_fields"] = distances.fields
+
+        scratch = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        if self.compress:
+            np.savez_compressed(os.path.join(scratch, "tables.npz"), **tables)
+        else:
+            for name, array in tables.items():
+                np.save(os.path.join(scratch, name + ".npy"), array)
+        try:
+            os.rename(scratch, os.path.join(self.directory, key))
+        except OSError:
+            shutil.rmtree(scratch, ignore_errors=True)
+        self._evict(keep=key)
+        return tables
+
+    def _entries(self) -> list[tuple]:
+        """
+        List every entry as (last used, key, bytes).
+        """
+        entries = []
+        for key in os.listdir(self.directory):
+            path = os.path.join(self.directory, key)
+            if key.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, key, size))
+            except OSError:
+                continue  # evicted by another process meanwhile
+        return entries
+
+    def _evict(self, keep: str = None):
+        """
+        Delete the least recently used entries until the cache fits in max_bytes, sparing the entry just written.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, key, size in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            total -= size
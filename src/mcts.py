@@ -0,0 +1,444 @@
+"""
+Choose moves by Monte Carlo tree search, for maps too large to search full-width.
+
+Instead of expanding every move to a fixed depth, MCTS grows its tree towards the moves that look best so far, balancing them against rarely tried ones with upper confidence bounds (UCT). Each new position is scored by playing it out to the end of the game: rollouts follow a greedy policy, the pursuant closing in and the evader backing off along distance fields, and a batch of them is played at once on arrays. The search stops when its iteration or time budget runs out, so it always has an answer, and can be spread over worker processes that each grow their own tree from the root.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+import numpy as np
+
+from environment import Environment
+from utils import CellIndex, Role, Action, Occupancy, derive_action
+
+
+class TreeNode:
+    """
+    A position in the search tree.
+
+    Attributes:
+        pursuant (int): Flat index of the pursuant's cell.
+        evader (int): Flat index of the evader's cell.
+        to_move (Role): The side to move.
+        ply (int): Plies from the root.
+        action (Action): The move that led here from the parent, or None at the root.
+        parent (TreeNode): The previous position, or None at the root.
+        children (list[TreeNode]): Positions expanded so far.
+        untried (list[int]): Cells the side to move could step to that have no child yet.
+        outcome (float): 1.0 if the evader has won here, 0.0 if it has been caught, None while the game is open.
+        visits (int): Rollouts played through this node.
+        escapes (float): How many of them the evader survived.
+    """
+
+    __slots__ = (
+        "pursuant",
+        "evader",
+        "to_move",
+        "ply",
+        "action",
+        "parent",
+        "children",
+        "untried",
+        "outcome",
+        "visits",
+        "escapes",
+    )
+
+    def __init__(self, pursuant, evader, to_move, ply, action=None, parent=None):
+        self.pursuant = pursuant
+        self.evader = evader
+        self.to_move = to_move
+        self.ply = ply
+        self.action = action
+        self.parent = parent
+        self.children = []
+        self.untried = []
+        self.outcome = None
+        self.visits = 0
+        self.escapes = 0.0
+
+
+class MCTS:
+    """
+    Monte Carlo tree search over the moves of one side, scored by the evader's chance of surviving.
+
+    Attributes:
+        env (Environment): The field being played on.
+        iterations (int): Most tree iterations per move and worker.
+        time_limit (float): Most wall-clock seconds per move and worker, or None to stop on iterations alone.
+        exploration (float): Weight of the UCT exploration term.
+        batch_size (int): Rollouts played from each new position.
+        epsilon (float): Chance that a rollout move is picked at random instead of greedily.
+        workers (int): Trees grown in parallel, one per worker process.
+        iterations_run (int): Tree iterations run since the instance was created, over all workers.
+        worker_seconds (float): CPU seconds the worker processes spent on the last move, which the calling process's own CPU time does not include; 0 with one worker.
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        iterations=2000,
+        time_limit: float = None,
+        exploration=math.sqrt(2),
+        batch_size=8,
+        epsilon=0.1,
+        workers=1,
+        executor: Executor = None,
+        seed=None,
+        field_cache=4096,
+    ):
+        """
+        Args:
+            env (Environment): The field being played on.
+            iterations (int): Most tree iterations per move and worker.
+            time_limit (float): Most wall-clock seconds per move, or None to stop on iterations alone. Workers search in parallel, so each gets the whole limit.
+            exploration (float): Weight of the UCT exploration term.
+            batch_size (int): Rollouts played from each new position.
+            epsilon (float): Chance that a rollout move is picked at random instead of greedily.
+            workers (int): Trees to grow in parallel; each gets the whole budget, and their root statistics are summed.
+            executor (Executor): Run the workers here instead of in a process pool of their own.
+            seed (int): Seed of the rollouts and tie-breaks, for reproducible moves.
+            field_cache (int): Most distance fields to keep between rollouts.
+        """
+        self.env = env
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.batch_size = batch_size
+        self.epsilon = epsilon
+        self.workers = workers
+        self.field_cache = field_cache
+        self.iterations_run = 0
+        self.worker_seconds = 0.0
+        self._seeds = np.random.SeedSequence(seed)
+        self._owns_executor = executor is None
+        self._executor = executor
+        self._fields = OrderedDict()  # flat cell -> distance field, least recently used first
+        self._fields_version = env.map_version  # map version the fields were computed on
+
+    def choose_move(self, turn: Role, turns_left: int) -> tuple[Optional[Action], float]:
+        """
+        Search the current position and pick the most visited move.
+
+        Args:
+            turn (Role): The side to move.
+            turns_left (int): Plies until the evader has survived long enough to win.
+
+        Returns:
+            The chosen action, or None if the side to move is boxed in, and the evader's estimated chance of surviving after it.
+        """
+        pursuant = self.env.get_agent_cell(Role.PURSUANT)
+        evader = self.env.get_agent_cell(Role.EVADER)
+        self.worker_seconds = 0.0
+        if self.workers > 1:
+            stats = self._search_parallel(pursuant, evader, turn, turns_left)
+        else:
+            stats, iterations = self.search(
+                pursuant, evader, turn, turns_left, self._seeds.spawn(1)[0]
+            )
+            self.iterations_run += iterations
+        if not stats:
+            return None, math.nan
+        action, (visits, escapes) = max(stats.items(), key=lambda item: item[1][0])
+        return action, escapes / visits
+
+    def search(
+        self,
+        pursuant: CellIndex,
+        evader: CellIndex,
+        turn: Role,
+        turns_left: int,
+        seed=None,
+    ) -> tuple[dict, int]:
+        """
+        Grow one tree from a position until the budget runs out.
+
+        Args:
+            pursuant (CellIndex): Cell of the pursuant.
+            evader (CellIndex): Cell of the evader.
+            turn (Role): The side to move.
+            turns_left (int): Plies until the evader has survived long enough to win.
+            seed: Seed of this tree's random choices.
+
+        Returns:
+            The visits and escapes of every move from the root, keyed by action, and the iterations run.
+        """
+        rng = np.random.default_rng(seed)
+        deadline = None
+        if self.time_limit is not None:
+            deadline = time.perf_counter() + self.time_limit
+        cols = self.env.cols
+        root = self._make_node(
+            pursuant.row * cols + pursuant.col,
+            evader.row * cols + evader.col,
+            turn,
+            0,
+            turns_left,
+            settle=False,
+        )
+
+        iterations = 0
+        while iterations < self.iterations and (
+            deadline is None or time.perf_counter() < deadline
+        ):
+            # selection: descend through fully expanded nodes
+            node = root
+            while node.outcome is None and not node.untried and node.children:
+                node = self._select(node)
+            # expansion: add one untried move
+            if node.outcome is None and node.untried:
+                node = self._expand(node, rng, turns_left)
+            # simulation and backpropagation
+            escapes = self._evaluate(node, turns_left, rng)
+            while node is not None:
+                node.visits += self.batch_size
+                node.escapes += escapes
+                node = node.parent
+            iterations += 1
+
+        stats = {c.action: (c.visits, c.escapes) for c in root.children}
+        return stats, iterations
+
+    def close(self):
+        """
+        Shut down the worker pool, if this instance started one.
+        """
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+        self._executor = None
+
+    def _search_parallel(
+        self, pursuant: CellIndex, evader: CellIndex, turn: Role, turns_left: int
+    ) -> dict:
+        """
+        Grow one tree per worker from the same root and sum their root statistics.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        obstacles = (self.env.snapshot() == Occupancy.OBSTACLE.value).astype(np.uint8)
+        settings = {
+            "iterations": self.iterations,
+            "time_limit": self.time_limit,
+            "exploration": self.exploration,
+            "batch_size": self.batch_size,
+            "epsilon": self.epsilon,
+            "field_cache": self.field_cache,
+        }
+        futures = [
+            self._executor.submit(
+                search_tree,
+                obstacles,
+                self.env.movement,
+                self.env.terrain,
+                pursuant,
+                evader,
+                turn,
+                turns_left,
+                settings,
+                seed,
+            )
+            for seed in self._seeds.spawn(self.workers)
+        ]
+        stats = {}
+        for future in futures:
+            tree_stats, iterations, seconds = future.result()
+            self.iterations_run += iterations
+            self.worker_seconds += seconds
+            for action, (visits, escapes) in tree_stats.items():
+                total = stats.get(action, (0, 0.0))
+                stats[action] = (total[0] + visits, total[1] + escapes)
+        return stats
+
+    def _make_node(
+        self, pursuant, evader, to_move, ply, turns_left, action=None, parent=None, settle=True
+    ):
+        """
+        Create a node, settling its outcome if the game is over there. The root is never settled, since a move must be chosen from it either way.
+        """
+        node = TreeNode(pursuant, evader, to_move, ply, action, parent)
+        table = self.env.get_neighbor_table()
+        if settle and evader in table[pursuant]:
+            node.outcome = 0.0
+        elif settle and self._out_of_reach(self._field(evader)[pursuant], turns_left - ply):
+            node.outcome = 1.0
+        else:
+            mover = pursuant if to_move == Role.PURSUANT else evader
+            node.untried = [int(n) for n in table[mover] if n >= 0]
+        return node
+
+    def _out_of_reach(self, distance, plies_left):
+        """
+        Return if the evader is safe: time is up, the agents cannot reach each other, or, when every step costs 1, they are farther apart than the plies left can close.
+        """
+        if plies_left <= 0 or distance < 0:
+            return True
+        return not self.env.is_weighted and distance - 1 > plies_left
+
+    def _select(self, node: TreeNode) -> TreeNode:
+        """
+        Pick the child with the highest upper confidence bound for the side to move.
+        """
+        log_visits = math.log(node.visits)
+        evader_to_move = node.to_move == Role.EVADER
+        best, best_score = None, -math.inf
+        for child in node.children:
+            rate = child.escapes / child.visits
+            if not evader_to_move:
+                rate = 1.0 - rate
+            score = rate + self.exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def _expand(self, node: TreeNode, rng: np.random.Generator, turns_left: int) -> TreeNode:
+        """
+        Add a child for a random untried move.
+        """
+        cell = node.untried.pop(rng.integers(len(node.untried)))
+        cols = self.env.cols
+        if node.to_move == Role.PURSUANT:
+            origin, pursuant, evader = node.pursuant, cell, node.evader
+        else:
+            origin, pursuant, evader = node.evader, node.pursuant, cell
+        action = derive_action(
+            CellIndex(*divmod(origin, cols)), CellIndex(*divmod(cell, cols))
+        )
+        child = self._make_node(
+            pursuant,
+            evader,
+            Role.EVADER if node.to_move == Role.PURSUANT else Role.PURSUANT,
+            node.ply + 1,
+            turns_left,
+            action,
+            node,
+        )
+        node.children.append(child)
+        return child
+
+    def _evaluate(self, node: TreeNode, turns_left: int, rng: np.random.Generator) -> float:
+        """
+        Count the escapes of a batch of rollouts from a node, or of its settled outcome.
+        """
+        if node.outcome is not None:
+            return node.outcome * self.batch_size
+        return float(
+            self.rollout(
+                node.pursuant, node.evader, node.to_move, turns_left - node.ply, rng
+            ).sum()
+        )
+
+    def rollout(
+        self,
+        pursuant: int,
+        evader: int,
+        to_move: Role,
+        plies: int,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        """
+        Play a batch of games out from one position at once. Each ply, every game still running moves the side to move one step: the pursuant to the neighbor closest to the evader and the evader to the neighbor farthest from the pursuant, or, with probability epsilon, to a random neighbor. A side with no move stays put. On unit-cost maps a game stops early once the pursuant is too far away to catch up in time.
+
+        Args:
+            pursuant (int): Flat index of the pursuant's cell.
+            evader (int): Flat index of the evader's cell.
+            to_move (Role): The side to move first.
+            plies (int): Plies until the evader has survived long enough to win.
+            rng (Generator): Source of the random moves and tie-breaks.
+
+        Returns:
+            A boolean array with one entry per game, True where the evader survived.
+        """
+        table = self.env.get_neighbor_table()
+        n = self.batch_size
+        p = np.full(n, pursuant, dtype=np.int64)
+        e = np.full(n, evader, dtype=np.int64)
+        caught = np.zeros(n, dtype=bool)
+        escaped = np.zeros(n, dtype=bool)
+        pursuant_to_move = to_move == Role.PURSUANT
+        unit_cost = not self.env.is_weighted
+
+        for ply in range(plies):
+            running = np.flatnonzero(~(caught | escaped))
+            if running.size == 0:
+                break
+            movers = (p if pursuant_to_move else e)[running]
+            targets = (e if pursuant_to_move else p)[running]
+            options = table[movers]
+            valid = options >= 0
+
+            # distances from every option to the other agent, one field per distinct cell
+            cells, which = np.unique(targets, return_inverse=True)
+            fields = np.stack([self._field(int(c)) for c in cells])
+            dist = fields[which[:, None], np.where(valid, options, 0)].astype(float)
+            dist[dist < 0] = math.inf  # cut off from the other agent
+            score = -dist if pursuant_to_move else dist
+            # random tie-breaks, and a random move now and then
+            score = score + rng.random(score.shape) * 1e-3
+            explore = rng.random(running.size) < self.epsilon
+            score[explore] = rng.random((explore.sum(), score.shape[1]))
+            score[~valid] = -math.inf
+
+            best = score.argmax(axis=1)
+            choice = options[np.arange(running.size), best]
+            moved = valid.any(axis=1)
+            step = running[moved]
+            if pursuant_to_move:
+                p[step] = choice[moved]
+            else:
+                e[step] = choice[moved]
+            caught[running] = (table[p[running]] == e[running, None]).any(axis=1)
+            if unit_cost:
+                # the distance after the move, from the field already gathered
+                gap = np.where(moved, dist[np.arange(running.size), best], math.inf)
+                escaped[running[gap - 1 > plies - ply - 1]] = True
+            pursuant_to_move = not pursuant_to_move
+        return ~caught
+
+    def _field(self, cell: int) -> np.ndarray:
+        """
+        Return the flat distance field from a cell, keeping the most recently used ones until the obstacles or terrain change.
+        """
+        if self._fields_version != self.env.map_version:
+            self._fields.clear()
+            self._fields_version = self.env.map_version
+        field = self._fields.get(cell)
+        if field is None:
+            field = self.env.get_distance_field(
+                CellIndex(*divmod(cell, self.env.cols)), cache=False
+            ).ravel()
+            self._fields[cell] = field
+            if len(self._fields) > self.field_cache:
+                self._fields.popitem(last=False)
+        else:
+            self._fields.move_to_end(cell)
+        return field
+
+
+def search_tree(
+    obstacles: np.ndarray,
+    movement,
+    terrain: Optional[np.ndarray],
+    pursuant: CellIndex,
+    evader: CellIndex,
+    turn: Role,
+    turns_left: int,
+    settings: dict,
+    seed,
+) -> tuple[dict, int]:
+    """
+    Grow one tree in a worker process, on a field rebuilt from its obstacle grid.
+
+    Returns:
+        The root statistics and iteration count, as from MCTS.search, and the CPU seconds the worker spent.
+    """
+    start = time.process_time()
+    env = Environment.from_array(obstacles, pursuant, evader, movement=movement)
+    if terrain is not None:
+        env.set_terrain(terrain)
+    stats, iterations = MCTS(env, **settings).search(
+        pursuant, evader, turn, turns_left, seed
+    )
+    return stats, iterations, time.process_time() - start
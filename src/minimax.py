@@ -2,19 +2,62 @@
 Decide actions for pursuer and evader.
 """
 
+import math
+from collections import deque
+from typing import Optional
+
 from environment import Environment
-from utils import Role, Node
+from utils import CellIndex, Role, Node
 
 
 class MiniMax:
     """
     Implements the minimax algorithm with alpha-beta pruning to direct two adversarial agents.
+
+    Positions whose outcome is already decided score beyond every distance, like mate scores in chess: a capture k plies from the root scores -(MATE - k) and an escape MATE - k, so the pursuant prefers the quickest capture and the evader the slowest.
+
+    Search depth can be made selective. With late-move reductions, children are ordered by distance and those after the first few are searched a ply shallower, and again at full depth only if they turn out better than the best so far. With extensions, children where the agents are close, or the evader is in a chokepoint, are searched a ply deeper, past the built tree if need be.
+
+    Attributes:
+        env (Environment): The field being played on, for detecting evaders trapped in dead ends; None to skip that test.
+        evaluator (LearnedEvaluator): Scores leaves in place of their distance, all children of a node in one batch; None to score leaves by distance. Needs env.
+        expand (callable): Creates the children of a node the tree stops at, so the search can go deeper than the tree was built; the children are dropped again once searched. None to treat the tree as complete.
+        reduce_after (int): Children of a node searched at full depth before the rest are reduced by a ply, or None for no reductions.
+        extend_within (int): Distance at or below which a child is searched a ply deeper; an evader with at most two moves is extended within twice that. None for no extensions, which also need expand.
+        max_extensions (int): Most plies a line may be extended by.
+        reduced (int): Reduced searches since the instance was created.
+        researched (int): Reduced searches that had to be repeated at full depth.
+        extended (int): Extended searches since the instance was created.
+        turns_left (int): Plies until the evader has survived long enough to win, or None for no limit.
+        nodes_visited (int): Nodes searched since the instance was created.
     """
 
-    def __init__(self):
+    MATE = 10**12
+
+    def __init__(
+        self,
+        env: Environment = None,
+        expand=None,
+        evaluator=None,
+        reduce_after=None,
+        extend_within=None,
+        max_extensions=2,
+    ):
         """
         Initialize instance of MiniMaxAgent class.
         """
+        self.env = env
+        self.expand = expand
+        self.evaluator = evaluator
+        self.reduce_after = reduce_after
+        self.extend_within = extend_within
+        self.max_extensions = max_extensions
+        self.turns_left = None
+        self.nodes_visited = 0
+        self.reduced = 0
+        self.researched = 0
+        self.extended = 0
+        self._traps = {}  # (pursuant, evader, side to move) -> plies to a forced capture, or None
 
     def minimax(
         self,
@@ -22,62 +65,441 @@ class MiniMax:
         depth: int,
         alpha=-float("inf"),
         beta=float("inf"),
+        extensions=0,
     ):
         """
         Recursive function to output the min/max value.
         Prune the branch if alpha >= beta (or min/max values are equal), since no better option will be available through this route.
+        Every visited node records its value, and children skipped by a cutoff are marked as pruned until a later search visits them.
 
         Args:
             node: a single node in the game tree representing a game state
             depth: current level in the tree, beginning with look-ahead depth
             alpha: "worst-case scenario" value for maximizer, continually increases
             beta: "worst-case scenario" value for minimizer, continually decreases
+            extensions: plies the line to this node was extended by
         """
+        self.nodes_visited += 1
+        node.pruned = False  # a re-search may visit a node an earlier pass cut off
+        # Exit early if the game is already decided
+        outcome = self.forced_outcome(node)
+        if outcome is not None:
+            node.value = outcome
+            return outcome
+
         # Exit on base case: return heuristic value of node
         # print(depth)
-        if depth == 1 or node.distance == 1:
+        if depth == 1:
             # print(node.distance)
-            return node.distance
+            node.value = self.leaf_value(node)
+            return node.value
 
+        expanded = self._expand(node)
+        if depth == 2:
+            self.estimate(node.children)
+        children = node.children
+        if self.reduce_after is not None:
+            # reductions rely on the likely best children coming first
+            children = self.ordered(children, node.agent_role == Role.EVADER)
         # Evader
         if node.agent_role == Role.EVADER:
             max_eval = -float("inf")
-            for child in node.children:
+            for i, child in enumerate(children):
                 max_eval = max(
                     max_eval,
-                    ret := self.minimax(
-                        child,
-                        depth - 1,
-                        alpha,
-                        beta,
-                    ),
+                    ret := self._search_child(child, i, depth, alpha, beta, extensions),
                 )
                 # print(f"Evader: {ret}")
                 # Pruning implementation
                 if max_eval >= beta:
+                    self.mark_pruned(children[i + 1 :])
                     break
                 alpha = max(alpha, max_eval)
-            return max_eval
+            node.value = max_eval
 
         # Pursuant
         else:
             min_eval = float("inf")
-            for child in node.children:
+            for i, child in enumerate(children):
                 min_eval = min(
                     min_eval,
-                    ret := self.minimax(
-                        child,
-                        depth - 1,
-                        alpha,
-                        beta,
-                    ),
+                    ret := self._search_child(child, i, depth, alpha, beta, extensions),
                 )
                 # print(f"Pursuant: {ret}")
                 # Pruning implementation
                 if min_eval <= alpha:
+                    self.mark_pruned(children[i + 1 :])
                     break
                 beta = min(beta, min_eval)
-            return min_eval
+            node.value = min_eval
+
+        if expanded:
+            node.children = []
+        return node.value
+
+    def search_root(
+        self,
+        root: Node,
+        depth: int,
+        guess=None,
+        window=2,
+    ) -> tuple[Node, object]:
+        """
+        Choose the best child of the root with principal variation search inside an aspiration window. The window is centered on a guess of the root's value, such as the previous turn's; if the result falls outside it, the search is repeated with an open window.
+
+        Children are tried in their natural order, and one only replaces the best so far when it is strictly better, so the choice is the same as searching every child with a full window.
+
+        Args:
+            root: the current game state, whose children are the candidate moves
+            depth: look-ahead depth passed to each child, as for minimax
+            guess: expected value of the root, or None to search with an open window
+            window: half-width of the aspiration window
+
+        Returns:
+            The best child and its value.
+        """
+        alpha, beta = -math.inf, math.inf
+        if guess is not None:
+            alpha, beta = guess - window, guess + window
+        while True:
+            best_child, best_value = self._pvs_root(root, depth, alpha, beta)
+            if best_value <= alpha and alpha > -math.inf:
+                alpha = -math.inf  # failed low: the root is worth less than guessed
+            elif best_value >= beta and beta < math.inf:
+                beta = math.inf  # failed high: the root is worth more than guessed
+            else:
+                root.value = best_value
+                return best_child, best_value
+
+    def pvs(
+        self,
+        node: Node,
+        depth: int,
+        alpha=-math.inf,
+        beta=math.inf,
+        extensions=0,
+    ):
+        """
+        Principal variation search: a fail-soft alpha-beta that searches the most promising child with the full window and the others with a null window, which only proves them no better. A child that disproves this is searched again with the full window.
+        Children are ordered by their distance, closest first for the pursuant and farthest first for the evader, so the first one is usually best. Nodes settled by a null window record a bound rather than an exact value. Reduced children get their null window at the reduced depth first.
+
+        Args:
+            node: a single node in the game tree representing a game state
+            depth: current level in the tree, beginning with look-ahead depth
+            alpha: "worst-case scenario" value for maximizer, continually increases
+            beta: "worst-case scenario" value for minimizer, continually decreases
+            extensions: plies the line to this node was extended by
+        """
+        self.nodes_visited += 1
+        node.pruned = False  # a re-search may visit a node an earlier pass cut off
+        outcome = self.forced_outcome(node)
+        if outcome is not None:
+            node.value = outcome
+            return outcome
+        if depth == 1:
+            node.value = self.leaf_value(node)
+            return node.value
+
+        expanded = self._expand(node)
+        if depth == 2:
+            self.estimate(node.children)
+        maximizing = node.agent_role == Role.EVADER
+        children = self.ordered(node.children, maximizing)
+        best = -math.inf if maximizing else math.inf
+        for i, child in enumerate(children):
+            child_depth, reduced, child_extensions = self._plan_child(
+                child, i, depth, extensions
+            )
+            if i == 0:
+                value = self.pvs(child, child_depth, alpha, beta, child_extensions)
+            elif maximizing:
+                null = (alpha, math.nextafter(alpha, beta))
+                if reduced is not None:
+                    value = self.pvs(child, reduced, *null, child_extensions)
+                    if value > alpha:
+                        self.researched += 1
+                if reduced is None or value > alpha:
+                    value = self.pvs(child, child_depth, *null, child_extensions)
+                if alpha < value < beta:
+                    value = self.pvs(child, child_depth, value, beta, child_extensions)
+            else:
+                null = (math.nextafter(beta, alpha), beta)
+                if reduced is not None:
+                    value = self.pvs(child, reduced, *null, child_extensions)
+                    if value < beta:
+                        self.researched += 1
+                if reduced is None or value < beta:
+                    value = self.pvs(child, child_depth, *null, child_extensions)
+                if alpha < value < beta:
+                    value = self.pvs(child, child_depth, alpha, value, child_extensions)
+
+            if maximizing:
+                best = max(best, value)
+                if best >= beta:
+                    self.mark_pruned(children[i + 1 :])
+                    break
+                alpha = max(alpha, best)
+            else:
+                best = min(best, value)
+                if best <= alpha:
+                    self.mark_pruned(children[i + 1 :])
+                    break
+                beta = min(beta, best)
+        node.value = best
+        if expanded:
+            node.children = []
+        return best
+
+    def _pvs_root(self, root: Node, depth: int, alpha, beta) -> tuple[Node, object]:
+        """
+        Search the root's children in order, proving each later child no better than the best so far with a null window before searching it fully.
+        """
+        maximizing = root.agent_role == Role.EVADER
+        best_child = None
+        best_value = None
+        for child in root.children:
+            if best_child is None:
+                value = self.pvs(child, depth, alpha, beta)
+            elif maximizing:
+                bound = max(alpha, best_value)
+                value = self.pvs(child, depth, bound, math.nextafter(bound, beta))
+                if bound < value < beta:
+                    value = self.pvs(child, depth, bound, beta)
+            else:
+                bound = min(beta, best_value)
+                value = self.pvs(child, depth, math.nextafter(bound, alpha), bound)
+                if alpha < value < bound:
+                    value = self.pvs(child, depth, alpha, bound)
+
+            if (
+                best_child is None
+                or (maximizing and value > best_value)
+                or (not maximizing and value < best_value)
+            ):
+                best_child, best_value = child, value
+            if (maximizing and best_value >= beta) or (
+                not maximizing and best_value <= alpha
+            ):
+                break
+        return best_child, best_value
+
+    def _search_child(self, child: Node, i: int, depth: int, alpha, beta, extensions):
+        """
+        Search the i-th child of a node at the given depth with minimax, reduced or extended as _plan_child decides. A reduced search that fails to beat the window is trusted; one that beats it is repeated at full depth, which clears the pruned flags the shallow pass left on nodes it now visits.
+        """
+        child_depth, reduced, child_extensions = self._plan_child(
+            child, i, depth, extensions
+        )
+        if reduced is not None:
+            value = self.minimax(child, reduced, alpha, beta, child_extensions)
+            # the child's side is the opponent of the node searching it
+            maximizing = child.agent_role != Role.EVADER
+            if (maximizing and value <= alpha) or (not maximizing and value >= beta):
+                return value
+            self.researched += 1
+        return self.minimax(child, child_depth, alpha, beta, child_extensions)
+
+    def _plan_child(self, child: Node, i: int, depth: int, extensions: int):
+        """
+        Decide how deep to search the i-th child of a node searched at the given depth.
+
+        Returns:
+            The child's full depth, a reduced depth to try first or None, and the plies its line has been extended by.
+        """
+        if self._is_sharp(child, extensions):
+            self.extended += 1
+            return depth, None, extensions + 1
+        if self.reduce_after is not None and i >= self.reduce_after and depth >= 3:
+            self.reduced += 1
+            return depth - 1, depth - 2, extensions
+        return depth - 1, None, extensions
+
+    def _is_sharp(self, node: Node, extensions: int) -> bool:
+        """
+        Return if a node deserves an extension: the agents are close, or the evader is in a chokepoint and not far off, and its line still has extensions left.
+        """
+        if (
+            self.extend_within is None
+            or self.expand is None
+            or extensions >= self.max_extensions
+            or node.distance is None
+        ):
+            return False
+        if node.distance <= self.extend_within:
+            return True
+        return (
+            node.distance <= 2 * self.extend_within
+            and self.env is not None
+            and len(self.env.get_neighbors(node.evader_state)) <= 2
+        )
+
+    def ordered(self, children: list[Node], maximizing: bool) -> list[Node]:
+        """
+        Order children by distance, closest first for the pursuant and farthest first for the evader; children the pursuant cannot reach count as farthest.
+        """
+        return sorted(
+            children,
+            key=lambda c: math.inf if c.distance is None else c.distance,
+            reverse=maximizing,
+        )
+
+    def leaf_value(self, node: Node):
+        """
+        Score a leaf of the search: its distance, or its learned estimate if there is an evaluator.
+        """
+        if self.evaluator is None:
+            return node.distance
+        if node.estimate is None:
+            self.estimate([node])
+        return node.estimate
+
+    def estimate(self, nodes: list[Node]):
+        """
+        Fill in the learned estimate of every open node among siblings with one call of the evaluator, which is much cheaper than scoring them one at a time.
+        """
+        if self.evaluator is None:
+            return
+        todo = [n for n in nodes if n.estimate is None and n.distance is not None]
+        if todo:
+            scores = self.evaluator.evaluate(self.env, todo, self.turns_left)
+            for n, score in zip(todo, scores.tolist()):
+                n.estimate = score
+
+    def _expand(self, node: Node) -> bool:
+        """
+        Create the children of a node the tree stops at, if an expand function is set.
+
+        Returns:
+            Whether the node was expanded, so the caller drops its children once searched.
+        """
+        if node.children or self.expand is None:
+            return False
+        self.expand(node)
+        return True
+
+    def start_search(self, turns_left: int = None):
+        """
+        Prepare for a new turn's search.
+
+        Args:
+            turns_left: plies the game has left before the evader wins, or None for no limit
+        """
+        self.turns_left = turns_left
+        self._traps = {}
+
+    def forced_outcome(self, node: Node):
+        """
+        Score a node whose outcome no longer depends on the search: the evader is caught, provably trapped, out of reach, or too far away to be caught before time runs out.
+
+        Args:
+            node: the game state, whose depth counts plies from the root
+
+        Returns:
+            The mate-style score of the outcome, or None if the game is still open.
+        """
+        ply = node.depth
+        if self.is_capture(node):
+            return self.capture_score(ply)
+        if node.distance is None:
+            return self.escape_score(ply)
+
+        plies_left = None if self.turns_left is None else self.turns_left - ply
+        if plies_left is not None and (self.env is None or not self.env.is_weighted):
+            # every ply closes the gap by at most one cell
+            if plies_left <= 0 or node.distance - 1 > plies_left:
+                return self.escape_score(ply)
+
+        if self.env is not None:
+            plies = self.capture_bound(
+                node.pursuant_state, node.evader_state, node.agent_role
+            )
+            if plies is not None and (plies_left is None or plies <= plies_left):
+                return self.capture_score(ply + plies)
+        return None
+
+    def is_capture(self, node: Node) -> bool:
+        """
+        Return if the pursuant is next to the evader under the movement model, as Environment.is_agent_adjacent decides when the game ends. On diagonal or weighted maps an adjacent evader can be farther than 1 away, so without an env only a distance of 1 counts.
+        """
+        if self.env is None:
+            return node.distance == 1
+        return node.evader_state in self.env.get_neighbors(node.pursuant_state)
+
+    def capture_bound(
+        self, pursuant: CellIndex, evader: CellIndex, to_move: Role
+    ) -> Optional[int]:
+        """
+        Detect an evader trapped in a dead-end pocket: if the cells it can reach without passing the pursuant, together with the pursuant's cell, contain no loop, the pursuant can walk the only path towards it and corner it at the end. The search stops at the first loop, so open positions are rejected after a few cells.
+
+        Args:
+            pursuant: cell of the pursuant
+            evader: cell of the evader
+            to_move: the side to move
+
+        Returns:
+            An upper bound on the plies until capture, or None if the evader is not trapped.
+        """
+        key = (pursuant, evader, to_move)
+        if key in self._traps:
+            return self._traps[key]
+
+        # walk the evader's pocket, giving up at the first loop
+        parent = {evader: None}
+        depth = {}
+        entries = []
+        queue = deque([evader])
+        trapped = True
+        while queue and trapped:
+            cell = queue.popleft()
+            for n in self.env.get_neighbors(cell):
+                if n == pursuant:
+                    entries.append(cell)
+                elif n == parent[cell]:
+                    continue
+                elif n in parent:
+                    trapped = False
+                    break
+                else:
+                    parent[n] = cell
+                    queue.append(n)
+
+        plies = None
+        if trapped and len(entries) == 1:
+            # the pursuant needs one move fewer than its distance to the farthest cell
+            depth[entries[0]] = 1
+            queue = deque([entries[0]])
+            while queue:
+                cell = queue.popleft()
+                for n in self.env.get_neighbors(cell):
+                    if n in parent and n not in depth:
+                        depth[n] = depth[cell] + 1
+                        queue.append(n)
+            moves = max(depth.values()) - 1
+            plies = 2 * moves - 1 if to_move == Role.PURSUANT else 2 * moves
+        self._traps[key] = plies
+        return plies
+
+    def capture_score(self, ply: int) -> int:
+        """
+        Score a capture ply plies from the root; sooner is lower, and so better for the pursuant.
+        """
+        return -(self.MATE - ply)
+
+    def escape_score(self, ply: int) -> int:
+        """
+        Score an escape ply plies from the root; sooner is higher, and so better for the evader.
+        """
+        return self.MATE - ply
+
+    def mark_pruned(self, nodes: list[Node]):
+        """
+        Flag the roots of branches that alpha-beta cut off without visiting. The flag is cleared if a re-search visits them after all.
+
+        Args:
+            nodes: the skipped siblings
+        """
+        for n in nodes:
+            n.pruned = True
 
     def evaluate_heuristic(node: Node, env: Environment):
         """
@@ -0,0 +1,103 @@
+"""
+Movement models: which moves an agent may make, what each step costs, and the per-map neighbor tables built from them.
+"""
+
+import math
+from dataclasses import dataclass
+import numpy as np
+
+from utils import Action
+
+
+@dataclass(frozen=True)
+class MovementModel:
+    """
+    The moves an agent may make from any cell.
+
+    Attributes:
+        actions (tuple[Action, ...]): The allowed moves, in the order neighbors are listed.
+        diagonal_cost (float): Cost of a diagonal step; straight steps cost 1.
+        cut_corners (bool): Whether a diagonal step may squeeze past an obstacle on either side of it.
+    """
+
+    actions: tuple
+    diagonal_cost: float = 1.0
+    cut_corners: bool = False
+
+    @property
+    def diagonal(self) -> bool:
+        """
+        Whether the model allows diagonal steps.
+        """
+        return any(is_diagonal(a) for a in self.actions)
+
+    @property
+    def unit_cost(self) -> bool:
+        """
+        Whether every step costs 1, so distances can be found by breadth-first search.
+        """
+        return not self.diagonal or self.diagonal_cost == 1.0
+
+    def step_costs(self) -> np.ndarray:
+        """
+        Return the base cost of each action, aligned with actions.
+        """
+        return np.array(
+            [self.diagonal_cost if is_diagonal(a) else 1.0 for a in self.actions]
+        )
+
+
+def is_diagonal(action: Action) -> bool:
+    """
+    Return if an action moves along both axes at once.
+    """
+    return action.value.dy != 0 and action.value.dx != 0
+
+
+# neighbor order of the original 4-neighborhood, kept so searches break ties the same way
+FOUR_CONNECTED = MovementModel(
+    (Action.LEFT, Action.RIGHT, Action.UP, Action.DOWN)
+)
+# king moves: every step, straight or diagonal, costs 1
+EIGHT_CONNECTED = MovementModel(
+    FOUR_CONNECTED.actions
+    + (Action.UP_LEFT, Action.UP_RIGHT, Action.DOWN_LEFT, Action.DOWN_RIGHT)
+)
+# 8-connected with diagonals costing their true length
+OCTILE = MovementModel(EIGHT_CONNECTED.actions, diagonal_cost=math.sqrt(2))
+
+MOVEMENT_MODELS = {"4": FOUR_CONNECTED, "8": EIGHT_CONNECTED, "octile": OCTILE}
+
+
+def neighbor_table(
+    blocked: np.ndarray, movement: MovementModel, index: np.ndarray = None
+) -> np.ndarray:
+    """
+    List, for many cells at once, the cells one move away that can be entered.
+
+    Args:
+        blocked (nparray): Boolean grid, True where a cell holds an obstacle.
+        movement (MovementModel): The moves to consider.
+        index (nparray): Flat indices of the cells to list neighbors for; every cell by default.
+
+    Returns:
+        An int64 array shaped (len(index), len(movement.actions)) of flat neighbor indices, with -1 where a move leaves the grid, enters an obstacle or cuts a corner.
+    """
+    rows, cols = blocked.shape
+    if index is None:
+        index = np.arange(rows * cols)
+    row, col = np.divmod(index, cols)
+    table = np.full((len(index), len(movement.actions)), -1, dtype=np.int64)
+    for k, action in enumerate(movement.actions):
+        dr, dc = action.value.dy, action.value.dx
+        r = row + dr
+        c = col + dc
+        ok = (r >= 0) & (r < rows) & (c >= 0) & (c < cols)
+        r_in = np.clip(r, 0, rows - 1)
+        c_in = np.clip(c, 0, cols - 1)
+        ok &= ~blocked[r_in, c_in]
+        if dr and dc and not movement.cut_corners:
+            # both cells beside the diagonal must be open
+            ok &= ~blocked[r_in, col] & ~blocked[row, c_in]
+        table[ok, k] = (r * cols + c)[ok]
+    return table
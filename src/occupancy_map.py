@@ -0,0 +1,120 @@
+"""
+Load real occupancy maps (NumPy arrays, PGM/PNG images and ROS map YAML files) as obstacle grids.
+"""
+
+import os
+import numpy as np
+
+from environment import Environment
+from utils import CellIndex
+
+
+def load_occupancy_map(
+    path: str,
+    occupied_thresh=0.65,
+    free_thresh=0.196,
+    negate=False,
+    unknown_is_obstacle=True,
+) -> np.ndarray:
+    """
+    Read an occupancy map into a grid of obstacles.
+
+    .npy files are memory-mapped copy-on-write, so a uint8 or bool map is handed on without being read into memory; a uint8 map must then hold only 0 and 1, since Environment.from_array does not scan it. Images are thresholded the way the ROS map_server does: a pixel's occupancy is (255 - value) / 255 (or value / 255 when negated). A .yaml file is read for the image path and thresholds, which then override the arguments.
+
+    Args:
+        path (str): The .npy, image or .yaml file.
+        occupied_thresh (float): Occupancy above which a pixel is an obstacle.
+        free_thresh (float): Occupancy below which a pixel is free.
+        negate (bool): Whether white, rather than black, means occupied.
+        unknown_is_obstacle (bool): Whether pixels between the thresholds count as obstacles.
+
+    Returns:
+        An array that is nonzero where a cell holds an obstacle, ready for Environment.from_array.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        return np.load(path, mmap_mode="c")
+
+    if ext in (".yaml", ".yml"):
+        meta = read_map_yaml(path)
+        image = meta["image"]
+        if not os.path.isabs(image):
+            image = os.path.join(os.path.dirname(path), image)
+        return load_occupancy_map(
+            image,
+            occupied_thresh=float(meta.get("occupied_thresh", occupied_thresh)),
+            free_thresh=float(meta.get("free_thresh", free_thresh)),
+            negate=bool(int(meta.get("negate", int(negate)))),
+            unknown_is_obstacle=unknown_is_obstacle,
+        )
+
+    from PIL import Image
+
+    with Image.open(path) as img:
+        pixels = np.asarray(img.convert("L"))
+    return threshold_occupancy(
+        pixels, occupied_thresh, free_thresh, negate, unknown_is_obstacle
+    )
+
+
+def threshold_occupancy(
+    pixels: np.ndarray,
+    occupied_thresh=0.65,
+    free_thresh=0.196,
+    negate=False,
+    unknown_is_obstacle=True,
+) -> np.ndarray:
+    """
+    Classify every pixel of a grayscale map at once.
+
+    Args:
+        pixels (nparray): uint8 grayscale image.
+        occupied_thresh (float): Occupancy above which a pixel is an obstacle.
+        free_thresh (float): Occupancy below which a pixel is free.
+        negate (bool): Whether white, rather than black, means occupied.
+        unknown_is_obstacle (bool): Whether pixels between the thresholds count as obstacles.
+
+    Returns:
+        A bool grid, True where a cell holds an obstacle.
+    """
+    occupancy = pixels.astype(np.float32) / 255.0
+    if not negate:
+        occupancy = 1.0 - occupancy
+    if unknown_is_obstacle:
+        return ~(occupancy < free_thresh)
+    return occupancy > occupied_thresh
+
+
+def read_map_yaml(path: str) -> dict:
+    """
+    Read the flat "key: value" pairs of a ROS map YAML file. Nested values such as the origin are kept as raw strings.
+    """
+    meta = {}
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if ":" not in line:
+                continue
+            key, value = line.split(":", 1)
+            meta[key.strip()] = value.strip().strip("\"'")
+    return meta
+
+
+def load_environment(
+    path: str,
+    pursuant_pos: CellIndex,
+    evader_pos: CellIndex,
+    **kwargs,
+) -> Environment:
+    """
+    Build an Environment from an occupancy map file.
+
+    Args:
+        path (str): The .npy, image or .yaml file.
+        pursuant_pos (CellIndex): Starting position of the pursuant agent.
+        evader_pos (CellIndex): Starting position of the evader agent.
+        kwargs: Thresholding options forwarded to load_occupancy_map.
+    """
+    return Environment.from_array(
+        load_occupancy_map(path, **kwargs), pursuant_pos, evader_pos
+    )
@@ -0,0 +1,275 @@
+"""
+Profile games phase by phase: where the time goes (cProfile) and what memory grows (tracemalloc) during map generation, tree building, search, moves and rendering.
+
+A PhaseProfiler is handed to a GameState, or to run_sweep or the CLI's --profile option, and every phase of the game runs inside one of its phases. Afterwards it writes a text report, one pstats file per phase and a collapsed-stack file that flamegraph tools (flamegraph.pl, speedscope, inferno) read directly. It only needs the standard library, so it works headless and inside worker processes.
+
+Example, from `src`:
+    profiler = PhaseProfiler()
+    GameState(episode=0, depth=6, profiler=profiler).run_loop()
+    profiler.dump("profile")
+"""
+
+import cProfile
+import contextlib
+import glob
+import io
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+
+class PhaseProfiler:
+    """
+    Collect cProfile statistics and tracemalloc allocations per named phase. Phases may nest; time and allocations always count towards the innermost phase running, so phases never double count.
+
+    Net and peak memory are measured on every entry of a phase. Allocation sites need a tracemalloc snapshot before and after, which costs time in proportion to the live allocations, so they are sampled: the first entry of each phase and every snapshot_every-th after it.
+
+    Attributes:
+        memory (bool): Whether allocations are traced, which slows the program down further.
+        snapshot_every (int): Entries of a phase between allocation-site samples.
+        seconds (Counter): Wall-clock seconds spent in each phase.
+        entries (Counter): How often each phase was entered.
+        net_bytes (Counter): Traced memory each phase left allocated.
+        peak_bytes (dict): Largest traced memory seen during each phase.
+    """
+
+    def __init__(self, memory=True, frames=1, snapshot_every=10):
+        """
+        Args:
+            memory (bool): Trace allocations with tracemalloc as well as timing calls.
+            frames (int): Frames of traceback tracemalloc stores per allocation; 1 attributes each allocation to its line.
+            snapshot_every (int): Sample allocation sites on every this many entries of a phase.
+        """
+        self.memory = memory
+        self.snapshot_every = snapshot_every
+        self.seconds = Counter()
+        self.entries = Counter()
+        self.net_bytes = Counter()
+        self.peak_bytes = {}
+        self._profiles = {}  # phase -> cProfile.Profile
+        self._allocations = {}  # phase -> Counter of net bytes by "file:line"
+        self._stack = []  # phases entered and not yet left, innermost last
+        self._segment_start = None  # (time, traced bytes, snapshot or None) when the innermost phase last resumed
+        self._started_tracing = memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(frames)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Attribute everything run inside the block to a phase, pausing the enclosing phase meanwhile.
+
+        Args:
+            name (str): The phase, e.g. "search".
+        """
+        self.entries[name] += 1
+        outer = self._stack[-1] if self._stack else None
+        self._switch(outer, name)
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            self._switch(name, outer)
+
+    def phases(self) -> list[str]:
+        """
+        List the phases seen, slowest first.
+        """
+        return [name for name, _ in self.seconds.most_common()]
+
+    def stats(self, name: str) -> pstats.Stats:
+        """
+        Return the cProfile statistics of a phase.
+        """
+        return pstats.Stats(self._profiles[name], stream=io.StringIO())
+
+    def top_allocations(self, name: str, top=10) -> list[tuple[str, int]]:
+        """
+        Return the lines whose allocations grew the most during the sampled entries of a phase, as ("file:line", net bytes).
+        """
+        return self._allocations.get(name, Counter()).most_common(top)
+
+    def collapsed_stacks(self) -> Counter:
+        """
+        Turn the profiles into collapsed stacks, "phase;outer;...;inner" mapped to microseconds of self time. cProfile only records which function called which, so each function's self time is spread over its callers in proportion to the time it spent under each, recursion folded into a single frame.
+        """
+        stacks = Counter()
+        for name in self._profiles:
+            raw = self.stats(name).stats
+            for func, (_, _, self_time, _, _) in raw.items():
+                if self_time <= 0:
+                    continue
+                for path, share in _call_paths(func, raw):
+                    frames = [name] + [_frame_label(f) for f in reversed(path)]
+                    stacks[";".join(frames)] += self_time * share * 1e6
+        return Counter({stack: round(us) for stack, us in stacks.items() if us >= 0.5})
+
+    def report(self, file=None, top=10):
+        """
+        Print, for every phase, its time, peak memory, slowest functions and fastest-growing allocations.
+
+        Args:
+            file: Stream to print to; stdout by default.
+            top (int): Functions and allocation sites to list per phase.
+        """
+        file = file or sys.stdout
+        total = sum(self.seconds.values()) or 1.0
+        print("phase      entries   seconds  share   net MiB  peak MiB", file=file)
+        for name in self.phases():
+            memory = "       -         -"
+            if self.memory:
+                memory = (
+                    f"{self.net_bytes[name] / 2**20:9.2f} "
+                    f"{self.peak_bytes.get(name, 0) / 2**20:9.2f}"
+                )
+            print(
+                f"{name:10} {self.entries[name]:7} {self.seconds[name]:9.3f} "
+                f"{self.seconds[name] / total:6.1%} {memory}",
+                file=file,
+            )
+        for name in self.phases():
+            print(f"\n=== {name} ===", file=file)
+            stats = self.stats(name)
+            stats.stream = file
+            stats.sort_stats("cumulative").print_stats(top)
+            if self.memory:
+                print("net allocations, sampled entries:", file=file)
+                for site, size in self.top_allocations(name, top):
+                    print(f"  {size / 1024:10.1f} KiB  {site}", file=file)
+
+    def write_collapsed(self, path: str):
+        """
+        Write the collapsed stacks, one "stack count" line each, as read by flamegraph.pl and speedscope.
+        """
+        with open(path, "w") as f:
+            for stack, us in sorted(self.collapsed_stacks().items()):
+                f.write(f"{stack} {us}\n")
+
+    def dump(self, directory: str, prefix="profile"):
+        """
+        Write everything to a directory: <prefix>.txt with the report, <prefix>.collapsed with the stacks, and <prefix>-<phase>.prof with each phase's pstats, for snakeviz or pstats.
+
+        Args:
+            directory (str): Where to write; created if missing.
+            prefix (str): Start of every file name, e.g. to tell worker processes apart.
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, prefix)
+        with open(base + ".txt", "w") as f:
+            self.report(file=f)
+        self.write_collapsed(base + ".collapsed")
+        for name in self._profiles:
+            self.stats(name).dump_stats(f"{base}-{name}.prof")
+
+    def close(self):
+        """
+        Stop tracing allocations, if this profiler started it.
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _switch(self, current, name):
+        """
+        End the running segment, crediting it to the current phase, and start one for the given phase (None to run unprofiled).
+        """
+        now = time.perf_counter()
+        if current is not None:
+            self._profiles[current].disable()
+            started, traced, snapshot = self._segment_start
+            self.seconds[current] += now - started
+            if self.memory:
+                self._record_memory(current, traced, snapshot)
+        if name is None:
+            self._segment_start = None
+            return
+
+        traced, snapshot = 0, None
+        if self.memory:
+            if (self.entries[name] - 1) % self.snapshot_every == 0:
+                snapshot = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            traced, _ = tracemalloc.get_traced_memory()
+        self._segment_start = (time.perf_counter(), traced, snapshot)
+        self._profiles.setdefault(name, cProfile.Profile()).enable()
+
+    def _record_memory(self, name, traced: int, before: tracemalloc.Snapshot):
+        """
+        Add a segment's net and peak memory to a phase, and its allocation sites if it was sampled.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        self.net_bytes[name] += current - traced
+        self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak)
+        if before is None:
+            return
+        after = tracemalloc.take_snapshot()
+        sites = self._allocations.setdefault(name, Counter())
+        for diff in after.compare_to(before, "lineno"):
+            frame = diff.traceback[0]
+            if diff.size_diff and not _is_own_file(frame.filename):
+                sites[f"{frame.filename}:{frame.lineno}"] += diff.size_diff
+
+
+def _is_own_file(filename: str) -> bool:
+    """
+    Return if allocations in a file belong to the profiler or tracemalloc rather than the program.
+    """
+    return filename in (tracemalloc.__file__, __file__)
+
+
+def _frame_label(func: tuple) -> str:
+    """
+    Name a pstats function key as "name (file:line)", or just its name for built-ins.
+    """
+    filename, line, name = func
+    if filename == "~":
+        return name.replace(";", ",")
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+
+def _call_paths(func: tuple, raw: dict, min_share=1e-3, max_depth=64):
+    """
+    Walk the caller graph of a pstats table upwards from a function, yielding each call path (innermost first) with the share of the function's self time credited to it. Paths whose share drops below min_share are cut short rather than followed further.
+    """
+    pending = [([func], 1.0)]
+    while pending:
+        path, share = pending.pop()
+        callers = raw[path[-1]][4]
+        # weigh callers by the time the callee spent under each, skipping recursive edges
+        edges = {c: timing[3] for c, timing in callers.items() if c not in path}
+        total = sum(edges.values())
+        if not edges or total <= 0 or share < min_share or len(path) >= max_depth:
+            yield path, share
+            continue
+        for caller, time_under in edges.items():
+            if time_under > 0:
+                pending.append((path + [caller], share * time_under / total))
+
+
+def merge_collapsed(paths: list[str], output: str) -> int:
+    """
+    Sum collapsed-stack files, e.g. one per worker process, into one.
+
+    Args:
+        paths (list[str]): Files to merge; glob patterns are expanded.
+        output (str): File to write.
+
+    Returns:
+        The number of distinct stacks written.
+    """
+    stacks = Counter()
+    for pattern in paths:
+        for path in glob.glob(pattern):
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    if stack:
+                        stacks[stack] += int(count)
+    with open(output, "w") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+    return len(stacks)
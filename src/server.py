@@ -0,0 +1,397 @@
+"""
+Serve move decisions for many live games at once.
+
+A GameServer accepts positions from any number of concurrent games on one asyncio event loop and runs the searches in a process pool. Each request deepens its search one ply at a time until its deadline, answering with the deepest move found so far, and solved positions are cached across requests and games.
+
+Example, from `src`:
+    async with GameServer(workers=4) as server:
+        winner, turns = await play_live_game(server, env, depth=4, deadline=0.5)
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+
+from environment import Environment
+from gamestate import GameState
+from movement import MovementModel, FOUR_CONNECTED
+from shared_tables import SharedMapTables, attach_environment
+from utils import CellIndex, Role, Action, Occupancy, get_adversary
+
+
+@dataclass(frozen=True)
+class MoveRequest:
+    """
+    A position to find a move for.
+
+    Attributes:
+        obstacles (nparray): uint8 grid, 1 where a cell holds an obstacle and 0 elsewhere.
+        pursuant (CellIndex): Cell of the pursuant.
+        evader (CellIndex): Cell of the evader.
+        turn (Role): The side to move.
+        depth (int): Deepest search to run, in plies.
+        deadline (float): Seconds the caller is willing to wait for a move.
+        movement (MovementModel): The moves agents may make.
+        terrain (nparray): Cost of entering each cell, or None when every cell costs the same.
+        turns_left (int): Turns the evader must still survive to win, or None for no limit.
+    """
+
+    obstacles: np.ndarray
+    pursuant: CellIndex
+    evader: CellIndex
+    turn: Role
+    depth: int = 3
+    deadline: float = 1.0
+    movement: MovementModel = FOUR_CONNECTED
+    terrain: Optional[np.ndarray] = None
+    turns_left: Optional[int] = None
+
+    @classmethod
+    def from_environment(cls, env: Environment, turn: Role, **kwargs) -> "MoveRequest":
+        """
+        Describe the current position of a live environment.
+
+        Args:
+            env (Environment): The field being played on.
+            turn (Role): The side to move.
+            kwargs: depth, deadline and turns_left settings.
+        """
+        return cls(
+            obstacles=(env.snapshot() == Occupancy.OBSTACLE.value).astype(np.uint8),
+            pursuant=env.get_agent_cell(Role.PURSUANT),
+            evader=env.get_agent_cell(Role.EVADER),
+            turn=turn,
+            movement=env.movement,
+            terrain=env.terrain,
+            **kwargs,
+        )
+
+    def key(self) -> tuple:
+        """
+        Identify the position, independent of depth and deadline, for the solved-position cache.
+        """
+        digest = hashlib.sha1(np.ascontiguousarray(self.obstacles).tobytes())
+        return (
+            digest.hexdigest(),
+            self.obstacles.shape,
+            self.pursuant,
+            self.evader,
+            self.turn,
+            self.movement,
+            self.terrain_digest(),
+            self.turns_left,
+        )
+
+    def terrain_digest(self) -> Optional[str]:
+        """
+        Identify the terrain costs, or None on a map where every cell costs the same.
+        """
+        if self.terrain is None:
+            return None
+        terrain = np.ascontiguousarray(self.terrain, dtype=float)
+        return hashlib.sha1(terrain.tobytes()).hexdigest()
+
+
+@dataclass
+class MoveReply:
+    """
+    The server's answer to a MoveRequest.
+
+    Attributes:
+        action (Action): The move to make, or None if the side to move is boxed in.
+        value: Minimax value of the position after the move.
+        depth (int): Plies searched to find the move.
+        cached (bool): Whether the move came straight from the cache.
+        timed_out (bool): Whether the deadline cut the search short of the requested depth.
+    """
+
+    action: Optional[Action]
+    value: object
+    depth: int
+    cached: bool = False
+    timed_out: bool = False
+
+
+@dataclass
+class _Solution:
+    action: Optional[Action]
+    value: object
+    depth: int
+
+
+def search_position(
+    obstacles: np.ndarray,
+    pursuant: CellIndex,
+    evader: CellIndex,
+    turn: Role,
+    depth: int,
+    movement: MovementModel = FOUR_CONNECTED,
+    tables: dict = None,
+    terrain: np.ndarray = None,
+    turns_left: int = None,
+) -> tuple:
+    """
+    Search one position to a fixed depth. Runs in a worker process, so it rebuilds the field from the obstacle grid and terrain, or attaches to the map's shared tables (which carry the terrain) when given their spec, and keeps the game log quiet. The search scores escapes against turns_left when given, and against a whole game otherwise.
+
+    Returns:
+        The best action (None if the side to move has no legal move) and its minimax value.
+    """
+    if tables is not None:
+        env = attach_environment(tables, pursuant, evader)
+    else:
+        env = Environment.from_array(
+            np.asarray(obstacles, dtype=np.uint8), pursuant, evader, movement=movement
+        )
+        if terrain is not None:
+            env.set_terrain(terrain)
+    mover = pursuant if turn == Role.PURSUANT else evader
+    if not env.get_neighbors(mover):
+        return None, env.get_shortest_distance(pursuant, evader)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        game = GameState(episode=0, depth=depth, env=env)
+        game.current_turn = turn
+        if turns_left is not None:
+            game.turn_count = game.EVADER_THRESHOLD - turns_left
+        action = game.compute_next_move()
+    return action, game.game_tree.value
+
+
+def publish_tables(request: MoveRequest) -> SharedMapTables:
+    """
+    Rebuild the field of a request, with its movement model and terrain, and publish its tables in shared memory.
+    """
+    env = Environment.from_array(
+        np.asarray(request.obstacles, dtype=np.uint8),
+        request.pursuant,
+        request.evader,
+        movement=request.movement,
+    )
+    if request.terrain is not None:
+        env.set_terrain(request.terrain)
+    return SharedMapTables(env)
+
+
+class GameServer:
+    """
+    Answer move requests from many concurrent games, with bounded compute.
+
+    Attributes:
+        executor (Executor): Where searches run; a process pool by default.
+        cache_size (int): Most solved positions to keep, least recently used first out.
+        cache_hits (int): Requests answered from the cache without searching.
+        searches (int): Fixed-depth searches started.
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        cache_size=10000,
+        max_pending: int = None,
+        executor: Executor = None,
+        share_tables=False,
+    ):
+        """
+        Args:
+            workers (int): Worker processes for the default pool; one per core by default.
+            cache_size (int): Most solved positions to keep.
+            max_pending (int): Most searches handed to the executor at once, so that thousands of games queue fairly on the event loop instead of in the pool; twice the workers by default.
+            executor (Executor): Run searches here instead, e.g. a ThreadPoolExecutor for local tests.
+            share_tables (bool): Publish the labels, neighbors and all-pairs distances of every map in shared memory the first time it is requested, so workers look distances up instead of searching. Suited to a fixed set of small maps: each costs (rows * cols)^2 distances and stays published until the server closes.
+        """
+        self._owns_executor = executor is None
+        self.executor = executor or ProcessPoolExecutor(workers)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # position key -> deepest _Solution found
+        self._running = {}  # (position key, depth) -> search task shared by identical requests
+        self._slots = asyncio.Semaphore(max_pending or 2 * (workers or os.cpu_count()))
+        self.share_tables = share_tables
+        self._tables = {}  # (map digest, shape, movement, terrain digest) -> future of its SharedMapTables
+        self.cache_hits = 0
+        self.searches = 0
+
+    async def __aenter__(self) -> "GameServer":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """
+        Cancel searches nobody is waiting for any more and shut the executor down.
+        """
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+        if self._owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        published = await asyncio.gather(*self._tables.values(), return_exceptions=True)
+        for tables in published:
+            if isinstance(tables, SharedMapTables):
+                tables.close()
+        self._tables = {}
+
+    async def request_move(self, request: MoveRequest) -> MoveReply:
+        """
+        Find a move by iterative deepening: search one ply, then two, and so on up to the requested depth, keeping the deepest finished answer. When the deadline passes, that answer is returned while the deeper search carries on in the background, so its result is cached for the next request. A one-ply answer is always awaited, even past the deadline, so every request gets a move.
+
+        Args:
+            request (MoveRequest): The position and its search limits.
+
+        Returns:
+            The move and how it was found.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + request.deadline
+        key = request.key()
+
+        best = self._lookup(key)
+        if best is not None and best.depth >= request.depth:
+            self.cache_hits += 1
+            return MoveReply(best.action, best.value, best.depth, cached=True)
+
+        timed_out = False
+        depth = 1 if best is None else best.depth + 1
+        while depth <= request.depth:
+            remaining = deadline - loop.time()
+            if best is not None and remaining <= 0:
+                timed_out = True
+                break
+            task = self._search(request, key, depth)
+            if best is None:
+                best = await asyncio.shield(task)
+            else:
+                try:
+                    best = await asyncio.wait_for(asyncio.shield(task), remaining)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    break
+            depth += 1
+        return MoveReply(best.action, best.value, best.depth, timed_out=timed_out)
+
+    def _search(self, request: MoveRequest, key: tuple, depth: int) -> asyncio.Task:
+        """
+        Start a fixed-depth search, or join the identical one already running.
+        """
+        task = self._running.get((key, depth))
+        if task is None:
+            task = asyncio.ensure_future(self._run_search(request, key, depth))
+            self._running[(key, depth)] = task
+        return task
+
+    async def _run_search(
+        self, request: MoveRequest, key: tuple, depth: int
+    ) -> _Solution:
+        """
+        Run one search in the executor once a slot frees up, and cache its result.
+        """
+        try:
+            async with self._slots:
+                self.searches += 1
+                tables = await self._tables_for(request, key)
+                action, value = await asyncio.get_running_loop().run_in_executor(
+                    self.executor,
+                    search_position,
+                    request.obstacles,
+                    request.pursuant,
+                    request.evader,
+                    request.turn,
+                    depth,
+                    request.movement,
+                    tables,
+                    request.terrain,
+                    request.turns_left,
+                )
+            solution = _Solution(action, value, depth)
+            self._store(key, solution)
+            return solution
+        finally:
+            self._running.pop((key, depth), None)
+
+    async def _tables_for(self, request: MoveRequest, key: tuple) -> Optional[dict]:
+        """
+        Return the spec of the request's map in shared memory, or None when tables are not shared. The first request for a map publishes it on a thread, so the event loop keeps serving other games meanwhile; concurrent requests for the same map wait for that one build.
+        """
+        if not self.share_tables:
+            return None
+        map_key = (key[0], key[1], request.movement, request.terrain_digest())
+        future = self._tables.get(map_key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(
+                None, publish_tables, request
+            )
+            self._tables[map_key] = future
+        try:
+            tables = await asyncio.shield(future)
+        except Exception:
+            # let the next request for the map try again
+            if self._tables.get(map_key) is future:
+                del self._tables[map_key]
+            raise
+        return tables.spec
+
+    def _lookup(self, key: tuple) -> Optional[_Solution]:
+        """
+        Return the deepest cached solution of a position, marking it recently used.
+        """
+        solution = self.cache.get(key)
+        if solution is not None:
+            self.cache.move_to_end(key)
+        return solution
+
+    def _store(self, key: tuple, solution: _Solution):
+        """
+        Cache a solution unless a deeper one is already known, evicting the least recently used positions beyond cache_size.
+        """
+        known = self.cache.get(key)
+        if known is None or known.depth < solution.depth:
+            self.cache[key] = solution
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+
+async def play_live_game(
+    server: GameServer,
+    env: Environment,
+    depth=3,
+    deadline=1.0,
+    max_turns=25,
+) -> tuple[Optional[Role], int]:
+    """
+    Play one game through a server, as a simulated robot would: send the position, apply the reply, repeat. Many of these can run concurrently on one event loop.
+
+    Args:
+        server (GameServer): Where to ask for moves.
+        env (Environment): The field to play on, with both agents placed.
+        depth (int): Deepest search to ask for.
+        deadline (float): Seconds to allow each move.
+        max_turns (int): Turns the evader must survive to win.
+
+    Returns:
+        The winner, or None if the agents cannot reach each other, and the number of turns played.
+    """
+    if not env.is_traversable():
+        return None, 0
+
+    turn = Role.PURSUANT
+    turns = 0
+    while not env.is_agent_adjacent():
+        if turns >= max_turns:
+            return Role.EVADER, turns
+        reply = await server.request_move(
+            MoveRequest.from_environment(
+                env, turn, depth=depth, deadline=deadline, turns_left=max_turns - turns
+            )
+        )
+        if reply.action is not None:
+            env.move_agent(turn, reply.action)
+        turn = get_adversary(turn)
+        turns += 1
+    return Role.PURSUANT, turns
@@ -0,0 +1,124 @@
+"""
+Share a map's precomputed tables (component labels, neighbor table, distance fields) between worker processes through shared memory.
+
+The parent publishes the tables once; every worker attaches to the same pages read-only, so memory stays flat as workers are added and a worker's setup is a handful of attach calls instead of a rebuild. Workers must be children of the publishing process (a multiprocessing Pool or ProcessPoolExecutor), which share its resource tracker.
+
+Example:
+    with SharedMapTables(env) as tables:
+        pool.map(work, [tables.spec] * n)
+
+    def work(spec):
+        env = attach_environment(spec, CellIndex(0, 0), CellIndex(4, 4))
+"""
+
+from multiprocessing import shared_memory
+import numpy as np
+
+from environment import Environment, DistanceTable
+from utils import CellIndex, Occupancy
+
+# blocks attached by this process, kept open for its lifetime: name -> (block, view)
+_attached = {}
+
+
+class SharedMapTables:
+    """
+    Publish the tables of one map in shared memory. The owner must close the tables, which also removes them, once no worker needs them any more.
+
+    Attributes:
+        spec (dict): Picklable description of the published blocks, to hand to workers.
+    """
+
+    def __init__(self, env: Environment, sources: list[CellIndex] = None):
+        """
+        Args:
+            env (Environment): The map to publish, with its movement model and terrain.
+            sources (list[CellIndex]): Cells to publish distance fields from; every non-obstacle cell by default, which takes (rows * cols)^2 entries.
+        """
+        distances = DistanceTable.build(env, sources)
+        arrays = {
+            "obstacles": (env.snapshot() == Occupancy.OBSTACLE.value).astype(np.uint8),
+            "components": env.get_component_labels(),
+            "neighbor_table": env.get_neighbor_table(),
+            "distance_index": distances.index,
+            "distance_fields": distances.fields,
+        }
+        if env.terrain is not None:
+            arrays["terrain"] = env.terrain
+
+        self._blocks = []
+        self.spec = {"movement": env.movement, "arrays": {}}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[...] = array
+            del view
+            self._blocks.append(block)
+            self.spec["arrays"][name] = (block.name, array.shape, array.dtype.str)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Total size of the published blocks.
+        """
+        return sum(block.size for block in self._blocks)
+
+    def close(self):
+        """
+        Release and remove every published block.
+        """
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "SharedMapTables":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_array(name: str, shape: tuple, dtype: str) -> np.ndarray:
+    """
+    Map a published block into this process as a read-only array. Blocks are attached once per process and reused.
+    """
+    if name not in _attached:
+        block = shared_memory.SharedMemory(name=name)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        view.flags.writeable = False
+        _attached[name] = (block, view)
+    return _attached[name][1]
+
+
+def attach_environment(
+    spec: dict,
+    pursuant_pos: CellIndex,
+    evader_pos: CellIndex,
+    use_bitboard=False,
+) -> Environment:
+    """
+    Build an Environment on a published map whose labels, neighbors and distances are read from shared memory. Only the grid itself, which the agents are placed on, is copied.
+
+    Args:
+        spec (dict): SharedMapTables.spec of the map.
+        pursuant_pos (CellIndex): Starting position of the pursuant agent.
+        evader_pos (CellIndex): Starting position of the evader agent.
+        use_bitboard (bool): Answer distance and adjacency queries with bitboards where no table applies.
+    """
+    arrays = {name: attach_array(*block) for name, block in spec["arrays"].items()}
+    env = Environment.from_array(
+        arrays["obstacles"],
+        pursuant_pos,
+        evader_pos,
+        use_bitboard=use_bitboard,
+        movement=spec["movement"],
+    )
+    if "terrain" in arrays:
+        env.set_terrain(arrays["terrain"])
+    env.use_precomputed(
+        components=arrays["components"],
+        neighbor_table=arrays["neighbor_table"],
+        distances=DistanceTable(arrays["distance_index"], arrays["distance_fields"]),
+    )
+    return env
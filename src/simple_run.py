@@ -1,17 +1,16 @@
 from gamestate import GameState
 
-from visualizations import gamestate_gif
 from utils import Role
 
 if __name__ == "__main__":
     results = []
     for episode in range(0, 20):
-        game = GameState(episode)
+        game = GameState(episode, record=episode <= 0)
         winner, game_history = game.run_loop()
         results.append(winner)
 
-        if episode <= 0:
-            gamestate_gif(0)
+        if game.recorder is not None:
+            game.recorder.save_gif()
 
     print(f"# of pursuant wins: {results.count(Role.PURSUANT)}\n")
     print(f"# of evader wins: {results.count(Role.EVADER)}\n")
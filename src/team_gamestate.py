@@ -0,0 +1,89 @@
+"""
+Play pursuit between teams: N pursuers against M evaders.
+"""
+
+import random
+
+from environment import Environment
+from gamestate import GameState
+from movement import FOUR_CONNECTED
+from team_minimax import TeamMiniMax
+from utils import CellIndex, Role, derive_action
+
+
+class TeamGameState(GameState):
+    """
+    Run a game between a team of pursuants and a team of evaders. On each turn every agent of one side moves, as chosen by a joint-move search, and the pursuants win as soon as any of them is adjacent to any evader.
+    """
+
+    def __init__(
+        self,
+        episode,
+        size=7,
+        density=0.1,
+        depth=2,
+        p_starts=(CellIndex(0, 0), CellIndex(0, 6)),
+        e_starts=(CellIndex(6, 3),),
+        max_branching=None,
+        record=False,
+        seed=None,
+        env=None,
+        movement=FOUR_CONNECTED,
+    ):
+        """
+        Args:
+            episode: game number
+            size: side length, or (rows, cols), of the generated field
+            density: obstacle density of the generated field
+            depth: plies to look ahead
+            p_starts: starting cells of the pursuants
+            e_starts: starting cells of the evaders
+            max_branching: most joint moves to search per position, or None for all of them
+            record: whether to buffer frames of the game for a GIF
+            seed: seed for the generated field
+            env: a field with both teams already placed, used instead of generating one
+            movement: the moves agents may make on the generated field
+        """
+        if env is None:
+            env = Environment(
+                size,
+                density,
+                p_starts[0],
+                e_starts[0],
+                random.Random(seed) if seed is not None else None,
+                additional_agents={
+                    Role.PURSUANT: list(p_starts[1:]),
+                    Role.EVADER: list(e_starts[1:]),
+                },
+                movement=movement,
+            )
+        super().__init__(episode, depth=depth, record=record, env=env)
+        self.agents = TeamMiniMax(self.env, max_branching)
+
+    def compute_next_move(self) -> list[tuple[CellIndex, object]]:
+        """
+        Search for the best joint move of the side whose turn it is.
+
+        Returns:
+            An (origin, action) pair for every agent that moves.
+        """
+        print(f"T{self.turn_count}) Team {self.current_turn}\n")
+        pursuants = tuple(self.env.get_agent_cells(Role.PURSUANT))
+        evaders = tuple(self.env.get_agent_cells(Role.EVADER))
+        value, move = self.agents.search(
+            pursuants, evaders, self.current_turn, self.LOOKAHEAD_DEPTH
+        )
+        team = pursuants if self.current_turn == Role.PURSUANT else evaders
+        print(f"-> chose {move} with value {value}\n")
+        return [
+            (origin, derive_action(origin, dest))
+            for origin, dest in zip(team, move)
+            if origin != dest
+        ]
+
+    def apply_move(self, action):
+        """
+        Move every agent of the side whose turn it is.
+        """
+        for origin, a in action:
+            self.env.move_agent(self.current_turn, a, origin)
@@ -0,0 +1,203 @@
+"""
+Decide joint actions for teams of pursuers and evaders.
+"""
+
+import itertools
+
+from environment import Environment
+from utils import CellIndex, Role, get_adversary
+
+
+class TeamMiniMax:
+    """
+    Implements minimax with alpha-beta pruning over the joint moves of two teams. Each ply moves every agent of one side at once, so the branching factor grows as 4^(team size); to keep that tractable, positions are scored from cached distance fields and joint moves are searched best-first, optionally keeping only the most promising ones.
+
+    Attributes:
+        env (Environment): The field the teams play on.
+        max_branching (int): Most joint moves to search per position, or None for all of them.
+        nodes_visited (int): Positions evaluated by the last search.
+    """
+
+    CAPTURED = 0  # score of a position where a pursuant is next to an evader, below every distance
+
+    def __init__(self, env: Environment, max_branching=None):
+        """
+        Initialize instance of TeamMiniMax class.
+        """
+        self.env = env
+        self.max_branching = max_branching
+        self.nodes_visited = 0
+
+    def search(
+        self,
+        pursuants: tuple[CellIndex, ...],
+        evaders: tuple[CellIndex, ...],
+        role: Role,
+        depth: int,
+    ) -> tuple[int, tuple[CellIndex, ...]]:
+        """
+        Find the best joint move for one side.
+
+        Args:
+            pursuants: cells of the pursuing team
+            evaders: cells of the evading team
+            role: the side to move
+            depth: number of plies to look ahead, including this one
+
+        Returns:
+            The minimax value and the destination of each agent of the moving side, in the order given.
+        """
+        self.nodes_visited = 0
+        alpha = -float("inf")
+        beta = float("inf")
+        best_value = None
+        best_move = None
+        for move, p, e in self.ordered_moves(pursuants, evaders, role):
+            value = self.minimax(p, e, get_adversary(role), depth - 1, alpha, beta)
+            if role == Role.EVADER and (best_value is None or value > best_value):
+                best_value, best_move = value, move
+                alpha = max(alpha, value)
+            elif role == Role.PURSUANT and (best_value is None or value < best_value):
+                best_value, best_move = value, move
+                beta = min(beta, value)
+        return best_value, best_move
+
+    def minimax(
+        self,
+        pursuants: tuple[CellIndex, ...],
+        evaders: tuple[CellIndex, ...],
+        role: Role,
+        depth: int,
+        alpha=-float("inf"),
+        beta=float("inf"),
+    ):
+        """
+        Recursive function to output the min/max value of a position, pruning when alpha >= beta.
+
+        Args:
+            pursuants: cells of the pursuing team
+            evaders: cells of the evading team
+            role: the side to move
+            depth: plies left to search
+            alpha: best value the evaders are assured of
+            beta: best value the pursuants are assured of
+        """
+        value = self.evaluate(pursuants, evaders)
+        # Exit on base case: out of depth or someone was caught
+        if depth <= 0 or value == self.CAPTURED:
+            return value
+
+        # Evaders
+        if role == Role.EVADER:
+            max_eval = -float("inf")
+            for _, p, e in self.ordered_moves(pursuants, evaders, role):
+                max_eval = max(
+                    max_eval, self.minimax(p, e, Role.PURSUANT, depth - 1, alpha, beta)
+                )
+                if max_eval >= beta:
+                    break
+                alpha = max(alpha, max_eval)
+            return max_eval
+
+        # Pursuants
+        min_eval = float("inf")
+        for _, p, e in self.ordered_moves(pursuants, evaders, role):
+            min_eval = min(
+                min_eval, self.minimax(p, e, Role.EVADER, depth - 1, alpha, beta)
+            )
+            if min_eval <= alpha:
+                break
+            beta = min(beta, min_eval)
+        return min_eval
+
+    def evaluate(
+        self, pursuants: tuple[CellIndex, ...], evaders: tuple[CellIndex, ...]
+    ) -> int:
+        """
+        Score a position as the distance between the closest pursuant and evader, or CAPTURED if any pursuant is next to an evader. Unreachable teams score as far apart as the map allows.
+        """
+        self.nodes_visited += 1
+        return self._score(pursuants, evaders)
+
+    def is_capture(
+        self, pursuants: tuple[CellIndex, ...], evaders: tuple[CellIndex, ...]
+    ) -> bool:
+        """
+        Return if any pursuant is next to any evader under the movement model, as Environment.is_agent_adjacent decides when the game ends; on diagonal or weighted maps such a pair can be more than 1 apart.
+        """
+        table = self.env.get_neighbor_table()
+        cols = self.env.cols
+        targets = {e.row * cols + e.col for e in evaders}
+        return any(
+            int(n) in targets for p in pursuants for n in table[p.row * cols + p.col]
+        )
+
+    def _score(
+        self, pursuants: tuple[CellIndex, ...], evaders: tuple[CellIndex, ...]
+    ):
+        """
+        Score a position as evaluate does, without counting it as visited.
+        """
+        if self.is_capture(pursuants, evaders):
+            return self.CAPTURED
+        distance = self.env.get_team_distance(pursuants, evaders)
+        if distance is None:
+            return self.env.distance_bound()
+        return distance
+
+    def joint_moves(
+        self,
+        pursuants: tuple[CellIndex, ...],
+        evaders: tuple[CellIndex, ...],
+        role: Role,
+    ) -> list[tuple[CellIndex, ...]]:
+        """
+        List every combination of moves for the side to move. Agents never move onto a cell that is occupied at the start of the ply or chosen by a teammate, and an agent with nowhere to go stays put. If teammates can only move onto the same cells, any of them may stay put instead, so the side always has a move.
+
+        Returns:
+            One tuple of destinations per joint move, aligned with the moving team.
+        """
+        team = pursuants if role == Role.PURSUANT else evaders
+        occupied = set(pursuants) | set(evaders)
+        options = []
+        for cell in team:
+            moves = [n for n in self.env.get_neighbors(cell) if n not in occupied]
+            options.append(moves or [cell])
+        joint = [
+            move
+            for move in itertools.product(*options)
+            if len(set(move)) == len(move)
+        ]
+        if not joint:
+            # every combination collides: let the colliding agents stay put
+            options = [
+                moves if cell in moves else moves + [cell]
+                for cell, moves in zip(team, options)
+            ]
+            joint = [
+                move
+                for move in itertools.product(*options)
+                if len(set(move)) == len(move)
+            ]
+        return joint
+
+    def ordered_moves(
+        self,
+        pursuants: tuple[CellIndex, ...],
+        evaders: tuple[CellIndex, ...],
+        role: Role,
+    ) -> list[tuple]:
+        """
+        Order joint moves by the score of the position they lead to, best first for the side to move, and keep at most max_branching of them.
+
+        Returns:
+            A list of (move, pursuants, evaders) tuples for the resulting positions.
+        """
+        scored = []
+        for move in self.joint_moves(pursuants, evaders, role):
+            p, e = (move, evaders) if role == Role.PURSUANT else (pursuants, move)
+            scored.append((self._score(p, e), move, p, e))
+        scored.sort(key=lambda s: s[0], reverse=role == Role.EVADER)
+        if self.max_branching is not None:
+            scored = scored[: self.max_branching]
+        return [(move, p, e) for _, move, p, e in scored]
@@ -0,0 +1,402 @@
+"""
+Environment backend for maps too large to keep in memory as one grid.
+"""
+
+from collections import OrderedDict
+import heapq
+import numpy as np
+
+from movement import FOUR_CONNECTED
+from utils import Occupancy, Role, CellIndex, Action, role_to_occupancy
+
+
+class TiledEnvironment:
+    """
+    The TiledEnvironment class stores the occupancy grid as a memory-mapped uint8 file of obstacles (1) and free cells (0), loads it in square tiles on demand, and keeps the two agents outside the file. It exposes the same interface as Environment, so GameState can play on it unchanged, but searches only read the tiles they actually reach.
+
+    Attributes:
+        _map (np.memmap): The obstacle file, shaped (rows, cols).
+        _rows (int): The number of rows in the environment.
+        _cols (int): The number of columns in the environment.
+        _tile_size (int): The side length of a tile in cells.
+        _max_tiles (int): How many tiles to keep loaded at once.
+        _tiles (OrderedDict): Loaded tiles, least recently used first.
+        _agents (dict): The cell of each agent, keyed by Role.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size,
+        pursuant_pos: CellIndex,
+        evader_pos: CellIndex,
+        tile_size=256,
+        max_tiles=64,
+        mode="c",
+    ):
+        """
+        Open an existing obstacle file.
+
+        Args:
+            path (str): The uint8 obstacle file, in row-major order.
+            size (int | tuple[int, int]): The side length of a square environment, or its (rows, cols) dimensions.
+            pursuant_pos (CellIndex): Starting position of the pursuant agent.
+            evader_pos (CellIndex): Starting position of the evader agent.
+            tile_size (int): The side length of a tile in cells.
+            max_tiles (int): How many tiles to keep loaded at once.
+            mode (str): "c" to keep added obstacles in memory and leave the file as it is, "r+" to write them back to the file, "r" to forbid them.
+        """
+        self._rows, self._cols = (size, size) if isinstance(size, int) else size
+        self._map = np.memmap(
+            path, dtype=np.uint8, mode=mode, shape=(self._rows, self._cols)
+        )
+        self._tile_size = tile_size
+        self._max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._agents = {Role.PURSUANT: pursuant_pos, Role.EVADER: evader_pos}
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        size,
+        density: float,
+        pursuant_pos: CellIndex,
+        evader_pos: CellIndex,
+        seed=None,
+        tile_size=256,
+        max_tiles=64,
+        mode="c",
+    ) -> "TiledEnvironment":
+        """
+        Write a new obstacle file tile by tile, each cell being an obstacle with probability density, and open it.
+
+        Args:
+            path (str): The file to create.
+            size (int | tuple[int, int]): The side length of a square environment, or its (rows, cols) dimensions.
+            density (float): The probability of each cell holding an obstacle.
+            pursuant_pos (CellIndex): Starting position of the pursuant agent.
+            evader_pos (CellIndex): Starting position of the evader agent.
+            seed (int): Seed for the obstacle layout.
+            tile_size (int): The side length of a tile in cells.
+            max_tiles (int): How many tiles to keep loaded at once.
+            mode (str): How to open the file once written, as in the constructor.
+        """
+        rng = np.random.default_rng(seed)
+        rows, cols = (size, size) if isinstance(size, int) else size
+        grid = np.memmap(path, dtype=np.uint8, mode="w+", shape=(rows, cols))
+        for r in range(0, rows, tile_size):
+            for c in range(0, cols, tile_size):
+                block = grid[r : r + tile_size, c : c + tile_size]
+                block[:] = rng.random(block.shape) < density
+
+        # agents never start on an obstacle
+        for cell in (pursuant_pos, evader_pos):
+            grid[cell.row, cell.col] = 0
+        grid.flush()
+        del grid
+        return cls(
+            path, (rows, cols), pursuant_pos, evader_pos, tile_size, max_tiles, mode
+        )
+
+    @classmethod
+    def from_array(
+        cls,
+        path: str,
+        obstacles: np.ndarray,
+        pursuant_pos: CellIndex,
+        evader_pos: CellIndex,
+        tile_size=256,
+        max_tiles=64,
+        mode="c",
+    ) -> "TiledEnvironment":
+        """
+        Write a boolean obstacle array to a new file and open it, in the constructor's mode.
+        """
+        size = obstacles.shape
+        grid = np.memmap(path, dtype=np.uint8, mode="w+", shape=size)
+        grid[:] = obstacles.astype(bool)
+        grid.flush()
+        del grid
+        return cls(path, size, pursuant_pos, evader_pos, tile_size, max_tiles, mode)
+
+    @property
+    def size(self):
+        """
+        The side length of a square environment. For rectangular environments this is the longer side; use shape for both dimensions.
+        """
+        return max(self._rows, self._cols)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self._rows, self._cols)
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def cols(self):
+        return self._cols
+
+    @property
+    def is_weighted(self) -> bool:
+        """
+        Whether steps differ in cost; tiled maps always use unit 4-connected steps.
+        """
+        return False
+
+    def distance_bound(self) -> int:
+        """
+        Return a distance no path on this map can reach, for scoring positions where the agents cannot reach each other.
+        """
+        return self._rows * self._cols
+
+    def place_additional_obstacles(self, obstacles: list[CellIndex]) -> list[CellIndex]:
+        """
+        Add additional obstacles to the world from a list. If their indexes do not fall within bounds or fall on an occupied cell, they will be skipped.
+
+        Args:
+            obstacles (list[CellIndex]): the obstacles to place
+
+        Returns:
+            A list of the obstacles that were actually placed in the world.
+        """
+        placed_obstacles = []
+        for obs in obstacles:
+            if self.is_within_bounds(obs) and self._get(obs) == Occupancy.EMPTY:
+                self._set(obs, Occupancy.OBSTACLE)
+                placed_obstacles.append(obs)
+        return placed_obstacles
+
+    def move_agent(self, agent: Role, action: Action) -> bool:
+        """
+        Move an agent from one place to another.
+
+        Args:
+            agent (Role): agent to move
+            action (Action): action to enact
+
+        Returns:
+            The success of the operation.
+        """
+        cur_pos = self._agents[agent]
+        new_pos = CellIndex(
+            cur_pos.row + action.value.dy, cur_pos.col + action.value.dx
+        )
+        # tiled maps only take 4-connected steps
+        if (
+            action not in FOUR_CONNECTED.actions
+            or self._get(new_pos) != Occupancy.EMPTY
+        ):
+            print("Illegal move action!")
+            return False
+        self._agents[agent] = new_pos
+        return True
+
+    def get_agent_cell(self, agent: Role) -> CellIndex:
+        """
+        Return an agent's location in the environment.
+        """
+        return self._agents[agent]
+
+    def get_obstacle_cells(self) -> list[CellIndex]:
+        """
+        Provide a list of cell indexes containing obstacles, reading the file one tile at a time.
+
+        Returns:
+            A list of all obstacle-occupied cells in the environment.
+        """
+        obstacles = []
+        ts = self._tile_size
+        for r in range(0, self._rows, ts):
+            for c in range(0, self._cols, ts):
+                block = np.asarray(self._map[r : r + ts, c : c + ts])
+                for i, j in np.argwhere(block):
+                    obstacles.append(CellIndex(r + i, c + j))
+        return obstacles
+
+    def get_neighbors(self, cell: CellIndex) -> list[CellIndex]:
+        """
+        Provide a list of non-obstacle cells around the given cell.
+
+        Args:
+            cell (CellIndex): Index of cell to find neighbors of.
+
+        Returns:
+            A list containing the index of every non-obstacle cell adjacent to cell.
+        """
+        neighbors = []
+        offsets = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+        for offset in offsets:
+            row = cell.row + offset[0]
+            col = cell.col + offset[1]
+            if 0 <= row < self._rows and 0 <= col < self._cols:
+                if not self._is_obstacle(row, col):
+                    neighbors.append(CellIndex(row, col))
+        return neighbors
+
+    def get_valid_moves(self, agent: Role) -> list[CellIndex]:
+        """
+        Provide a list of non-obstacle cells around a given agent.
+        """
+        return self.get_neighbors(self._agents[agent])
+
+    def get_shortest_distance(self, cell1: CellIndex, cell2: CellIndex):
+        """
+        Return the number of steps between the given cells, accounting for obstacles. Found using A* with the Manhattan distance as heuristic, which is exact on a 4-connected grid and keeps the search, and the tiles it loads, close to the straight line between the cells.
+
+        Args:
+            cell1: Starting point of the search
+            cell2: Ending point of the search
+        """
+        if not self.is_within_bounds(cell1) or not self.is_within_bounds(cell2):
+            print("cells are not valid!")
+            return None
+
+        goal = (cell2.row, cell2.col)
+        start = (cell1.row, cell1.col)
+        best = {start: 0}
+        # entries are (estimate, -steps, cell): ties favor the deepest cell
+        frontier = [(self._manhattan(start, goal), 0, start)]
+        while frontier:
+            _, neg_steps, current = heapq.heappop(frontier)
+            steps = -neg_steps
+            if current == goal:
+                return steps
+            if steps > best[current]:
+                continue
+            for offset in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+                row = current[0] + offset[0]
+                col = current[1] + offset[1]
+                if not (0 <= row < self._rows and 0 <= col < self._cols):
+                    continue
+                if self._is_obstacle(row, col):
+                    continue
+                if steps + 1 < best.get((row, col), self._rows * self._cols):
+                    best[(row, col)] = steps + 1
+                    heapq.heappush(
+                        frontier,
+                        (
+                            steps + 1 + self._manhattan((row, col), goal),
+                            -(steps + 1),
+                            (row, col),
+                        ),
+                    )
+
+        # no path found
+        return None
+
+    def is_reachable(self, cell1: CellIndex, cell2: CellIndex) -> bool:
+        """
+        Check if a path exists between two cells. Large maps are never labelled as a whole, so this searches for the path.
+        """
+        return self.get_shortest_distance(cell1, cell2) is not None
+
+    def is_traversable(self) -> bool:
+        """
+        Return if the pursuant can reach the evader at all.
+        """
+        return self.is_reachable(self._agents[Role.PURSUANT], self._agents[Role.EVADER])
+
+    def is_within_bounds(self, cell: CellIndex):
+        """
+        Check if the given cell index is within the bounds of the environment.
+        """
+        return 0 <= cell.row < self._rows and 0 <= cell.col < self._cols
+
+    def is_agent_adjacent(self):
+        """
+        Return if the agents are adjacent, or on top of each other.
+        """
+        p = self._agents[Role.PURSUANT]
+        e = self._agents[Role.EVADER]
+        return self._manhattan((p.row, p.col), (e.row, e.col)) <= 1
+
+    def snapshot(self, margin=2) -> np.ndarray:
+        """
+        Copy the part of the field around both agents, as a grid of Occupancy values.
+
+        Args:
+            margin (int): Cells to include beyond the agents' bounding box.
+        """
+        p = self._agents[Role.PURSUANT]
+        e = self._agents[Role.EVADER]
+        top = max(min(p.row, e.row) - margin, 0)
+        left = max(min(p.col, e.col) - margin, 0)
+        bottom = min(max(p.row, e.row) + margin + 1, self._rows)
+        right = min(max(p.col, e.col) + margin + 1, self._cols)
+
+        window = np.array(self._map[top:bottom, left:right], dtype=np.uint8)
+        window *= Occupancy.OBSTACLE.value
+        window[p.row - top, p.col - left] = Occupancy.PURSUANT.value
+        window[e.row - top, e.col - left] = Occupancy.EVADER.value
+        return window
+
+    def loaded_tiles(self) -> int:
+        """
+        Return how many tiles are currently held in memory.
+        """
+        return len(self._tiles)
+
+    def _is_obstacle(self, row: int, col: int) -> bool:
+        """
+        Read one cell of the obstacle file through the tile cache.
+        """
+        ts = self._tile_size
+        return bool(self._tile(row // ts, col // ts)[row % ts, col % ts])
+
+    def _tile(self, tile_row: int, tile_col: int) -> np.ndarray:
+        """
+        Return a tile, loading it from the file and evicting the least recently used tile if the cache is full.
+        """
+        key = (tile_row, tile_col)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+
+        ts = self._tile_size
+        r = tile_row * ts
+        c = tile_col * ts
+        tile = np.array(self._map[r : r + ts, c : c + ts])
+        self._tiles[key] = tile
+        if len(self._tiles) > self._max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def _manhattan(self, a: tuple, b: tuple) -> int:
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+    def _set(self, cell: CellIndex, value: Occupancy):
+        """
+        Set the occupancy of a cell. Only obstacles and empty cells are stored in the file; agents move through move_agent.
+        """
+        if not self.is_within_bounds(cell):
+            print("Not a valid cell!")
+            return
+        if value not in (Occupancy.EMPTY, Occupancy.OBSTACLE):
+            print("Agents can only be placed with move_agent!")
+            return
+        is_obstacle = int(value == Occupancy.OBSTACLE)
+        self._map[cell.row, cell.col] = is_obstacle
+
+        # keep a loaded copy of the tile in step with the file
+        ts = self._tile_size
+        tile = self._tiles.get((cell.row // ts, cell.col // ts))
+        if tile is not None:
+            tile[cell.row % ts, cell.col % ts] = is_obstacle
+
+    def _get(self, cell: CellIndex) -> Occupancy:
+        """
+        Get value of cell at a particular index.
+        """
+        if not self.is_within_bounds(cell):
+            print("Not a valid cell!")
+            return None
+        for agent, pos in self._agents.items():
+            if pos == cell:
+                return role_to_occupancy(agent)
+        if self._is_obstacle(cell.row, cell.col):
+            return Occupancy.OBSTACLE
+        return Occupancy.EMPTY
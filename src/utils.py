@@ -26,6 +26,10 @@ class Action(Enum):
     DOWN = Move(1, 0)
     LEFT = Move(0, -1)
     RIGHT = Move(0, 1)
+    UP_LEFT = Move(-1, -1)
+    UP_RIGHT = Move(-1, 1)
+    DOWN_LEFT = Move(1, -1)
+    DOWN_RIGHT = Move(1, 1)
 
 
 def derive_action(origin: CellIndex, dest: CellIndex):
@@ -100,6 +104,10 @@ class Node:
     # relational attributes
     parent: Optional["Node"]
     children: list[Optional["Node"]]
+    # search attributes, filled in by minimax
+    value: Optional[int] = None
+    pruned: bool = False
+    estimate: Optional[float] = None  # leaf score from a learned evaluator
 
     def to_dict(self):
         return {
@@ -109,4 +117,6 @@ class Node:
             "pursuant state": self.pursuant_state,
             "evader state": self.evader_state,
             "action taken": self.action_from_parent,
+            "value": self.value,
+            "pruned": self.pruned,
         }
@@ -1,17 +1,129 @@
-"""Generate different visualizations throughout game."""
+"""
+Generate different visualizations throughout game.
 
-import matplotlib.pyplot as plt
-from matplotlib import colors
+Plotting libraries (matplotlib, graphviz, PIL) are imported inside the functions that use them, so the simulation core can import this module with only NumPy installed.
+"""
+
+from collections import deque
+import json
 import numpy as np
+import os
 import random
-from sklearn import tree
 
-from graphviz import Digraph
+from utils import Occupancy, Node, Role
 
-from PIL import Image
-import glob
+# frame colors, indexed by palette entry (the Occupancy value, plus one for gridlines)
+FRAME_PALETTE = [
+    (255, 255, 255),  # Occupancy.EMPTY
+    (0, 0, 0),  # Occupancy.OBSTACLE
+    (0, 128, 0),  # Occupancy.EVADER
+    (255, 0, 0),  # Occupancy.PURSUANT
+    (128, 128, 128),  # gridlines
+]
+GRIDLINE_INDEX = 4
 
-from utils import Occupancy, Node, Role
+
+def occupancy_values(graph) -> np.ndarray:
+    """
+    Convert a grid of Occupancy enums into a grid of their integer values.
+
+    Args:
+        graph: an np array of Occupancy enums or integers
+    """
+    if graph.dtype == object:
+        to_value = np.frompyfunc(
+            lambda x: x.value if isinstance(x, Occupancy) else x, 1, 1
+        )
+        graph = to_value(graph)
+    return graph.astype(np.uint8)
+
+
+def rasterize_grid(graph, cell_px=20, gridlines=True):
+    """
+    Draw the occupancy grid straight into a palette image, without going through matplotlib.
+
+    Args:
+        graph: an np array with initalized obstacles and agents
+        cell_px: width and height of each cell in pixels
+        gridlines: whether to outline each cell
+
+    Returns:
+        A PIL palette image of the field.
+    """
+    from PIL import Image
+
+    values = occupancy_values(graph)
+    pixels = np.repeat(np.repeat(values, cell_px, axis=0), cell_px, axis=1)
+    if gridlines and cell_px > 2:
+        pixels[::cell_px, :] = GRIDLINE_INDEX
+        pixels[:, ::cell_px] = GRIDLINE_INDEX
+        pixels[-1, :] = GRIDLINE_INDEX
+        pixels[:, -1] = GRIDLINE_INDEX
+
+    frame = Image.fromarray(pixels)
+    frame.putpalette([channel for color in FRAME_PALETTE for channel in color])
+    return frame
+
+
+class EpisodeRecorder:
+    """
+    Buffer the frames of a single game in memory and encode them as one animation.
+
+    Attributes:
+        episode (int): The game the frames belong to.
+        cell_px (int): Width and height of each cell in pixels.
+        frames (list): The rasterized frames, in turn order.
+    """
+
+    def __init__(self, episode, cell_px=20):
+        self.episode = episode
+        self.cell_px = cell_px
+        self.frames = []
+
+    def add_frame(self, graph):
+        """
+        Rasterize the current state of the field and append it to the episode.
+
+        Args:
+            graph: an np array with initalized obstacles and agents
+        """
+        self.frames.append(rasterize_grid(graph, self.cell_px))
+
+    def save_gif(self, img_folder="docs/gamestate_gifs", duration=500, loop=0):
+        """
+        Encode the buffered frames as an animated GIF.
+
+        Returns:
+            The path of the written file, or None if nothing was recorded.
+        """
+        return gamestate_gif(
+            self.episode,
+            self.frames,
+            img_folder=img_folder,
+            duration=duration,
+            loop=loop,
+        )
+
+    def save_video(self, img_folder="docs/gamestate_gifs", fps=2):
+        """
+        Encode the buffered frames as an MP4 video. Requires imageio with its ffmpeg plugin.
+
+        Returns:
+            The path of the written file, or None if nothing was recorded.
+        """
+        import imageio
+
+        if not self.frames:
+            print(f"No frames recorded for game {self.episode}")
+            return None
+        os.makedirs(img_folder, exist_ok=True)
+        path = os.path.join(img_folder, f"game_{self.episode}.mp4")
+        imageio.mimwrite(
+            path,
+            [np.asarray(frame.convert("RGB")) for frame in self.frames],
+            fps=fps,
+        )
+        return path
 
 
 def gamestate_visual(graph, size, episode, n):
@@ -20,15 +132,15 @@ def gamestate_visual(graph, size, episode, n):
 
     Args:
         graph: an np array with initalized obstacles and agents
-        size: the size n by n graph
+        size: unused; the ticks follow the (rows, cols) shape of graph
         episode: game this state belongs to
         n: image id
     """
+    import matplotlib.pyplot as plt
+    from matplotlib import colors
+
     # Convert Enums to integers if needed
-    if graph.dtype == object:
-        graph = np.vectorize(lambda x: x.value if isinstance(x, Occupancy) else x)(
-            graph
-        )
+    graph = occupancy_values(graph)
 
     cmap = colors.ListedColormap(
         [
@@ -48,8 +160,9 @@ def gamestate_visual(graph, size, episode, n):
     ax.grid(which="major", axis="both", linestyle="-", color="k", linewidth=0.1)
 
     # Make sure each cell center is 0.5 above value
-    ax.set_xticks(np.arange(0.5, size, 1))
-    ax.set_yticks(np.arange(0.5, size, 1))
+    rows, cols = graph.shape
+    ax.set_xticks(np.arange(0.5, cols, 1))
+    ax.set_yticks(np.arange(0.5, rows, 1))
 
     # Hide tick values
     plt.tick_params(
@@ -66,72 +179,187 @@ def gamestate_visual(graph, size, episode, n):
 
 def gamestate_gif(
     episode,
-    img_folder="docs/",
+    frames,
+    img_folder="docs/gamestate_gifs",
     duration=500,
     loop=0,
 ):
     """
-    Creates an animated GIF from a folder of images.
+    Creates an animated GIF from the in-memory frames of one game.
 
     Args:
-        image_folder (str): Path to the folder containing the images.
+        episode (int): Game the frames belong to, used to name the file.
+        frames (list): Rasterized frames of the game, in turn order.
+        img_folder (str): Path to the folder to write the GIF into.
         duration (int): Duration of each frame in milliseconds.
         loop (int): Number of times the GIF should loop (0 for infinite loop).
-    """
-    # TODO: use [games] to derive all gif images, ideally w/o making them all?
-
-    image_files = sorted(
-        glob.glob(f"{img_folder}/*.png")
-    )  # Adjust extension as needed (e.g., *.jpg)
-    if not image_files:
-        print(f"No image files found in {img_folder}")
-        return
 
-    images = [Image.open(file) for file in image_files]
+    Returns:
+        The path of the written file, or None if there were no frames.
+    """
+    if not frames:
+        print(f"No frames recorded for game {episode}")
+        return None
 
     # Save the first image, appending subsequent images to create the GIF
-    images[0].save(
-        f"docs/gamestate_gifs/game_{episode}.gif",
+    os.makedirs(img_folder, exist_ok=True)
+    path = os.path.join(img_folder, f"game_{episode}.gif")
+    frames[0].save(
+        path,
         save_all=True,
-        append_images=images[1:],
+        append_images=frames[1:],
         duration=duration,
         loop=loop,
         optimize=False,
     )
+    return path
 
 
-def visualize_game_tree(root: Node, n):
-    """
-    Visualize the game tree using Graphviz, labeling each node with its distance.
+def iter_game_tree(
+    root: Node,
+    max_depth=None,
+    max_nodes=None,
+    collapse_transpositions=False,
+    sample=None,
+):
     """
-    dot = Digraph(comment="Game Tree")
-    dot.attr(rankdir="TB")  # top to bottom layout
+    Walk a game tree breadth-first without recursion, so that shallow levels are always complete when a cap is hit.
+
+    Args:
+        root (Node): the node to start from
+        max_depth (int): deepest tree level to include, or None for no limit
+        max_nodes (int): most nodes to include, or None for no limit
+        collapse_transpositions (bool): merge nodes that reach the same game state at the same level, expanding only the first one
+        sample (float): probability of keeping each non-root branch, or None to keep all of them
 
-    def add_node(node: Node):
-        if node is None:
+    Yields:
+        A (node, parent_id, node_id, is_transposition) tuple per edge. The root has parent_id None; transposed nodes reuse the id of the first node with the same state and are not expanded again.
+    """
+    seen_states = {}
+    emitted = 0
+    queue = deque([(root, None)])
+    while queue:
+        node, parent_id = queue.popleft()
+        if max_nodes is not None and emitted >= max_nodes:
             return
 
-        # label: just the distance value
-        node_label = f"{node.distance}"
-        if node.agent_role == Role.PURSUANT:
-            node_color = "red"
-        else:
-            node_color = "green"
+        # merge repeated states into the first node that reached them
+        if collapse_transpositions:
+            state = (
+                node.depth,
+                node.agent_role,
+                node.pursuant_state,
+                node.evader_state,
+            )
+            if state in seen_states:
+                yield node, parent_id, seen_states[state], True
+                continue
+            seen_states[state] = node.id
 
-        # add node to graph with unique identifier
-        dot.node(str(node.id), node_label, color=node_color)
+        yield node, parent_id, node.id, False
+        emitted += 1
 
-        # add children edges
-        if node.children:
-            for child in node.children:
-                if child is not None:
-                    # Recursively build subtree
-                    add_node(child)
-                    dot.edge(str(node.id), str(child.id))
+        if max_depth is not None and node.depth >= max_depth:
+            continue
+        for child in node.children:
+            if child is None:
+                continue
+            if sample is not None and random.random() >= sample:
+                continue
+            queue.append((child, node.id))
 
-    # Build from root
-    add_node(root)
+
+def export_game_tree(root: Node, path, fmt="dot", **limits):
+    """
+    Stream a game tree to a DOT or JSON Lines file for external viewers, one line per node or edge, without building a Graphviz graph in memory.
+
+    Args:
+        root (Node): the node to start from
+        path (str): file to write
+        fmt (str): "dot" or "jsonl"
+        limits: keyword arguments forwarded to iter_game_tree
+
+    Returns:
+        The number of nodes written.
+    """
+    if fmt not in ("dot", "jsonl"):
+        raise ValueError(f"Unknown tree export format: {fmt}")
+
+    written = 0
+    with open(path, "w") as f:
+        if fmt == "dot":
+            f.write("digraph GameTree {\n  rankdir=TB;\n")
+        for node, parent_id, node_id, is_transposition in iter_game_tree(
+            root, **limits
+        ):
+            if fmt == "jsonl":
+                record = node.to_dict()
+                record["id"] = node_id
+                record["parent"] = parent_id
+                record["distance"] = node.distance
+                record["transposition"] = is_transposition
+                f.write(json.dumps(record, default=str) + "\n")
+            else:
+                if not is_transposition:
+                    f.write(f"  {node_id} [{_tree_node_attrs(node)}];\n")
+                if parent_id is not None:
+                    style = ' [style="dashed"]' if node.pruned else ""
+                    f.write(f"  {parent_id} -> {node_id}{style};\n")
+            if not is_transposition:
+                written += 1
+        if fmt == "dot":
+            f.write("}\n")
+    return written
+
+
+def _tree_node_attrs(node: Node) -> str:
+    """
+    Build the DOT attributes of a tree node: its distance as the label, colored by whose turn it is, and greyed out if pruned.
+    """
+    color = "red" if node.agent_role == Role.PURSUANT else "green"
+    attrs = f'label="{node.distance}", color="{color}"'
+    if node.pruned:
+        attrs += ', style="dashed", fontcolor="gray"'
+    return attrs
+
+
+def visualize_game_tree(
+    root: Node,
+    n,
+    max_depth=None,
+    max_nodes=None,
+    collapse_transpositions=False,
+    sample=None,
+):
+    """
+    Visualize the game tree using Graphviz, labeling each node with its distance. Branches that alpha-beta pruned are drawn dashed.
+    Pass max_depth, max_nodes, collapse_transpositions or sample to keep deep trees small enough for Graphviz to lay out.
+    """
+    from graphviz import Digraph
+
+    dot = Digraph(comment="Game Tree")
+    dot.attr(rankdir="TB")  # top to bottom layout
+
+    for node, parent_id, node_id, is_transposition in iter_game_tree(
+        root,
+        max_depth=max_depth,
+        max_nodes=max_nodes,
+        collapse_transpositions=collapse_transpositions,
+        sample=sample,
+    ):
+        # add node to graph with unique identifier
+        if not is_transposition:
+            color = "red" if node.agent_role == Role.PURSUANT else "green"
+            style = "dashed" if node.pruned else "solid"
+            dot.node(str(node_id), f"{node.distance}", color=color, style=style)
+        # add edge from parent
+        if parent_id is not None:
+            dot.edge(
+                str(parent_id),
+                str(node_id),
+                style="dashed" if node.pruned else "solid",
+            )
 
     # Save and render
-    dot.render(f"docs/game_tree_{0}", format="png", cleanup=True)
+    dot.render(f"docs/game_tree_{n}", format="png", cleanup=True)
     return dot
@@ -0,0 +1,58 @@
+"""
+Test the adaptive scheduling of benchmark sweeps.
+"""
+
+import pytest
+from src.benchmarking import AdaptiveSweep, wilson_interval
+from src.utils import Role
+
+
+def test_wilson_interval():
+    """
+    Test that the interval brackets the observed rate, stays inside [0, 1] and narrows with more games.
+    """
+    low, high = wilson_interval(0, 20)
+    assert low == 0 and 0 < high < 0.2
+    low, high = wilson_interval(10, 20)
+    assert low < 0.5 < high
+    assert high - low > wilson_interval(100, 200)[1] - wilson_interval(100, 200)[0]
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+def test_one_sided_cells_stop_early():
+    """
+    Test that a cell the pursuer always wins stops long before an even one, which gets the larger rounds.
+    """
+    sweep = AdaptiveSweep(
+        [(0.0, 3), (0.3, 3)], precision=0.1, min_games=10, max_games=500, batch_size=50
+    )
+    rounds = 0
+    while not sweep.finished:
+        for cell, i in sweep.next_round():
+            if cell == (0.0, 3):
+                sweep.record(cell, Role.PURSUANT)
+            else:
+                sweep.record(cell, Role.PURSUANT if i % 2 else Role.EVADER)
+        rounds += 1
+        assert rounds < 100
+
+    one_sided, even = sweep.results()
+    assert one_sided["games"] < 40
+    assert 80 <= even["games"] <= 110
+    assert even["pursuer_win_rate"] == pytest.approx(0.5, abs=0.02)
+    assert even["ci_half_width"] <= 0.1
+
+
+def test_game_indices_and_cap():
+    """
+    Test that handed-out games count up per cell without repeats, and no cell exceeds max_games.
+    """
+    sweep = AdaptiveSweep([(0.2, 2)], precision=0.001, min_games=5, max_games=12, batch_size=5)
+    seen = []
+    while not sweep.finished:
+        batch = sweep.next_round()
+        assert batch
+        seen += [i for _, i in batch]
+        for cell, i in batch:
+            sweep.record(cell, None if i % 3 else Role.EVADER)
+    assert seen == list(range(12))
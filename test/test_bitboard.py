@@ -0,0 +1,130 @@
+"""
+Test the bit-packed grid operations in bitboard.py.
+"""
+
+import pytest
+import numpy as np
+from src.bitboard import Bitboard, wavefront_distance, wavefront_field
+from src.environment import Environment
+from src.utils import CellIndex, Occupancy, Role, Action
+
+# --- Fixtures ---
+
+
+@pytest.fixture
+def wide_mask():
+    """Create a random 5x70 grid, so that rows span two words."""
+    rng = np.random.default_rng(0)
+    return rng.random((5, 70)) < 0.5
+
+
+# --- Unit tests for packing and shifting ---
+
+
+def test_pack_roundtrip(wide_mask):
+    """
+    Test that packing and unpacking returns the original grid.
+    """
+    board = Bitboard.from_mask(wide_mask)
+    assert board.words.shape == (5, 2)
+    assert np.array_equal(board.to_mask(), wide_mask)
+    assert board.count() == wide_mask.sum()
+
+
+def test_column_shifts_carry_between_words(wide_mask):
+    """
+    Test that column shifts move bits across word boundaries and drop bits leaving the grid.
+    """
+    board = Bitboard.from_mask(wide_mask)
+    right = np.zeros_like(wide_mask)
+    right[:, 1:] = wide_mask[:, :-1]
+    left = np.zeros_like(wide_mask)
+    left[:, :-1] = wide_mask[:, 1:]
+    assert np.array_equal(board.shift_right().to_mask(), right)
+    assert np.array_equal(board.shift_left().to_mask(), left)
+
+
+def test_row_shifts(wide_mask):
+    """
+    Test that row shifts move whole rows and drop the row leaving the grid.
+    """
+    board = Bitboard.from_mask(wide_mask)
+    down = np.zeros_like(wide_mask)
+    down[1:] = wide_mask[:-1]
+    assert np.array_equal(board.shift_down().to_mask(), down)
+    assert np.array_equal(board.shift_up().shift_down().to_mask()[1:], wide_mask[1:])
+
+
+def test_invert_clears_padding(wide_mask):
+    """
+    Test that inverting a board never sets bits beyond the last column.
+    """
+    board = ~Bitboard.from_mask(wide_mask)
+    assert board.count() == (~wide_mask).sum()
+
+
+# --- Unit tests for wavefront search ---
+
+
+def test_wavefront_matches_bfs():
+    """
+    Test that wavefront distances equal BFS distances on a random map.
+    """
+    env = Environment(
+        size=9,
+        density=0.3,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(8, 8),
+    )
+    passable = env.get_bitboard()
+    field = wavefront_field(passable, CellIndex(0, 0))
+    for i in range(0, env.size):
+        for j in range(0, env.size):
+            cell = CellIndex(i, j)
+            if env._get(cell) == Occupancy.OBSTACLE:
+                assert field[i, j] == -1
+                continue
+            bfs = env.get_shortest_distance(CellIndex(0, 0), cell)
+            assert wavefront_distance(passable, CellIndex(0, 0), cell) == bfs
+            assert field[i, j] == (-1 if bfs is None else bfs)
+
+
+def test_bitboard_environment_queries():
+    """
+    Test that an environment using bitboards answers distance and adjacency queries.
+    """
+    env = Environment(
+        size=5,
+        density=0.0,
+        pursuant_pos=CellIndex(2, 2),
+        evader_pos=CellIndex(2, 3),
+        use_bitboard=True,
+    )
+    assert env.is_agent_adjacent()
+    env.place_additional_obstacles([CellIndex(1, 2), CellIndex(1, 3), CellIndex(1, 4)])
+    assert env.get_shortest_distance(CellIndex(2, 2), CellIndex(0, 4)) == 6
+    env.place_additional_obstacles([CellIndex(1, 1), CellIndex(1, 0)])
+    assert env.get_shortest_distance(CellIndex(2, 2), CellIndex(0, 4)) is None
+    env.move_agent(Role.PURSUANT, Action.DOWN)
+    assert not env.is_agent_adjacent()
+
+
+def test_bitboard_distance_fields():
+    """
+    Test that an environment using bitboards builds its distance fields as wavefronts, equal to BFS fields.
+    """
+    obstacles = np.zeros((6, 6), dtype=np.uint8)
+    obstacles[2, 1:] = 1
+    env = Environment.from_array(
+        obstacles, CellIndex(0, 0), CellIndex(5, 5), use_bitboard=True
+    )
+    plain = Environment.from_array(obstacles, CellIndex(0, 0), CellIndex(5, 5))
+
+    def no_bfs(cell):
+        raise AssertionError("distance field built by cell-by-cell BFS")
+
+    env._bfs_field = no_bfs
+    for cell in (CellIndex(0, 0), CellIndex(3, 4), CellIndex(5, 5)):
+        field = env.get_distance_field(cell)
+        assert np.array_equal(field, plain.get_distance_field(cell))
+    assert env.get_team_distance([CellIndex(0, 0)], [CellIndex(5, 5)]) == 10
@@ -0,0 +1,164 @@
+"""
+Test the command-line entry point and its record writer.
+"""
+
+import csv
+import itertools
+import json
+
+import pandas as pd
+import pytest
+from src.cli import (
+    RECORD_FIELDS,
+    RecordWriter,
+    build_configs,
+    build_parser,
+    infer_format,
+    main,
+)
+
+RECORD = {
+    "game": 0,
+    "size": 5,
+    "cols": 7,
+    "density": 0.2,
+    "depth": 3,
+    "engine": "minimax",
+    "evader_engine": "mcts",
+    "seed": 11,
+    "winner": "PURSUANT",
+    "turns": 9,
+    "map_attempts": 2,
+    "seconds": 0.5,
+    "seconds_per_turn": 0.5 / 9,
+    "pursuer_seconds": 0.25,
+    "evader_seconds": 0.125,
+    "degraded_turns": 1,
+}
+
+
+def read_jsonl(path) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_run_writes_a_record_per_game(tmp_path):
+    """
+    Test that the run subcommand writes one CSV row per game, with every record field.
+    """
+    path = tmp_path / "run.csv"
+    main(
+        ["run", "--games", "2", "--size", "4", "--depth", "1", "--seed", "1"]
+        + ["--output", str(path)]
+    )
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    assert reader.fieldnames == RECORD_FIELDS
+    assert [row["seed"] for row in rows] == ["1", "2"]
+    assert all(row["winner"] in ("PURSUANT", "EVADER", "") for row in rows)
+    assert all(0 < int(row["turns"]) <= 25 for row in rows)
+
+
+def test_sweep_covers_every_cell(tmp_path):
+    """
+    Test that the sweep subcommand plays --games games in every density and depth cell.
+    """
+    path = tmp_path / "sweep.jsonl"
+    main(
+        ["sweep", "--densities", "0", "0.2", "--depths", "1", "2", "--games", "2"]
+        + ["--size", "4", "--seed", "3", "--output", str(path)]
+    )
+    records = read_jsonl(path)
+    cells = [(r["density"], r["depth"]) for r in records]
+    assert sorted(cells) == sorted(list(itertools.product([0, 0.2], [1, 2])) * 2)
+    assert sorted(r["seed"] for r in records) == [3] * 4 + [4] * 4
+
+
+def test_adaptive_sweep_plays_equal_maps(tmp_path):
+    """
+    Test that an adaptive sweep stops each cell at --max-games and plays game i of every cell on the same map.
+    """
+    path = tmp_path / "adaptive.jsonl"
+    main(
+        ["sweep", "--densities", "0.1", "0.3", "--depths", "1", "--adaptive"]
+        + ["--min-games", "2", "--max-games", "2"]
+        + ["--size", "4", "--seed", "5", "--output", str(path)]
+    )
+    records = read_jsonl(path)
+    assert len(records) == 4
+    for density in (0.1, 0.3):
+        cell = [r for r in records if r["density"] == density]
+        assert sorted((r["game"], r["seed"]) for r in cell) == [(0, 5), (1, 6)]
+
+
+def test_bench_writes_parquet(tmp_path):
+    """
+    Test that the bench subcommand writes a Parquet file with every record field.
+    """
+    path = tmp_path / "bench.parquet"
+    main(
+        ["bench", "--games", "2", "--size", "4", "--depth", "1", "--seed", "0"]
+        + ["--output", str(path)]
+    )
+    df = pd.read_parquet(path)
+    assert list(df.columns) == RECORD_FIELDS
+    assert list(df["seed"]) == [0, 1]
+    assert (df["depth"] == 1).all()
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl", "parquet"])
+def test_record_round_trip(tmp_path, fmt):
+    """
+    Test that a record and a tie both read back unchanged from every format.
+    """
+    tie = dict(RECORD, game=1, winner=None, seconds_per_turn=None)
+    path = tmp_path / f"records.{fmt}"
+    with RecordWriter(str(path), batch_size=1) as writer:
+        assert writer.fmt == fmt
+        writer.write(RECORD)
+        writer.write(tie)
+
+    if fmt == "csv":
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        expected = [
+            {k: "" if v is None else str(v) for k, v in r.items()} for r in (RECORD, tie)
+        ]
+        assert rows == expected
+    elif fmt == "jsonl":
+        assert read_jsonl(path) == [RECORD, tie]
+    else:
+        df = pd.read_parquet(path)
+        rows = df.astype(object).where(df.notna(), None).to_dict("records")
+        assert rows == [RECORD, tie]
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    """
+    Test that the writer refuses formats it cannot write.
+    """
+    assert infer_format("out.ndjson") == "jsonl"
+    assert infer_format("out.pq") == "parquet"
+    assert infer_format("out.txt") == "csv"
+    with pytest.raises(ValueError):
+        RecordWriter(str(tmp_path / "out.xml"), fmt="xml")
+    with pytest.raises(ValueError):
+        RecordWriter("-", fmt="parquet")
+
+
+def test_build_configs_seeding():
+    """
+    Test that game i of every cell gets the same map seed, --seed + i, and none without --seed.
+    """
+    argv = ["sweep", "--densities", "0", "0.1", "--depths", "2", "3", "--games", "2"]
+    args = build_parser().parse_args(argv + ["--seed", "10"])
+    configs = build_configs(args, [0, 0.1], [2, 3])
+    assert len(configs) == 8
+    assert [c["game"] for c in configs] == [0, 1] * 4
+    assert all(c["seed"] == 10 + c["game"] for c in configs)
+    cells = {(c["density"], c["depth"]) for c in configs}
+    assert cells == {(0, 2), (0, 3), (0.1, 2), (0.1, 3)}
+
+    configs = build_configs(build_parser().parse_args(argv), [0, 0.1], [2, 3])
+    assert all(c["seed"] is None for c in configs)
@@ -4,7 +4,10 @@ Test public functions belonging to the Environment class.
 
 import pytest
 import math
-from src.environment import Environment
+import random
+import numpy as np
+from src.environment import Environment, label_components
+from src.movement import EIGHT_CONNECTED, OCTILE
 from src.utils import Occupancy, CellIndex, Action, Role
 
 # --- Fixtures ---
@@ -208,6 +211,78 @@ def test_move_agent_illegal_bounds(sparse_env: Environment):
     assert sparse_env.get_agent_cell(Role.PURSUANT) == origin
 
 
+def test_make_and_unmake_moves(sparse_env: Environment):
+    """
+    Test that moves made with make_move are taken back in reverse order, passes included, and illegal moves are not remembered.
+    """
+    before = sparse_env.snapshot()
+    assert sparse_env.make_move(Role.PURSUANT, Action.RIGHT)
+    assert sparse_env.make_move(Role.EVADER, None)
+    assert sparse_env.make_move(Role.EVADER, Action.UP, CellIndex(3, 3))
+    assert not sparse_env.make_move(Role.EVADER, Action.RIGHT)
+    assert sparse_env.moves_made == 3
+    assert sparse_env.get_agent_cell(Role.EVADER) == CellIndex(2, 3)
+
+    for _ in range(3):
+        sparse_env.unmake_move()
+    assert np.array_equal(sparse_env.snapshot(), before)
+    with pytest.raises(IndexError):
+        sparse_env.unmake_move()
+
+
+def test_make_move_follows_movement_model():
+    """
+    Test that make_move refuses diagonals on a 4-connected map, and diagonals that cut a corner on an 8-connected one.
+    """
+    obstacles = np.ones((3, 3), dtype=np.uint8)
+    obstacles[0, 0] = obstacles[1, 1] = obstacles[2, 2] = 0
+    pocket = Environment.from_array(obstacles, CellIndex(0, 0), CellIndex(2, 2))
+    assert pocket.get_neighbors(CellIndex(0, 0)) == []
+    assert not pocket.make_move(Role.PURSUANT, Action.DOWN_RIGHT)
+    assert pocket.moves_made == 0
+
+    obstacles = np.zeros((3, 3), dtype=np.uint8)
+    obstacles[0, 1] = 1
+    env = Environment.from_array(
+        obstacles, CellIndex(0, 0), CellIndex(2, 2), movement=EIGHT_CONNECTED
+    )
+    assert not env.make_move(Role.PURSUANT, Action.DOWN_RIGHT)
+    assert env.make_move(Role.PURSUANT, Action.DOWN)
+    assert env.make_move(Role.PURSUANT, Action.DOWN_RIGHT)
+    assert env.get_agent_cell(Role.PURSUANT) == CellIndex(2, 1)
+
+
+def test_move_agent_follows_movement_model(empty_env: Environment):
+    """
+    Test that move_agent refuses a diagonal on a 4-connected map, leaving the agent in place.
+    """
+    assert not empty_env.move_agent(Role.PURSUANT, Action.DOWN_RIGHT)
+    assert empty_env.get_agent_cell(Role.PURSUANT) == CellIndex(0, 0)
+    assert empty_env.move_agent(Role.PURSUANT, Action.DOWN)
+
+
+def test_clone_is_copy_on_write(sparse_env: Environment):
+    """
+    Test that a clone shares the grid and tables until one side changes them, and changes never leak between the two.
+    """
+    sparse_env.get_neighbor_table()
+    clone = sparse_env.clone()
+    assert clone._graph is sparse_env._graph
+    assert clone._table is sparse_env._table
+
+    clone.make_move(Role.PURSUANT, Action.RIGHT)
+    assert clone._graph is not sparse_env._graph
+    assert sparse_env.get_agent_cell(Role.PURSUANT) == CellIndex(0, 0)
+    assert clone._table is sparse_env._table
+
+    clone.place_additional_obstacles([CellIndex(2, 2)])
+    assert clone.get_shortest_distance(CellIndex(0, 1), CellIndex(3, 3)) == 5
+    assert CellIndex(2, 2) in sparse_env.get_neighbors(CellIndex(2, 1))
+    assert CellIndex(2, 2) not in clone.get_neighbors(CellIndex(2, 1))
+    assert sparse_env._get(CellIndex(2, 2)) == Occupancy.EMPTY
+    assert clone.moves_made == 1 and sparse_env.moves_made == 0
+
+
 # --- Unit tests for locating cells ---
 # get_agent_cell(), get_obstacle_cells()
 
@@ -353,3 +428,497 @@ def test_out_of_bounds(empty_env: Environment):
     Test that is_within_bounds() correctly identifies invalid cells.
     """
     assert not empty_env.is_within_bounds(CellIndex(-1, 0))
+
+
+# --- Unit tests for connectivity ---
+# get_component_labels(), is_reachable(), is_traversable()
+
+
+def test_component_labels_open_field(empty_env: Environment):
+    """
+    Test that an obstacle-free field forms a single connected region.
+    """
+    labels = empty_env.get_component_labels()
+    assert labels.shape == (empty_env.size, empty_env.size)
+    assert (labels == 0).all()
+
+
+def test_component_labels_split_field(empty_env: Environment):
+    """
+    Test that a wall splits the field into two regions and obstacles are unlabelled.
+    """
+    wall = [CellIndex(2, i) for i in range(0, empty_env.size)]
+    empty_env.place_additional_obstacles(wall)
+    labels = empty_env.get_component_labels()
+    assert (labels[2] == -1).all()
+    assert len(set(labels[labels >= 0].tolist())) == 2
+    assert not empty_env.is_reachable(CellIndex(0, 0), CellIndex(4, 4))
+    assert empty_env.is_reachable(CellIndex(0, 0), CellIndex(1, 4))
+    assert not empty_env.is_traversable()
+
+
+def test_reachability_matches_bfs(dense_env: Environment):
+    """
+    Test that the constant-time reachability check agrees with a full BFS.
+    """
+    for i in range(0, dense_env.size):
+        for j in range(0, dense_env.size):
+            cell = CellIndex(i, j)
+            if dense_env._get(cell) == Occupancy.OBSTACLE:
+                continue
+            start = CellIndex(0, 0)
+            bfs = dense_env.get_shortest_distance(start, cell)
+            assert dense_env.is_reachable(start, cell) == (bfs is not None)
+
+
+def test_label_components_spiral():
+    """
+    Test that a winding corridor is labelled as one region.
+    """
+    passable = np.array(
+        [
+            [1, 1, 1, 1, 1],
+            [0, 0, 0, 0, 1],
+            [1, 1, 1, 0, 1],
+            [1, 0, 0, 0, 1],
+            [1, 1, 1, 1, 1],
+        ],
+        dtype=bool,
+    )
+    labels = label_components(passable)
+    assert set(labels[passable].tolist()) == {0}
+    assert (labels[~passable] == -1).all()
+
+
+# --- Unit tests for from_array() ---
+
+
+def test_from_array_matches_obstacles():
+    """
+    Test that an environment built from an array has exactly its obstacles and both agents.
+    """
+    obstacles = np.zeros((4, 4), dtype=bool)
+    obstacles[1, :3] = True
+    env = Environment.from_array(obstacles, CellIndex(0, 0), CellIndex(3, 3))
+    assert env.size == 4
+    assert set(env.get_obstacle_cells()) == {CellIndex(1, i) for i in range(0, 3)}
+    assert env.get_agent_cell(Role.EVADER) == CellIndex(3, 3)
+    assert env.get_shortest_distance(CellIndex(0, 0), CellIndex(3, 3)) == 6
+
+
+def test_from_array_leaves_input_alone():
+    """
+    Test that placing the agents never writes into the caller's array, so environments built from the same array stay independent.
+    """
+    for dtype in (bool, np.uint8):
+        obstacles = np.zeros((5, 5), dtype=dtype)
+        first = Environment.from_array(obstacles, CellIndex(0, 0), CellIndex(4, 4))
+        second = Environment.from_array(obstacles, CellIndex(1, 1), CellIndex(3, 3))
+        assert not obstacles.any()
+        assert first.get_agent_cells(Role.PURSUANT) == [CellIndex(0, 0)]
+        assert second.get_agent_cells(Role.PURSUANT) == [CellIndex(1, 1)]
+        assert second.get_agent_cells(Role.EVADER) == [CellIndex(3, 3)]
+
+
+def test_from_array_maps_copy_on_write(tmp_path):
+    """
+    Test that a copy-on-write memory map is used in place, without its file ever being written.
+    """
+    path = tmp_path / "map.npy"
+    np.save(path, np.zeros((4, 4), dtype=np.uint8))
+    grid = np.load(path, mmap_mode="c")
+    env = Environment.from_array(grid, CellIndex(0, 0), CellIndex(3, 3))
+    assert np.shares_memory(env._graph, grid)
+    assert not np.load(path).any()
+
+
+def test_from_array_does_not_scan_memory_maps(tmp_path):
+    """
+    Test that a copy-on-write memory map is not read cell by cell up front, while other grids are still normalized to 0/1.
+    """
+
+    class Unscannable(np.memmap):
+        def max(self, *args, **kwargs):
+            raise AssertionError("the whole map was scanned")
+
+        def __ne__(self, other):
+            raise AssertionError("the whole map was scanned")
+
+    path = tmp_path / "map.npy"
+    grid = np.zeros((4, 4), dtype=np.uint8)
+    grid[1, 1] = 1
+    np.save(path, grid)
+    mapped = np.load(path, mmap_mode="c").view(Unscannable)
+    env = Environment.from_array(mapped, CellIndex(0, 0), CellIndex(3, 3))
+    assert env.get_obstacle_cells() == [CellIndex(1, 1)]
+
+    grid[3, 3] = 2
+    np.save(path, grid)
+    with pytest.raises(ValueError):
+        Environment.from_array(
+            np.load(path, mmap_mode="c"), CellIndex(0, 0), CellIndex(3, 3)
+        )
+    in_memory = Environment.from_array(grid, CellIndex(0, 0), CellIndex(2, 2))
+    assert set(in_memory.get_obstacle_cells()) == {CellIndex(1, 1), CellIndex(3, 3)}
+
+
+def test_from_array_rejects_bad_maps():
+    """
+    Test that grids that are not 2D and agents placed on obstacles are refused.
+    """
+    with pytest.raises(ValueError):
+        Environment.from_array(np.zeros((3, 4, 2)), CellIndex(0, 0), CellIndex(2, 2))
+    obstacles = np.zeros((4, 4))
+    obstacles[0, 0] = 1
+    with pytest.raises(ValueError):
+        Environment.from_array(obstacles, CellIndex(0, 0), CellIndex(2, 2))
+
+
+# --- Unit tests for rectangular environments ---
+
+
+@pytest.fixture
+def corridor_env():
+    """Create a long, thin 3x40 environment with no obstacles."""
+    env = Environment(
+        size=(3, 40),
+        density=0.0,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(2, 39),
+    )
+    return env
+
+
+def test_rectangular_dimensions(corridor_env: Environment):
+    """
+    Test that a rectangular environment keeps separate row and column bounds.
+    """
+    assert corridor_env.shape == (3, 40)
+    assert corridor_env.size == 40
+    assert corridor_env.is_within_bounds(CellIndex(2, 39))
+    assert not corridor_env.is_within_bounds(CellIndex(3, 0))
+    assert not corridor_env.is_within_bounds(CellIndex(0, 40))
+
+
+def test_rectangular_search(corridor_env: Environment):
+    """
+    Test that agents are located and distances found across a rectangular grid.
+    """
+    assert corridor_env.get_agent_cell(Role.EVADER) == CellIndex(2, 39)
+    assert corridor_env.get_shortest_distance(CellIndex(0, 0), CellIndex(2, 39)) == 41
+    corridor_env.use_bitboard = True
+    assert corridor_env.get_shortest_distance(CellIndex(0, 0), CellIndex(2, 39)) == 41
+
+
+def test_rectangular_density():
+    """
+    Test that obstacle density is taken over rows times columns.
+    """
+    env = Environment(
+        size=(4, 10),
+        density=0.25,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(3, 9),
+    )
+    assert len(env.get_obstacle_cells()) == 10
+
+
+# --- Unit tests for teams ---
+# add_agents(), get_agent_cells(), get_distance_field(), get_team_distance()
+
+
+@pytest.fixture
+def team_env():
+    """Create a 6x6 environment with two pursuants, two evaders and a short wall."""
+    env = Environment(
+        size=6,
+        density=0.0,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(5, 5),
+        additional_agents={
+            Role.PURSUANT: [CellIndex(0, 5)],
+            Role.EVADER: [CellIndex(5, 0)],
+        },
+    )
+    env.place_additional_obstacles([CellIndex(2, i) for i in range(1, 6)])
+    return env
+
+
+def test_team_placement(team_env: Environment):
+    """
+    Test that every team member is placed and found.
+    """
+    assert team_env.get_agent_cells(Role.PURSUANT) == [CellIndex(0, 0), CellIndex(0, 5)]
+    assert team_env.get_agent_cells(Role.EVADER) == [CellIndex(5, 0), CellIndex(5, 5)]
+
+
+def test_distance_field_matches_bfs(team_env: Environment):
+    """
+    Test that a cached distance field agrees with point-to-point BFS.
+    """
+    source = CellIndex(0, 5)
+    field = team_env.get_distance_field(source)
+    for i in range(0, team_env.rows):
+        for j in range(0, team_env.cols):
+            bfs = team_env.get_shortest_distance(source, CellIndex(i, j))
+            assert field[i, j] == (-1 if bfs is None else bfs)
+    assert team_env.get_distance_field(source) is field
+
+
+def test_distance_fields_are_bounded(team_env: Environment):
+    """
+    Test that the distance field cache drops the least recently used field beyond field_cache.
+    """
+    team_env.field_cache = 2
+    first = team_env.get_distance_field(CellIndex(0, 0))
+    second = team_env.get_distance_field(CellIndex(0, 1))
+    assert team_env.get_distance_field(CellIndex(0, 0)) is first
+    team_env.get_distance_field(CellIndex(0, 2))
+    assert len(team_env._fields) == 2
+    assert team_env.get_distance_field(CellIndex(0, 0)) is first
+    assert team_env.get_distance_field(CellIndex(0, 1)) is not second
+
+
+def test_team_distance_is_closest_pair(team_env: Environment):
+    """
+    Test that the team distance is the smallest pursuant-evader distance.
+    """
+    pursuants = team_env.get_agent_cells(Role.PURSUANT)
+    evaders = team_env.get_agent_cells(Role.EVADER)
+    expected = min(
+        team_env.get_shortest_distance(p, e) for p in pursuants for e in evaders
+    )
+    assert team_env.get_team_distance(pursuants, evaders) == expected == 5
+
+
+def test_team_adjacency_and_moves(team_env: Environment):
+    """
+    Test that any pursuant next to any evader counts as adjacent, and that a named agent can be moved.
+    """
+    assert not team_env.is_agent_adjacent()
+    for row in range(0, 4):
+        assert team_env.move_agent(Role.PURSUANT, Action.DOWN, CellIndex(row, 0))
+    assert team_env.is_agent_adjacent()
+    assert not team_env.move_agent(Role.PURSUANT, Action.DOWN, CellIndex(1, 1))
+
+
+# --- Unit tests for dynamic obstacles ---
+# remove_obstacles(), incremental distance-field repair
+
+
+def test_remove_obstacles(sparse_env: Environment):
+    """
+    Test that only obstacle cells are cleared.
+    """
+    removed = sparse_env.remove_obstacles([CellIndex(1, 0), CellIndex(2, 2)])
+    assert removed == [CellIndex(1, 0)]
+    assert sparse_env._get(CellIndex(1, 0)) == Occupancy.EMPTY
+
+
+def test_dynamic_repair_matches_recomputation():
+    """
+    Test that repaired fields equal fields rebuilt from scratch as a door closes and reopens.
+    """
+    env = Environment(
+        size=8,
+        density=0.2,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(7, 7),
+        rng=random.Random(4),
+    )
+    env.dynamic = True
+    sources = [CellIndex(0, 0), CellIndex(7, 7)]
+    for source in sources:
+        env.get_distance_field(source)
+
+    door = [CellIndex(3, i) for i in range(0, 8)]
+    placed = env.place_additional_obstacles(door)
+    for source in sources:
+        assert np.array_equal(env.get_distance_field(source), env._bfs_field(source))
+    assert env.get_shortest_distance(CellIndex(0, 0), CellIndex(7, 7)) is None
+
+    env.remove_obstacles(placed)
+    for source in sources:
+        assert np.array_equal(env.get_distance_field(source), env._bfs_field(source))
+
+
+def test_dynamic_repair_is_local():
+    """
+    Test that debris far from the source's shortest paths only revisits a few cells.
+    """
+    env = Environment(
+        size=30,
+        density=0.0,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(29, 29),
+    )
+    env.dynamic = True
+    env.get_distance_field(CellIndex(0, 0))
+    env.place_additional_obstacles([CellIndex(20, 20)])
+    assert env.repaired_cells < 10
+    assert env.get_shortest_distance(CellIndex(0, 0), CellIndex(29, 29)) == 58
+
+
+# --- Unit tests for movement models ---
+# 8-connected moves, terrain costs, Dijkstra-backed distances
+
+
+def test_eight_connected_distance(empty_env: Environment):
+    """
+    Test that diagonal moves shorten distances to the larger of the row and column offsets.
+    """
+    env = Environment(
+        size=5,
+        density=0.0,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(3, 4),
+        movement=EIGHT_CONNECTED,
+    )
+    assert env.get_shortest_distance(CellIndex(0, 0), CellIndex(3, 4)) == 4
+    assert empty_env.get_shortest_distance(CellIndex(0, 0), CellIndex(3, 4)) == 7
+    assert len(env.get_neighbors(CellIndex(2, 2))) == 8
+
+
+def test_diagonal_cannot_cut_corners():
+    """
+    Test that a diagonal step squeezing past an obstacle is not a neighbor.
+    """
+    env = Environment.from_array(
+        np.array([[0, 1], [0, 0]], dtype=np.uint8),
+        CellIndex(0, 0),
+        CellIndex(1, 1),
+        movement=EIGHT_CONNECTED,
+    )
+    assert CellIndex(1, 1) not in env.get_neighbors(CellIndex(0, 0))
+    assert not env.is_agent_adjacent()
+    assert env.get_shortest_distance(CellIndex(0, 0), CellIndex(1, 1)) == 2
+
+
+def test_diagonal_corner_splits_components():
+    """
+    Test that regions touching only at a corner stay apart under 8-connected moves without corner cutting.
+    """
+    obstacles = np.array([[0, 1], [1, 0]], dtype=np.uint8)
+    env = Environment.from_array(
+        obstacles, CellIndex(0, 0), CellIndex(1, 1), movement=EIGHT_CONNECTED
+    )
+    assert not env.is_traversable()
+    assert env.get_shortest_distance(CellIndex(0, 0), CellIndex(1, 1)) is None
+
+
+def test_octile_distance():
+    """
+    Test that diagonal steps cost sqrt(2) under the octile model.
+    """
+    env = Environment(
+        size=5,
+        density=0.0,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(3, 4),
+        movement=OCTILE,
+    )
+    assert env.is_weighted
+    assert env.get_shortest_distance(CellIndex(0, 0), CellIndex(3, 4)) == pytest.approx(
+        3 * math.sqrt(2) + 1
+    )
+    assert env.get_team_distance([CellIndex(0, 0)], [CellIndex(3, 4)]) == pytest.approx(
+        3 * math.sqrt(2) + 1
+    )
+
+
+def test_terrain_detour(empty_env: Environment):
+    """
+    Test that paths go around costly terrain when the detour is cheaper.
+    """
+    costs = np.ones((5, 5))
+    costs[0, 1:4] = 10
+    empty_env.set_terrain(costs)
+    # along the top row costs 10 + 10 + 10 + 1, around it 6
+    assert empty_env.get_shortest_distance(CellIndex(0, 0), CellIndex(0, 4)) == 6
+    field = empty_env.get_distance_field(CellIndex(0, 0))
+    assert field[0, 4] == 6
+    assert field[0, 1] == 10
+
+    empty_env.set_terrain(None)
+    assert empty_env.get_shortest_distance(CellIndex(0, 0), CellIndex(0, 4)) == 4
+
+
+def test_terrain_rejects_bad_costs(empty_env: Environment):
+    """
+    Test that terrain costs must match the grid and be positive.
+    """
+    with pytest.raises(ValueError):
+        empty_env.set_terrain(np.ones((4, 4)))
+    with pytest.raises(ValueError):
+        empty_env.set_terrain(np.zeros((5, 5)))
+
+
+def test_dynamic_repair_eight_connected():
+    """
+    Test that repaired 8-connected fields equal fields rebuilt from scratch, including diagonals blocked by a new obstacle beside them.
+    """
+    env = Environment(
+        size=8,
+        density=0.2,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(7, 7),
+        rng=random.Random(4),
+        movement=EIGHT_CONNECTED,
+    )
+    env.dynamic = True
+    source = CellIndex(0, 0)
+    env.get_distance_field(source)
+
+    placed = env.place_additional_obstacles([CellIndex(0, 1), CellIndex(4, 4)])
+    assert np.array_equal(env.get_distance_field(source), env._bfs_field(source))
+    env.remove_obstacles(placed)
+    assert np.array_equal(env.get_distance_field(source), env._bfs_field(source))
+
+
+# --- Unit tests for the obstacle-free fast path ---
+# get_obstacle_sums(), count_obstacles(), clear-rectangle distances
+
+
+def test_count_obstacles_matches_grid(dense_env: Environment):
+    """
+    Test that rectangle counts from the summed-area table match counting cells, before and after obstacles change.
+    """
+    rng = random.Random(2)
+    for step in range(3):
+        blocked = dense_env.snapshot() == Occupancy.OBSTACLE.value
+        for _ in range(20):
+            a = CellIndex(rng.randrange(4), rng.randrange(4))
+            b = CellIndex(rng.randrange(4), rng.randrange(4))
+            rows = slice(min(a.row, b.row), max(a.row, b.row) + 1)
+            cols = slice(min(a.col, b.col), max(a.col, b.col) + 1)
+            assert dense_env.count_obstacles(a, b) == blocked[rows, cols].sum()
+        if step == 0:
+            dense_env.remove_obstacles(dense_env.get_obstacle_cells()[:3])
+        else:
+            dense_env.place_additional_obstacles([CellIndex(2, 2), CellIndex(3, 0)])
+
+
+def test_clear_rectangle_skips_search():
+    """
+    Test that distances across obstacle-free rectangles are exact without searching, and obstacles in the way still force a detour.
+    """
+    env = Environment(
+        size=30,
+        density=0.0,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(29, 29),
+    )
+    env.get_neighbors = None  # any search would fail
+    assert env.get_shortest_distance(CellIndex(0, 0), CellIndex(29, 29)) == 58
+    assert env.get_shortest_distance(CellIndex(29, 0), CellIndex(0, 29)) == 58
+
+    wall = Environment.from_array(
+        np.array([[0, 0, 0], [0, 1, 0], [0, 1, 0]], dtype=np.uint8),
+        CellIndex(2, 0),
+        CellIndex(2, 2),
+        movement=EIGHT_CONNECTED,
+    )
+    assert wall.get_shortest_distance(CellIndex(0, 0), CellIndex(0, 2)) == 2
+    assert wall.get_shortest_distance(CellIndex(2, 0), CellIndex(2, 2)) == 6
+    wall.remove_obstacles([CellIndex(2, 1)])
+    assert wall.get_shortest_distance(CellIndex(2, 0), CellIndex(2, 2)) == 2
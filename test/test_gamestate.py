@@ -0,0 +1,99 @@
+"""
+Test how the GameState class and the simulation core are set up.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+from src.gamestate import GameState
+from src.utils import CellIndex
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+def test_core_imports_without_plotting():
+    """
+    Test that the simulation core loads without pulling in any plotting or dataframe library.
+    """
+    script = (
+        "import sys; "
+        "import environment, minimax, gamestate, utils, benchmarking; "
+        "heavy = ['matplotlib', 'seaborn', 'sklearn', 'graphviz', 'PIL', 'pandas']; "
+        "print([m for m in heavy if m in sys.modules])"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_seeded_maps_repeat():
+    """
+    Test that two games with the same seed are played on the same map.
+    """
+    game1 = GameState(episode=0, density=0.4, seed=7)
+    game2 = GameState(episode=1, density=0.4, seed=7)
+    assert np.array_equal(game1.env._graph, game2.env._graph)
+
+
+def test_node_budget_searches_shallower():
+    """
+    Test that a tree too large for the node budget is searched at a depth that fits, and the turn is marked degraded.
+    """
+    full = GameState(episode=0, density=0.2, depth=4, seed=5)
+    full.compute_next_move()
+    assert not full.turn_stats[0]["degraded"]
+
+    budget = full.node_id_counter // 2
+    game = GameState(episode=0, density=0.2, depth=4, seed=5, max_nodes=budget)
+    assert game.compute_next_move() is not None
+    stats = game.turn_stats[0]
+    assert stats["degraded"] and not stats["streamed"]
+    assert stats["depth"] < 4
+    assert stats["nodes"] <= budget
+
+
+def test_streamed_search_matches_full_tree():
+    """
+    Test that streaming the tree instead of building it picks the same moves as searching the full tree.
+    """
+    for search in ("alphabeta", "pvs"):
+        full = GameState(episode=0, density=0.2, depth=4, seed=5, search=search)
+        game = GameState(
+            episode=0,
+            density=0.2,
+            depth=4,
+            seed=5,
+            search=search,
+            max_tree_bytes=20 * 400,
+            on_budget="stream",
+        )
+        for _ in range(3):
+            action = full.compute_next_move()
+            assert game.compute_next_move() == action
+            assert game.turn_stats[-1]["streamed"]
+            assert game.turn_stats[-1]["depth"] == 4
+            for g in (full, game):
+                g.apply_move(action)
+                g.switch_turns()
+
+
+def test_extensions_search_past_the_tree():
+    """
+    Test that on a map where the agents are always close, extending every line by two plies equals searching two plies deeper, and the nodes grown past the tree are dropped.
+    """
+    for search in ("alphabeta", "pvs"):
+        settings = dict(episode=0, size=3, density=0.0, search=search)
+        deep = GameState(depth=4, e_start=CellIndex(2, 2), **settings)
+        extended = GameState(depth=2, e_start=CellIndex(2, 2), extend_within=4, **settings)
+        assert extended.compute_next_move() == deep.compute_next_move()
+        assert extended.last_value == deep.last_value
+        assert extended.agents.extended > 0
+        leaves = [leaf for child in extended.game_tree.children for leaf in child.children]
+        assert leaves and all(not leaf.children for leaf in leaves)
@@ -0,0 +1,109 @@
+"""
+Test the learned evaluation pipeline.
+"""
+
+import numpy as np
+from src.environment import Environment
+from src.gamestate import GameState
+from src.learned_eval import (
+    FEATURES,
+    LearnedEvaluator,
+    self_play,
+    state_features,
+)
+from src.minimax import MiniMax
+from src.utils import CellIndex, Role
+
+
+def distance_evaluator():
+    """Build a linear evaluator that scores a position by its distance alone."""
+    weights = np.zeros((len(FEATURES), 1))
+    weights[FEATURES.index("distance")] = 1
+    n = len(FEATURES)
+    return LearnedEvaluator(np.zeros(n), np.ones(n), 0.0, 1.0, [(weights, np.zeros(1))])
+
+
+class CountingEvaluator(LearnedEvaluator):
+    """Count the batches an evaluator is asked to score."""
+
+    batches = 0
+
+    def evaluate(self, env, nodes, turns_left=None):
+        self.batches += 1
+        return super().evaluate(env, nodes, turns_left)
+
+
+def test_state_features():
+    """
+    Test each feature on a corridor with a wall next to the evader.
+    """
+    obstacles = np.zeros((3, 5), dtype=np.uint8)
+    obstacles[0, 3] = 1
+    env = Environment.from_array(obstacles, CellIndex(1, 0), CellIndex(1, 4))
+    features = state_features(
+        env, [CellIndex(1, 0)], [CellIndex(1, 4)], [Role.EVADER], [4], [None]
+    )[0]
+    row = dict(zip(FEATURES, features))
+    assert row["distance"] == 4
+    assert row["pursuant_mobility"] == 3 and row["evader_mobility"] == 3
+    assert row["pursuant_density"] == 0
+    assert row["evader_density"] == 1 / 9
+    # the evader is first to the two columns nearest it, 5 of 14 open cells
+    assert row["territory"] == 5 / 14
+    assert row["evader_to_move"] == 1
+    assert row["plies_left"] == 32
+
+
+def test_fit_and_save(tmp_path):
+    """
+    Test that a linear model recovers a linear target, an MLP fits a nonlinear one, and both survive a save and load.
+    """
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(400, 3))
+    linear = LearnedEvaluator.fit(x, 2 * x[:, 0] - x[:, 2] + 5, l2=0)
+    assert np.allclose(linear.predict(x), 2 * x[:, 0] - x[:, 2] + 5)
+
+    target = np.sin(2 * x[:, 0]) + x[:, 1] ** 2
+    mlp = LearnedEvaluator.fit(x, target, hidden=16, epochs=1500, seed=0)
+    assert np.mean((mlp.predict(x) - target) ** 2) < 0.1 * target.var()
+
+    for model in (linear, mlp):
+        model.save(tmp_path / "model.npz")
+        loaded = LearnedEvaluator.load(tmp_path / "model.npz")
+        assert np.allclose(loaded.predict(x), model.predict(x))
+
+
+def test_evaluator_scores_leaves_in_batches():
+    """
+    Test that an evaluator equal to the distance leaves the search unchanged, and is called once per group of sibling leaves.
+    """
+    plain = GameState(episode=0, density=0.2, depth=3, seed=2)
+    learned = GameState(episode=0, density=0.2, depth=3, seed=2)
+    evaluator = CountingEvaluator(*vars(distance_evaluator()).values())
+    learned.agents = MiniMax(learned.env, evaluator=evaluator)
+    assert learned.compute_next_move() == plain.compute_next_move()
+    assert learned.last_value == plain.last_value
+    leaves = [
+        leaf
+        for child in learned.game_tree.children
+        for grandchild in child.children
+        for leaf in grandchild.children
+        if leaf.estimate is not None
+    ]
+    assert 0 < evaluator.batches < len(leaves)
+
+
+def test_self_play_trains_an_evaluator():
+    """
+    Test that self-play labels every position, and a game with the trained evaluator runs to the end.
+    """
+    features, targets = self_play(games=2, depth=3, seed=0)
+    assert features.shape == (len(targets), len(FEATURES))
+    assert len(targets) > 0 and np.all(targets >= 0)
+
+    evaluator = LearnedEvaluator.fit(features, targets)
+    game = GameState(
+        episode=0, density=0.2, depth=2, seed=9, require_connected=True, evaluator=evaluator
+    )
+    winner, _ = game.run_loop()
+    assert winner in (Role.PURSUANT, Role.EVADER)
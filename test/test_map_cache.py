@@ -0,0 +1,109 @@
+"""
+Test the on-disk cache of per-map tables.
+"""
+
+import os
+import random
+
+import numpy as np
+import pytest
+from src.environment import Environment
+from src.map_cache import MapCache
+from src.movement import EIGHT_CONNECTED
+from src.utils import CellIndex
+
+
+def make_env(seed=5, **kwargs) -> Environment:
+    return Environment(
+        size=6,
+        density=0.2,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(5, 5),
+        rng=random.Random(seed),
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_second_run_hits(tmp_path, compress):
+    """
+    Test that a map seen before is loaded instead of recomputed, with the same distances.
+    """
+    cache = MapCache(str(tmp_path), compress=compress)
+    assert not cache.prepare(make_env())
+    env = make_env()
+    assert cache.prepare(env)
+    assert (cache.hits, cache.misses) == (1, 1)
+    for i, j in [(0, 5), (3, 3), (5, 5)]:
+        assert np.array_equal(
+            env.get_distance_field(CellIndex(i, j)),
+            make_env()._bfs_field(CellIndex(i, j)),
+        )
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_large_maps_skip_all_pairs(tmp_path, compress):
+    """
+    Test that maps over max_cells store no all-pairs distances, but still load their other tables and answer distances.
+    """
+    cache = MapCache(str(tmp_path), compress=compress, max_cells=35)
+    assert not cache.prepare(make_env())
+    env = make_env()
+    assert cache.prepare(env)
+    assert env._distance_table is None
+    assert env._components is not None and env._table is not None
+    assert np.array_equal(
+        env.get_distance_field(CellIndex(0, 5)), make_env()._bfs_field(CellIndex(0, 5))
+    )
+
+
+def test_entry_evicted_while_loading_is_a_miss(tmp_path, monkeypatch):
+    """
+    Test that an entry removed between reading and touching it counts as a miss instead of raising.
+    """
+    cache = MapCache(str(tmp_path))
+    cache.prepare(make_env())
+
+    def evicted(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", evicted)
+    assert not cache.prepare(make_env())
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_key_ignores_agents_but_not_movement():
+    """
+    Test that agent positions share an entry while movement models do not.
+    """
+    env = make_env()
+    moved = Environment.from_array(
+        env.snapshot() == 1, CellIndex(0, 0), CellIndex(5, 5)
+    )
+    assert MapCache.key(env) == MapCache.key(moved)
+    assert MapCache.key(env) != MapCache.key(make_env(movement=EIGHT_CONNECTED))
+    assert MapCache.key(env) != MapCache.key(make_env(seed=6))
+
+
+def test_eviction_keeps_newest(tmp_path):
+    """
+    Test that the least recently used entries are dropped once the cache is full.
+    """
+    cache = MapCache(str(tmp_path), max_bytes=1)
+    first, second = make_env(seed=1), make_env(seed=2)
+    cache.prepare(first)
+    cache.prepare(second)
+    assert MapCache.key(second) in cache
+    assert MapCache.key(first) not in cache
+
+
+def test_cached_tables_survive_new_obstacles(tmp_path):
+    """
+    Test that read-only cached tables are dropped when the map changes.
+    """
+    cache = MapCache(str(tmp_path))
+    cache.prepare(make_env())
+    env = make_env()
+    cache.prepare(env)
+    env.place_additional_obstacles([CellIndex(0, 1), CellIndex(1, 0)])
+    assert env.get_shortest_distance(CellIndex(0, 0), CellIndex(5, 5)) is None
@@ -0,0 +1,122 @@
+"""
+Test the Monte Carlo tree search engine.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from src.environment import Environment
+from src.gamestate import GameState
+from src.mcts import MCTS
+from src.utils import Action, CellIndex, Role
+
+
+def open_env(rows, cols, pursuant, evader):
+    """Create an obstacle-free map."""
+    return Environment.from_array(
+        np.zeros((rows, cols), dtype=np.uint8), pursuant, evader
+    )
+
+
+def test_takes_capture():
+    """
+    Test that the pursuant steps next to the evader when it can.
+    """
+    env = open_env(1, 5, CellIndex(0, 0), CellIndex(0, 2))
+    search = MCTS(env, iterations=100, seed=0)
+    action, escape_rate = search.choose_move(Role.PURSUANT, turns_left=10)
+    assert action == Action.RIGHT
+    assert escape_rate == 0
+
+
+def test_evader_runs_away():
+    """
+    Test that an evader with room to flee does not step towards the pursuant.
+    """
+    env = open_env(1, 7, CellIndex(0, 0), CellIndex(0, 3))
+    search = MCTS(env, iterations=200, seed=0)
+    action, _ = search.choose_move(Role.EVADER, turns_left=4)
+    assert action == Action.RIGHT
+
+
+def test_rollouts_end_in_capture_when_cornered():
+    """
+    Test that greedy rollouts catch an evader at the end of a corridor, and let it go when time is up.
+    """
+    env = open_env(1, 6, CellIndex(0, 0), CellIndex(0, 5))
+    search = MCTS(env, batch_size=16, epsilon=0)
+    rng = np.random.default_rng(0)
+    assert not search.rollout(0, 5, Role.PURSUANT, 20, rng).any()
+    assert search.rollout(0, 5, Role.PURSUANT, 2, rng).all()
+
+
+def test_root_always_gets_a_move():
+    """
+    Test that a move is chosen even when the evader is already out of reach.
+    """
+    env = open_env(5, 5, CellIndex(0, 0), CellIndex(4, 4))
+    action, escape_rate = MCTS(env, iterations=20, seed=0).choose_move(
+        Role.PURSUANT, turns_left=2
+    )
+    assert action in (Action.RIGHT, Action.DOWN)
+    assert escape_rate == 1
+
+
+def test_fields_follow_obstacle_changes():
+    """
+    Test that cached distance fields are dropped once obstacles are placed or removed.
+    """
+    env = open_env(1, 5, CellIndex(0, 0), CellIndex(0, 4))
+    search = MCTS(env, seed=0)
+    assert search._field(0)[4] == 4
+    env.place_additional_obstacles([CellIndex(0, 2)])
+    assert search._field(0)[4] == -1
+    env.remove_obstacles([CellIndex(0, 2)])
+    assert search._field(0)[4] == 4
+
+
+def test_time_limit_stops_search():
+    """
+    Test that the time budget ends the search long before the iteration budget.
+    """
+    env = open_env(20, 20, CellIndex(0, 0), CellIndex(19, 19))
+    search = MCTS(env, iterations=10**9, time_limit=0.05, seed=0)
+    start = time.perf_counter()
+    action, _ = search.choose_move(Role.PURSUANT, turns_left=25)
+    assert time.perf_counter() - start < 1
+    assert action is not None
+    assert 0 < search.iterations_run < 10**9
+    assert search.worker_seconds == 0
+
+
+def test_parallel_trees_are_summed():
+    """
+    Test that every worker grows a full tree, the root statistics are combined and the workers' CPU time is counted.
+    """
+    env = open_env(1, 5, CellIndex(0, 0), CellIndex(0, 2))
+    with ThreadPoolExecutor(3) as pool:
+        search = MCTS(env, iterations=40, workers=3, executor=pool, seed=0)
+        action, _ = search.choose_move(Role.PURSUANT, turns_left=10)
+    assert action == Action.RIGHT
+    assert search.iterations_run == 120
+    assert search.worker_seconds > 0
+
+
+def test_engines_play_each_other():
+    """
+    Test that a game between an MCTS pursuant and a minimax evader runs to the end, timing each side.
+    """
+    game = GameState(
+        episode=0,
+        density=0.2,
+        seed=3,
+        require_connected=True,
+        engine="mcts",
+        evader_engine="minimax",
+        mcts_settings={"iterations": 30, "seed": 0},
+    )
+    winner, _ = game.run_loop()
+    assert winner in (Role.PURSUANT, Role.EVADER)
+    assert game.engines == {Role.PURSUANT: "mcts", Role.EVADER: "minimax"}
+    assert game.search_seconds[Role.PURSUANT] > 0
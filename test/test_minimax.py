@@ -0,0 +1,349 @@
+"""
+Test the search performed by the MiniMax class.
+"""
+
+import json
+import random
+
+import numpy as np
+import pytest
+from src.environment import Environment
+from src.minimax import MiniMax
+from src.movement import OCTILE
+from src.utils import CellIndex, Node, Role
+from src.visualizations import export_game_tree
+
+# --- Fixtures ---
+
+
+def make_node(id, depth, role, distance, children=None):
+    """Build a node whose agent positions do not matter to the search."""
+    node = Node(
+        id=id,
+        depth=depth,
+        agent_role=role,
+        pursuant_state=CellIndex(0, 0),
+        evader_state=CellIndex(0, id),
+        distance=distance,
+        action_from_parent=None,
+        parent=None,
+        children=children or [],
+    )
+    for child in node.children:
+        child.parent = node
+    return node
+
+
+@pytest.fixture
+def prunable_tree():
+    """
+    Create an evader-to-move tree whose second pursuant branch is cut off after its first leaf.
+    """
+    left = make_node(
+        1,
+        1,
+        Role.PURSUANT,
+        4,
+        [make_node(3, 2, Role.EVADER, 5), make_node(4, 2, Role.EVADER, 6)],
+    )
+    right = make_node(
+        2,
+        1,
+        Role.PURSUANT,
+        4,
+        [make_node(5, 2, Role.EVADER, 2), make_node(6, 2, Role.EVADER, 9)],
+    )
+    return make_node(0, 0, Role.EVADER, 4, [left, right])
+
+
+# --- Unit tests for minimax() ---
+
+
+def test_minimax_value(prunable_tree: Node):
+    """
+    Test that the evader picks the branch whose worst case is largest.
+    """
+    assert MiniMax().minimax(prunable_tree, depth=3) == 5
+
+
+def test_minimax_marks_pruned(prunable_tree: Node):
+    """
+    Test that leaves skipped by a cutoff are marked pruned and left unvalued.
+    """
+    MiniMax().minimax(prunable_tree, depth=3)
+    skipped = prunable_tree.children[1].children[1]
+    assert skipped.pruned
+    assert skipped.value is None
+    assert prunable_tree.value == 5
+    assert not any(c.pruned for c in prunable_tree.children[0].children)
+
+
+# --- Unit tests for principal variation search ---
+
+
+def random_tree(rng, depth, role=Role.EVADER, counter=None):
+    """Build a uniform tree with four children per node and random leaf distances."""
+    counter = counter if counter is not None else [0]
+    counter[0] += 1
+    node_id = counter[0]
+    if depth == 0:
+        return make_node(node_id, 0, role, rng.randint(2, 20))
+    other = Role.PURSUANT if role == Role.EVADER else Role.EVADER
+    children = [random_tree(rng, depth - 1, other, counter) for _ in range(4)]
+    return make_node(node_id, 0, role, rng.randint(2, 20), children)
+
+
+def test_pvs_value(prunable_tree: Node):
+    """
+    Test that principal variation search finds the minimax value.
+    """
+    assert MiniMax().pvs(prunable_tree, depth=3) == 5
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_search_root_matches_full_windows(seed):
+    """
+    Test that the root search picks the same child, with the same value, as searching every child with a full window, and visits fewer nodes doing so.
+    """
+    root = random_tree(random.Random(seed), 6)
+    plain = MiniMax()
+    values = [plain.minimax(child, depth=6) for child in root.children]
+    expected = max(range(len(values)), key=lambda i: (values[i], -i))
+
+    for guess in (None, 0, values[expected], 100):
+        pvs = MiniMax()
+        child, value = pvs.search_root(root, depth=6, guess=guess)
+        assert child is root.children[expected]
+        assert value == values[expected]
+    pvs = MiniMax()
+    pvs.search_root(root, depth=6, guess=values[expected])
+    assert pvs.nodes_visited < plain.nodes_visited
+
+
+def track_visits(search: MiniMax) -> dict:
+    """
+    Record whether each node was last visited or last marked pruned by a search, keyed by node id.
+    """
+    events = {}
+    for name in ("minimax", "pvs"):
+
+        def visit(node, *args, _method=getattr(search, name), **kwargs):
+            if events.get(node.id) == "pruned":
+                events["revisited"] = True
+            events[node.id] = "visited"
+            return _method(node, *args, **kwargs)
+
+        setattr(search, name, visit)
+    mark_pruned = search.mark_pruned
+
+    def mark(nodes):
+        events.update((n.id, "pruned") for n in nodes)
+        mark_pruned(nodes)
+
+    search.mark_pruned = mark
+    return events
+
+
+def walk(node: Node):
+    """Yield a node and all its descendants."""
+    yield node
+    for child in node.children:
+        yield from walk(child)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_researched_nodes_are_not_left_pruned(seed):
+    """
+    Test that null-window probes and aspiration re-searches leave no visited node flagged as pruned.
+    """
+    root = random_tree(random.Random(seed), 6)
+    search = MiniMax()
+    events = track_visits(search)
+    search.search_root(root, depth=6, guess=0, window=1)
+    assert events.pop("revisited", False)
+    for node in walk(root):
+        assert node.pruned == (events.get(node.id) == "pruned")
+
+
+# --- Unit tests for forced outcomes ---
+
+
+@pytest.fixture
+def pocket_env():
+    """Create a map whose only open cells are a top row and a dead-end corridor below its middle."""
+    obstacles = np.ones((5, 5), dtype=np.uint8)
+    obstacles[0, :] = 0
+    obstacles[:, 2] = 0
+    return Environment.from_array(obstacles, CellIndex(1, 2), CellIndex(3, 2))
+
+
+def test_quickest_capture_preferred():
+    """
+    Test that the pursuant prefers a capture in fewer plies, and the evader delays one.
+    """
+    slow = make_node(
+        1, 1, Role.EVADER, 2, [make_node(3, 2, Role.PURSUANT, 1)]
+    )
+    fast = make_node(2, 1, Role.EVADER, 1)
+    root = make_node(0, 0, Role.PURSUANT, 2, [slow, fast])
+    search = MiniMax()
+    values = [search.minimax(child, depth=3) for child in root.children]
+    assert values[1] < values[0] < 0
+    assert values[1] == -(MiniMax.MATE - 1)
+
+
+def test_out_of_turns_is_escape():
+    """
+    Test that a pursuant too far away to close in before time runs out loses.
+    """
+    search = MiniMax()
+    search.start_search(turns_left=4)
+    far = make_node(1, 1, Role.PURSUANT, 6)
+    assert search.forced_outcome(far) == MiniMax.MATE - 1
+    near = make_node(2, 1, Role.PURSUANT, 4)
+    assert search.forced_outcome(near) is None
+
+
+def test_capture_on_diagonal_and_weighted_maps():
+    """
+    Test that an adjacent evader counts as caught even when it is more than 1 away: diagonally on an octile map, or on a costly cell.
+    """
+    octile = Environment.from_array(
+        np.zeros((3, 3), dtype=np.uint8), CellIndex(0, 0), CellIndex(1, 1), movement=OCTILE
+    )
+    weighted = Environment.from_array(
+        np.zeros((1, 3), dtype=np.uint8), CellIndex(0, 0), CellIndex(0, 1)
+    )
+    terrain = np.ones((1, 3))
+    terrain[0, 1] = 5
+    weighted.set_terrain(terrain)
+
+    for env, evader in ((octile, CellIndex(1, 1)), (weighted, CellIndex(0, 1))):
+        distance = env.get_shortest_distance(CellIndex(0, 0), evader)
+        assert distance > 1
+        node = make_node(1, 1, Role.EVADER, distance)
+        node.evader_state = evader
+        assert MiniMax(env).forced_outcome(node) == -(MiniMax.MATE - 1)
+
+
+def test_trapped_evader(pocket_env: Environment):
+    """
+    Test that an evader in a dead-end corridor is found to be caught within the bound.
+    """
+    search = MiniMax(pocket_env)
+    assert search.capture_bound(CellIndex(1, 2), CellIndex(3, 2), Role.PURSUANT) == 3
+    assert search.capture_bound(CellIndex(1, 2), CellIndex(3, 2), Role.EVADER) == 4
+    # the whole map is a tree, so the pursuant can corner the evader from anywhere
+    assert search.capture_bound(CellIndex(0, 0), CellIndex(3, 2), Role.PURSUANT) == 9
+
+
+def test_open_evader_not_trapped():
+    """
+    Test that an evader with a loop to run around is not reported as trapped.
+    """
+    open_env = Environment(
+        size=5,
+        density=0.0,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(4, 4),
+    )
+    search = MiniMax(open_env)
+    assert search.capture_bound(CellIndex(0, 0), CellIndex(4, 4), Role.PURSUANT) is None
+
+
+def test_expand_searches_past_the_tree():
+    """
+    Test that a search expanding leaves on demand finds the value of the full tree, and drops what it expanded.
+    """
+    root = random_tree(random.Random(3), 6)
+    value = MiniMax().minimax(root.children[0], depth=6)
+
+    # cut the tree below the child's children, keeping them aside to hand back on demand
+    cut = {}
+
+    def strip(node):
+        for child in node.children:
+            strip(child)
+        cut[id(node)] = node.children
+        node.children = []
+
+    first = root.children[0]
+    for child in first.children:
+        strip(child)
+
+    def expand(node):
+        node.children = cut[id(node)]
+
+    search = MiniMax(expand=expand)
+    assert search.minimax(first, depth=6) == value
+    assert all(not child.children for child in first.children)
+
+
+# --- Unit tests for selective depth ---
+
+
+def test_late_moves_are_reduced():
+    """
+    Test that a late child is searched a ply shallower, and again at full depth only when the shallow search beats the earlier children.
+    """
+
+    def tree(late_distance):
+        early = make_node(
+            1,
+            1,
+            Role.PURSUANT,
+            5,
+            [make_node(3, 2, Role.EVADER, 3), make_node(4, 2, Role.EVADER, 4)],
+        )
+        late = make_node(
+            2,
+            1,
+            Role.PURSUANT,
+            late_distance,
+            [make_node(5, 2, Role.EVADER, 6), make_node(6, 2, Role.EVADER, 7)],
+        )
+        return make_node(0, 0, Role.EVADER, 4, [early, late])
+
+    search = MiniMax(reduce_after=1)
+    assert search.minimax(tree(4), depth=3) == 6
+    assert (search.reduced, search.researched) == (1, 1)
+
+    # looking worse than the first child at the reduced depth, the late child is not searched again
+    search = MiniMax(reduce_after=1)
+    assert search.minimax(tree(2), depth=3) == 3
+    assert (search.reduced, search.researched) == (1, 0)
+    assert MiniMax().minimax(tree(2), depth=3) == 6
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_reductions_export_no_stale_pruning(seed, tmp_path):
+    """
+    Test that a node cut off by a reduced search and visited by its full-depth re-search is exported as searched.
+    """
+    root = random_tree(random.Random(seed), 6)
+    search = MiniMax(reduce_after=1)
+    events = track_visits(search)
+    search.minimax(root, depth=7)
+    assert search.researched > 0 and events.pop("revisited", False)
+
+    path = tmp_path / "tree.jsonl"
+    export_game_tree(root, path, fmt="jsonl")
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == sum(1 for _ in walk(root))
+    for record in records:
+        assert record["pruned"] == (events.get(record["id"]) == "pruned")
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_reductions_visit_fewer_nodes(seed):
+    """
+    Test that reductions cut the nodes searched on uniform trees.
+    """
+    root = random_tree(random.Random(seed), 6)
+    plain, reduced = MiniMax(), MiniMax(reduce_after=1)
+    for child in root.children:
+        plain.minimax(child, depth=6)
+        reduced.minimax(child, depth=6)
+    assert reduced.nodes_visited < plain.nodes_visited
+    assert reduced.reduced > 0
@@ -0,0 +1,56 @@
+"""
+Test movement models and the neighbor tables built from them.
+"""
+
+import numpy as np
+from src.movement import (
+    FOUR_CONNECTED,
+    EIGHT_CONNECTED,
+    OCTILE,
+    MovementModel,
+    neighbor_table,
+)
+
+
+def test_unit_cost():
+    """
+    Test that only octile movement needs weighted distances.
+    """
+    assert FOUR_CONNECTED.unit_cost
+    assert EIGHT_CONNECTED.unit_cost
+    assert not OCTILE.unit_cost
+    assert not FOUR_CONNECTED.diagonal and EIGHT_CONNECTED.diagonal
+
+
+def test_neighbor_table_bounds_and_obstacles():
+    """
+    Test that moves leaving the grid or entering an obstacle are -1.
+    """
+    blocked = np.array([[False, True], [False, False]])
+    table = neighbor_table(blocked, FOUR_CONNECTED)
+    # LEFT, RIGHT, UP, DOWN from the top-left corner
+    assert table[0].tolist() == [-1, -1, -1, 2]
+    assert table[3].tolist() == [2, -1, -1, -1]
+
+
+def test_neighbor_table_corner_cutting():
+    """
+    Test that diagonal moves past an obstacle are only listed when corner cutting is allowed.
+    """
+    blocked = np.array([[False, True], [False, False]])
+    strict = neighbor_table(blocked, EIGHT_CONNECTED)
+    loose = neighbor_table(
+        blocked, MovementModel(EIGHT_CONNECTED.actions, cut_corners=True)
+    )
+    assert 3 not in strict[0]
+    assert 3 in loose[0]
+
+
+def test_neighbor_table_subset():
+    """
+    Test that the rows for a subset of cells match the full table.
+    """
+    blocked = np.random.default_rng(0).random((6, 7)) < 0.3
+    full = neighbor_table(blocked, EIGHT_CONNECTED)
+    index = np.array([0, 8, 41])
+    assert np.array_equal(neighbor_table(blocked, EIGHT_CONNECTED, index), full[index])
@@ -0,0 +1,50 @@
+"""
+Test loading occupancy maps from files in occupancy_map.py.
+"""
+
+import numpy as np
+from src.occupancy_map import load_occupancy_map, load_environment
+from src.utils import CellIndex, Occupancy
+
+
+def test_load_npy_memory_mapped(tmp_path):
+    """
+    Test that .npy maps are memory-mapped and writes never reach the file.
+    """
+    path = str(tmp_path / "map.npy")
+    grid = np.zeros((6, 6), dtype=np.uint8)
+    grid[2, 1:5] = 1
+    np.save(path, grid)
+
+    env = load_environment(path, CellIndex(0, 0), CellIndex(5, 5))
+    assert isinstance(env._graph, np.memmap)
+    assert env._get(CellIndex(2, 3)) == Occupancy.OBSTACLE
+    assert np.array_equal(np.load(path), grid)
+
+
+def test_load_ros_map(tmp_path):
+    """
+    Test that a PGM map with its YAML file is thresholded like map_server does.
+    """
+    from PIL import Image
+
+    pixels = np.full((3, 3), 254, dtype=np.uint8)  # free
+    pixels[0, 0] = 0  # occupied
+    pixels[1, 1] = 205  # unknown
+    Image.fromarray(pixels).save(tmp_path / "map.pgm")
+    (tmp_path / "map.yaml").write_text(
+        "image: map.pgm\n"
+        "resolution: 0.05\n"
+        "origin: [0.0, 0.0, 0.0]\n"
+        "negate: 0\n"
+        "occupied_thresh: 0.65\n"
+        "free_thresh: 0.196\n"
+    )
+
+    obstacles = load_occupancy_map(str(tmp_path / "map.yaml"))
+    expected = np.zeros((3, 3), dtype=bool)
+    expected[0, 0] = expected[1, 1] = True
+    assert np.array_equal(obstacles, expected)
+
+    known = load_occupancy_map(str(tmp_path / "map.pgm"), unknown_is_obstacle=False)
+    assert known.sum() == 1
@@ -0,0 +1,79 @@
+"""
+Test the per-phase profiler.
+"""
+
+import os
+import time
+
+from src.gamestate import GameState
+from src.profiling import PhaseProfiler, merge_collapsed
+
+
+def busy(seconds):
+    """Spin for a while, so the profile has something to attribute."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_nested_phases_do_not_double_count():
+    """
+    Test that time in an inner phase is credited to it alone, and its calls only appear in its own profile.
+    """
+    profiler = PhaseProfiler(memory=False)
+    start = time.perf_counter()
+    with profiler.phase("outer"):
+        busy(0.02)
+        with profiler.phase("inner"):
+            busy(0.05)
+        busy(0.02)
+    elapsed = time.perf_counter() - start
+    assert profiler.entries == {"outer": 1, "inner": 1}
+    assert profiler.seconds["inner"] >= 0.05
+    assert profiler.seconds["outer"] >= 0.04
+    # counting the inner phase twice would overshoot the time the block took
+    assert profiler.seconds["inner"] + profiler.seconds["outer"] <= elapsed
+    assert profiler.phases() == ["inner", "outer"]
+
+    stacks = profiler.collapsed_stacks()
+    assert any(s.startswith("inner;busy") for s in stacks)
+    assert all(";" in s and count > 0 for s, count in stacks.items())
+
+
+def test_memory_is_traced_per_phase():
+    """
+    Test that memory kept by a phase shows up in its net bytes and allocation sites.
+    """
+    profiler = PhaseProfiler()
+    with profiler.phase("allocate"):
+        kept = [bytearray(1024) for _ in range(1000)]
+    profiler.close()
+    assert profiler.net_bytes["allocate"] > 1000 * 1024
+    site, size = profiler.top_allocations("allocate", top=1)[0]
+    assert "test_profiling.py" in site
+    assert size > 1000 * 1024
+    del kept
+
+
+def test_game_phases_and_dump(tmp_path):
+    """
+    Test that a profiled game reports its phases and writes a report, collapsed stacks and pstats files that merge.
+    """
+    profiler = PhaseProfiler(memory=False)
+    GameState(episode=0, density=0.2, seed=1, profiler=profiler).run_loop()
+    assert {"map", "tree", "search", "move"} <= set(profiler.phases())
+
+    profiler.dump(tmp_path, prefix="game-a")
+    profiler.dump(tmp_path, prefix="game-b")
+    assert os.path.exists(tmp_path / "game-a.txt")
+    assert os.path.exists(tmp_path / "game-a-search.prof")
+    merged = tmp_path / "merged.collapsed"
+    stacks = merge_collapsed([str(tmp_path / "game-*.collapsed")], str(merged))
+    assert stacks == len(profiler.collapsed_stacks())
+
+    single = dict(
+        line.rsplit(" ", 1) for line in open(tmp_path / "game-a.collapsed").read().splitlines()
+    )
+    for line in open(merged).read().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) == 2 * int(single[stack])
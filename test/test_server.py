@@ -0,0 +1,219 @@
+"""
+Test the asynchronous game server with an in-process client.
+"""
+
+import asyncio
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from src.environment import Environment
+from src.minimax import MiniMax
+from src.server import GameServer, MoveRequest, play_live_game, search_position
+from src.utils import CellIndex, Role
+
+
+@pytest.fixture
+def env():
+    """Create a 6x6 environment with a few obstacles."""
+    return Environment(
+        size=6,
+        density=0.15,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(5, 5),
+        rng=random.Random(3),
+    )
+
+
+def local_server(**kwargs) -> GameServer:
+    return GameServer(executor=ThreadPoolExecutor(2), max_pending=2, **kwargs)
+
+
+def test_reply_matches_direct_search(env: Environment):
+    """
+    Test that the server's move equals a direct search at the requested depth.
+    """
+    request = MoveRequest.from_environment(env, Role.PURSUANT, depth=3, deadline=30)
+
+    async def ask():
+        async with local_server() as server:
+            return await server.request_move(request)
+
+    reply = asyncio.run(ask())
+    action, value = search_position(
+        request.obstacles, request.pursuant, request.evader, Role.PURSUANT, 3
+    )
+    assert (reply.action, reply.value, reply.depth) == (action, value, 3)
+    assert not reply.timed_out and not reply.cached
+
+
+def test_repeated_position_is_cached(env: Environment):
+    """
+    Test that solving the same position twice only searches it once.
+    """
+    server = local_server()
+    request = MoveRequest.from_environment(env, Role.EVADER, depth=2, deadline=30)
+
+    async def ask_twice():
+        async with server:
+            first = await server.request_move(request)
+            second = await server.request_move(request)
+            return first, second
+
+    first, second = asyncio.run(ask_twice())
+    assert second.cached and second.action == first.action
+    assert server.searches == 2  # depths 1 and 2
+    assert server.cache_hits == 1
+
+
+def test_terrain_and_turns_left_reach_the_search(env: Environment):
+    """
+    Test that a request's terrain costs and remaining turns change its search, and its cache key.
+    """
+    env.set_terrain(np.full(env.shape, 3.0))
+    weighted = MoveRequest.from_environment(env, Role.PURSUANT, depth=3, deadline=30)
+    env.set_terrain(None)
+    plain = MoveRequest.from_environment(env, Role.PURSUANT, depth=3, deadline=30)
+    closing = MoveRequest.from_environment(
+        env, Role.PURSUANT, depth=3, deadline=30, turns_left=2
+    )
+    assert len({plain.key(), weighted.key(), closing.key()}) == 3
+
+    async def ask_all():
+        async with local_server() as server:
+            return [await server.request_move(r) for r in (plain, weighted, closing)]
+
+    plain_reply, weighted_reply, closing_reply = asyncio.run(ask_all())
+    assert weighted_reply.value == 3 * plain_reply.value
+    assert closing_reply.value > MiniMax.MATE - 3  # the evader outlasts the game
+    _, value = search_position(
+        weighted.obstacles,
+        weighted.pursuant,
+        weighted.evader,
+        Role.PURSUANT,
+        3,
+        terrain=weighted.terrain,
+    )
+    assert weighted_reply.value == value
+
+
+def test_deadline_returns_best_so_far(env: Environment):
+    """
+    Test that an expired deadline still answers with a shallower move.
+    """
+    request = MoveRequest.from_environment(env, Role.PURSUANT, depth=12, deadline=0)
+
+    async def ask():
+        async with local_server() as server:
+            return await server.request_move(request)
+
+    start = time.perf_counter()
+    reply = asyncio.run(ask())
+    assert reply.timed_out
+    assert reply.depth == 1 and reply.action is not None
+    assert time.perf_counter() - start < 5
+
+
+def test_concurrent_live_games():
+    """
+    Test that many games can be played at once through one server.
+    """
+    envs = [
+        Environment(
+            size=5,
+            density=0.1,
+            pursuant_pos=CellIndex(0, 0),
+            evader_pos=CellIndex(4, 4),
+            rng=random.Random(seed),
+        )
+        for seed in range(8)
+    ]
+
+    async def play_all():
+        async with local_server(cache_size=50) as server:
+            results = await asyncio.gather(
+                *(play_live_game(server, e, depth=2, deadline=5) for e in envs)
+            )
+            return results, len(server.cache)
+
+    results, cached = asyncio.run(play_all())
+    assert len(results) == 8
+    for (winner, turns), e in zip(results, envs):
+        # each game ends on a capture within the turn limit or on the evader surviving it
+        if winner == Role.PURSUANT:
+            assert e.is_agent_adjacent() and 0 < turns < 25
+        else:
+            assert winner == Role.EVADER
+            assert turns == 25 and not e.is_agent_adjacent()
+    assert 0 < cached <= 50
+
+
+def test_process_pool(env: Environment):
+    """
+    Test that searches run in worker processes by default.
+    """
+    request = MoveRequest.from_environment(env, Role.PURSUANT, depth=2, deadline=30)
+
+    async def ask():
+        async with GameServer(workers=2) as server:
+            return await server.request_move(request)
+
+    assert asyncio.run(ask()).depth == 2
+
+
+def test_shared_tables_build_off_the_loop(env: Environment, monkeypatch):
+    """
+    Test that a map's shared tables are built once for concurrent requests, without blocking the event loop.
+    """
+    module = sys.modules[GameServer.__module__]
+    publish = module.publish_tables
+    builds = []
+
+    def slow_publish(request):
+        builds.append(request.pursuant)
+        time.sleep(0.2)
+        return publish(request)
+
+    monkeypatch.setattr(module, "publish_tables", slow_publish)
+    requests = [
+        MoveRequest.from_environment(env, turn, depth=1, deadline=30)
+        for turn in (Role.PURSUANT, Role.EVADER)
+    ]
+
+    async def ask_while_ticking():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        async with local_server(share_tables=True) as server:
+            replies = await asyncio.gather(*(server.request_move(r) for r in requests))
+        ticker.cancel()
+        return replies, ticks
+
+    replies, ticks = asyncio.run(ask_while_ticking())
+    assert len(builds) == 1
+    assert all(reply.action is not None for reply in replies)
+    assert ticks >= 5
+
+
+def test_shared_tables(env: Environment):
+    """
+    Test that searching on shared tables finds the same move.
+    """
+    request = MoveRequest.from_environment(env, Role.PURSUANT, depth=3, deadline=30)
+
+    async def ask(share_tables):
+        async with GameServer(workers=2, share_tables=share_tables) as server:
+            return await server.request_move(request)
+
+    shared = asyncio.run(ask(True))
+    plain = asyncio.run(ask(False))
+    assert (shared.action, shared.value) == (plain.action, plain.value)
@@ -0,0 +1,92 @@
+"""
+Test publishing map tables in shared memory and attaching to them from workers.
+"""
+
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+from src.environment import Environment
+from src.movement import EIGHT_CONNECTED
+from src.shared_tables import SharedMapTables, attach_environment
+from src.utils import CellIndex
+
+
+@pytest.fixture
+def env():
+    """Create a 6x6 environment with some obstacles."""
+    return Environment(
+        size=6,
+        density=0.25,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(5, 5),
+        rng=random.Random(2),
+    )
+
+
+def all_distances(spec) -> list:
+    """Measure every distance from the corner in an attached environment."""
+    attached = attach_environment(spec, CellIndex(0, 0), CellIndex(5, 5))
+    return [
+        attached.get_shortest_distance(CellIndex(0, 0), CellIndex(i, j))
+        for i in range(6)
+        for j in range(6)
+    ]
+
+
+def test_attached_environment_matches(env: Environment):
+    """
+    Test that an attached environment answers like the original, from read-only tables.
+    """
+    with SharedMapTables(env) as tables:
+        attached = attach_environment(tables.spec, CellIndex(0, 0), CellIndex(5, 5))
+        assert np.array_equal(attached._graph, env._graph)
+        assert not attached.get_component_labels().flags.writeable
+        field = attached.get_distance_field(CellIndex(0, 0))
+        assert not field.flags.writeable
+        assert np.array_equal(field, env._bfs_field(CellIndex(0, 0)))
+        assert attached.is_traversable() == env.is_traversable()
+
+
+def test_attached_environment_survives_obstacle_changes(env: Environment):
+    """
+    Test that new obstacles drop the shared tables instead of writing to them.
+    """
+    with SharedMapTables(env) as tables:
+        attached = attach_environment(tables.spec, CellIndex(0, 0), CellIndex(5, 5))
+        attached.place_additional_obstacles([CellIndex(0, 1), CellIndex(1, 0)])
+        assert attached.get_shortest_distance(CellIndex(0, 0), CellIndex(5, 5)) is None
+        assert not attached.is_traversable()
+
+
+def test_movement_model_is_shared():
+    """
+    Test that workers attach with the publisher's movement model.
+    """
+    env = Environment(
+        size=4,
+        density=0.0,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(3, 3),
+        movement=EIGHT_CONNECTED,
+    )
+    with SharedMapTables(env, sources=[CellIndex(0, 0)]) as tables:
+        attached = attach_environment(tables.spec, CellIndex(0, 0), CellIndex(3, 3))
+        assert attached.movement == EIGHT_CONNECTED
+        assert attached.get_shortest_distance(CellIndex(0, 0), CellIndex(3, 3)) == 3
+
+
+def test_workers_attach(env: Environment):
+    """
+    Test that worker processes read the published distances.
+    """
+    expected = [
+        env.get_shortest_distance(CellIndex(0, 0), CellIndex(i, j))
+        for i in range(6)
+        for j in range(6)
+    ]
+    with SharedMapTables(env) as tables:
+        with ProcessPoolExecutor(2) as pool:
+            results = list(pool.map(all_distances, [tables.spec] * 2))
+    assert results == [expected, expected]
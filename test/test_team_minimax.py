@@ -0,0 +1,108 @@
+"""
+Test the joint-move search performed by the TeamMiniMax class.
+"""
+
+import pytest
+import numpy as np
+from src.environment import Environment
+from src.movement import OCTILE
+from src.team_gamestate import TeamGameState
+from src.team_minimax import TeamMiniMax
+from src.utils import CellIndex, Role
+
+# --- Fixtures ---
+
+
+@pytest.fixture
+def open_env():
+    """Create an empty 5x5 environment with two pursuants and one evader."""
+    env = Environment(
+        size=5,
+        density=0.0,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(2, 2),
+        additional_agents={Role.PURSUANT: [CellIndex(4, 4)]},
+    )
+    return env
+
+
+# --- Unit tests ---
+
+
+def test_joint_moves_avoid_collisions(open_env: Environment):
+    """
+    Test that joint moves never put two agents on one cell.
+    """
+    search = TeamMiniMax(open_env)
+    pursuants = (CellIndex(0, 0), CellIndex(0, 2))
+    moves = search.joint_moves(pursuants, (CellIndex(1, 1),), Role.PURSUANT)
+    assert moves
+    for move in moves:
+        assert len(set(move)) == 2
+        assert CellIndex(1, 1) not in move
+
+
+def test_colliding_teammates_stay_put():
+    """
+    Test that evaders whose only moves lead to the same cell still get joint moves, and the game can go on.
+    """
+    obstacles = np.array([[0, 0, 0, 1, 0], [1, 1, 1, 1, 0], [0, 0, 0, 0, 0]])
+    evaders = (CellIndex(0, 0), CellIndex(0, 2))
+    env = Environment.from_array(obstacles, CellIndex(2, 0), evaders[0])
+    search = TeamMiniMax(env)
+    moves = search.joint_moves((CellIndex(2, 0),), evaders, Role.EVADER)
+    assert set(moves) == {
+        (CellIndex(0, 1), CellIndex(0, 2)),
+        (CellIndex(0, 0), CellIndex(0, 1)),
+        evaders,
+    }
+    value, move = search.search((CellIndex(2, 0),), evaders, Role.EVADER, 2)
+    assert move in moves and value is not None
+
+
+def test_search_takes_capture(open_env: Environment):
+    """
+    Test that the pursuants move next to the evader when they can.
+    """
+    search = TeamMiniMax(open_env)
+    pursuants = (CellIndex(0, 2), CellIndex(4, 4))
+    value, move = search.search(pursuants, (CellIndex(2, 2),), Role.PURSUANT, 2)
+    assert value == TeamMiniMax.CAPTURED
+    assert CellIndex(1, 2) in move
+
+
+def test_search_takes_diagonal_capture():
+    """
+    Test that on an octile map the pursuants step diagonally next to the evader, 1.414 away, and score it as a capture.
+    """
+    env = Environment.from_array(
+        np.zeros((5, 5), dtype=np.uint8), CellIndex(0, 0), CellIndex(2, 2), movement=OCTILE
+    )
+    search = TeamMiniMax(env)
+    assert search.is_capture((CellIndex(1, 1),), (CellIndex(2, 2),))
+    value, move = search.search((CellIndex(0, 0),), (CellIndex(2, 2),), Role.PURSUANT, 2)
+    assert value == TeamMiniMax.CAPTURED
+    assert move in ((CellIndex(1, 1),), (CellIndex(1, 2),), (CellIndex(2, 1),))
+
+
+def test_move_ordering_limits_branching(open_env: Environment):
+    """
+    Test that capping the branching factor visits fewer positions.
+    """
+    pursuants = tuple(open_env.get_agent_cells(Role.PURSUANT))
+    evaders = tuple(open_env.get_agent_cells(Role.EVADER))
+    full = TeamMiniMax(open_env)
+    full.search(pursuants, evaders, Role.PURSUANT, 3)
+    capped = TeamMiniMax(open_env, max_branching=2)
+    capped.search(pursuants, evaders, Role.PURSUANT, 3)
+    assert capped.nodes_visited < full.nodes_visited
+
+
+def test_team_game_runs():
+    """
+    Test that a game between teams plays out to a result.
+    """
+    game = TeamGameState(episode=0, density=0.0, depth=2, max_branching=6)
+    winner, history = game.run_loop()
+    assert winner in (Role.PURSUANT, Role.EVADER)
+    assert len(history) == game.turn_count + 1
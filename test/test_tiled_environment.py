@@ -0,0 +1,164 @@
+"""
+Test that the TiledEnvironment class behaves like the in-memory Environment.
+"""
+
+import pytest
+import numpy as np
+from src.environment import Environment
+from src.tiled_environment import TiledEnvironment
+from src.gamestate import GameState
+from src.utils import Occupancy, CellIndex, Action, Role
+
+# --- Fixtures ---
+
+
+@pytest.fixture
+def env_pair(tmp_path):
+    """Create the same 12x12 map as an Environment and as a TiledEnvironment with 4x4 tiles."""
+    env = Environment(
+        size=12,
+        density=0.3,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(11, 11),
+    )
+    obstacles = np.zeros((12, 12), dtype=bool)
+    for cell in env.get_obstacle_cells():
+        obstacles[cell.row, cell.col] = True
+    tiled = TiledEnvironment.from_array(
+        str(tmp_path / "map.bin"),
+        obstacles,
+        CellIndex(0, 0),
+        CellIndex(11, 11),
+        tile_size=4,
+        max_tiles=3,
+    )
+    return env, tiled
+
+
+# --- Unit tests ---
+
+
+def test_same_cells(env_pair):
+    """
+    Test that every cell reads the same in both backends.
+    """
+    env, tiled = env_pair
+    for i in range(0, env.size):
+        for j in range(0, env.size):
+            assert env._get(CellIndex(i, j)) == tiled._get(CellIndex(i, j))
+    assert set(env.get_obstacle_cells()) == set(tiled.get_obstacle_cells())
+
+
+def test_same_distances(env_pair):
+    """
+    Test that A* on tiles finds the same distances as BFS on the full grid.
+    """
+    env, tiled = env_pair
+    start = CellIndex(0, 0)
+    for i in range(0, env.size):
+        for j in range(0, env.size):
+            cell = CellIndex(i, j)
+            if env._get(cell) == Occupancy.OBSTACLE:
+                continue
+            assert env.get_shortest_distance(
+                start, cell
+            ) == tiled.get_shortest_distance(start, cell)
+
+
+def test_tile_cache_is_bounded(env_pair):
+    """
+    Test that no more than max_tiles tiles stay loaded.
+    """
+    _, tiled = env_pair
+    tiled.get_obstacle_cells()
+    tiled.get_shortest_distance(CellIndex(0, 0), CellIndex(11, 11))
+    assert tiled.loaded_tiles() <= 3
+
+
+def test_place_obstacle_updates_loaded_tile(env_pair):
+    """
+    Test that a placed obstacle is seen through an already loaded tile.
+    """
+    _, tiled = env_pair
+    cell = CellIndex(0, 1)
+    tiled.get_neighbors(CellIndex(0, 0))
+    if tiled._get(cell) == Occupancy.EMPTY:
+        assert tiled.place_additional_obstacles([cell]) == [cell]
+    assert cell not in tiled.get_neighbors(CellIndex(0, 0))
+
+
+def test_placed_obstacles_stay_off_the_file(tmp_path):
+    """
+    Test that placed obstacles only reach the map file when it is opened with mode="r+".
+    """
+    path = str(tmp_path / "map.bin")
+    obstacles = np.zeros((4, 4), dtype=bool)
+    cell = CellIndex(1, 1)
+
+    tiled = TiledEnvironment.from_array(path, obstacles, CellIndex(0, 0), CellIndex(3, 3))
+    assert tiled.place_additional_obstacles([cell]) == [cell]
+    assert tiled._get(cell) == Occupancy.OBSTACLE
+    assert not np.fromfile(path, dtype=np.uint8).any()
+
+    tiled = TiledEnvironment(path, 4, CellIndex(0, 0), CellIndex(3, 3), mode="r+")
+    tiled.place_additional_obstacles([cell])
+    tiled._map.flush()
+    assert np.fromfile(path, dtype=np.uint8).reshape(4, 4)[1, 1] == 1
+
+
+def test_move_agent(tmp_path):
+    """
+    Test that agents move without touching the obstacle file.
+    """
+    tiled = TiledEnvironment.from_array(
+        str(tmp_path / "map.bin"),
+        np.zeros((6, 6), dtype=bool),
+        CellIndex(0, 0),
+        CellIndex(0, 2),
+        tile_size=4,
+    )
+    assert tiled.move_agent(Role.PURSUANT, Action.RIGHT)
+    assert tiled.get_agent_cell(Role.PURSUANT) == CellIndex(0, 1)
+    assert tiled.is_agent_adjacent()
+    assert not tiled.move_agent(Role.PURSUANT, Action.RIGHT)
+    assert not np.asarray(tiled._map).any()
+
+
+def test_gamestate_plays_on_tiles(tmp_path):
+    """
+    Test that GameState plays a full game on a tiled map.
+    """
+    tiled = TiledEnvironment.create(
+        str(tmp_path / "map.bin"),
+        size=16,
+        density=0.1,
+        pursuant_pos=CellIndex(0, 0),
+        evader_pos=CellIndex(4, 4),
+        seed=3,
+        tile_size=8,
+    )
+    game = GameState(episode=0, depth=2, env=tiled)
+    winner, history = game.run_loop()
+    # a seeded 16x16 map is too open to corner the evader within the turn limit
+    assert winner == Role.EVADER
+    assert game.turn_count == game.EVADER_THRESHOLD
+    assert not tiled.is_agent_adjacent()
+    assert len(history) == game.turn_count + 1
+
+
+def test_rectangular_tiles(tmp_path):
+    """
+    Test that a rectangular tiled map keeps separate row and column bounds.
+    """
+    obstacles = np.zeros((3, 20), dtype=bool)
+    obstacles[1, :19] = True
+    tiled = TiledEnvironment.from_array(
+        str(tmp_path / "map.bin"),
+        obstacles,
+        CellIndex(0, 0),
+        CellIndex(2, 0),
+        tile_size=8,
+    )
+    assert tiled.shape == (3, 20)
+    assert not tiled.is_within_bounds(CellIndex(3, 0))
+    assert tiled.get_shortest_distance(CellIndex(0, 0), CellIndex(2, 0)) == 40
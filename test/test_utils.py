@@ -3,6 +3,7 @@ Test helper functions in utils.py.
 """
 
 from src.environment import Environment
+from src.movement import EIGHT_CONNECTED
 from src.utils import (
     CellIndex,
     Action,
@@ -127,6 +128,25 @@ def test_down_action(empty_env: Environment):
     assert mv == derive_action(origin, dest)
 
 
+def test_diagonal_action():
+    """
+    Test that when given an agent's position before and after moving diagonally, derive_action will return the diagonal action
+    """
+    env = Environment(
+        size=5,
+        density=0.0,
+        pursuant_pos=CellIndex(1, 1),
+        evader_pos=CellIndex(1, 3),
+        movement=EIGHT_CONNECTED,
+    )
+    a = Role.PURSUANT
+    mv = Action.DOWN_RIGHT
+    origin = env.get_agent_cell(a)
+    assert env.move_agent(a, mv)
+    dest = env.get_agent_cell(a)
+    assert mv == derive_action(origin, dest)
+
+
 def test_not_action(empty_env: Environment):
     """
     Test that attempting to derive an impossible action will fail